@@ -0,0 +1,54 @@
+"""transcription job queue
+
+Revision ID: 8b41e6d2a5f3
+Revises: 3f2a9c1d7e10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '8b41e6d2a5f3'
+down_revision: Union[str, Sequence[str], None] = '3f2a9c1d7e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transcription_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('filename', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('audio_handle', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('host', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('transcript_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_poll_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('notebook_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('transcription_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transcription_job_workspace_id'), ['workspace_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_transcription_job_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_transcription_job_next_poll_at'), ['next_poll_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transcription_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transcription_job_next_poll_at'))
+        batch_op.drop_index(batch_op.f('ix_transcription_job_status'))
+        batch_op.drop_index(batch_op.f('ix_transcription_job_workspace_id'))
+
+    op.drop_table('transcription_job')
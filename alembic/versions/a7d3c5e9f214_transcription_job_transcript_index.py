@@ -0,0 +1,29 @@
+"""index transcription_job.transcript_id for webhooks
+
+Revision ID: a7d3c5e9f214
+Revises: 8b41e6d2a5f3
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3c5e9f214'
+down_revision: Union[str, Sequence[str], None] = '8b41e6d2a5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('transcription_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transcription_job_transcript_id'), ['transcript_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transcription_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transcription_job_transcript_id'))
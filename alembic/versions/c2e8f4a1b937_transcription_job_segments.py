@@ -0,0 +1,31 @@
+"""transcription job segments
+
+Revision ID: c2e8f4a1b937
+Revises: a7d3c5e9f214
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e8f4a1b937'
+down_revision: Union[str, Sequence[str], None] = 'a7d3c5e9f214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('transcription_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('segments', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transcription_job', schema=None) as batch_op:
+        batch_op.drop_column('segments')
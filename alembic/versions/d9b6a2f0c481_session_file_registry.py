@@ -0,0 +1,50 @@
+"""session file registry for the janitor
+
+Revision ID: d9b6a2f0c481
+Revises: c2e8f4a1b937
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b6a2f0c481'
+down_revision: Union[str, Sequence[str], None] = 'c2e8f4a1b937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sessionfile',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('thread_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('file_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('filename', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('uploaded_at', sa.DateTime(), nullable=False),
+    sa.Column('checked_at', sa.DateTime(), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sessionfile', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sessionfile_session_id'), ['session_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sessionfile_thread_id'), ['thread_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sessionfile_file_id'), ['file_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sessionfile_uploaded_at'), ['uploaded_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('sessionfile', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sessionfile_uploaded_at'))
+        batch_op.drop_index(batch_op.f('ix_sessionfile_file_id'))
+        batch_op.drop_index(batch_op.f('ix_sessionfile_thread_id'))
+        batch_op.drop_index(batch_op.f('ix_sessionfile_session_id'))
+
+    op.drop_table('sessionfile')
@@ -0,0 +1,45 @@
+"""durable retry queue for OpenAI file deletions
+
+Revision ID: e4c1b8d7a602
+Revises: d9b6a2f0c481
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c1b8d7a602'
+down_revision: Union[str, Sequence[str], None] = 'd9b6a2f0c481'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pendingfiledeletion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('release_pending', sa.Boolean(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('pendingfiledeletion', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pendingfiledeletion_file_id'), ['file_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_pendingfiledeletion_next_attempt_at'), ['next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('pendingfiledeletion', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pendingfiledeletion_next_attempt_at'))
+        batch_op.drop_index(batch_op.f('ix_pendingfiledeletion_file_id'))
+
+    op.drop_table('pendingfiledeletion')
@@ -8,6 +8,10 @@ from .auth_config import lauth
 from dotenv import load_dotenv
 
 from asistente_legal_constitucional_con_ia.states.chat_state import ChatState
+from asistente_legal_constitucional_con_ia.services.assistant_cache import assistant_cache
+from asistente_legal_constitucional_con_ia.services.session_janitor import session_janitor
+from asistente_legal_constitucional_con_ia.services.transcription_jobs import transcription_pool
+from asistente_legal_constitucional_con_ia.services.transcription_webhook import webhook_api
 
 from .components.layout import main_layout
 from .pages.asistente_page import asistente_page
@@ -36,8 +40,17 @@ app = rx.App(
     stylesheets=[
         "/global.css",  # La ruta es relativa a assets y debe iniciar con /
     ],
+    # Rutas HTTP propias (webhook de AssemblyAI) montadas junto al backend de Reflex
+    api_transformer=webhook_api,
 )
 
+# Pool de transcripción: procesa los trabajos persistentes de la tabla transcription_job
+app.register_lifespan_task(transcription_pool.run)
+# Janitor único por proceso para archivos y threads de las sesiones de chat
+app.register_lifespan_task(session_janitor.run)
+# Metadatos del Assistant precargados y refrescados fuera de la ruta de cada respuesta
+app.register_lifespan_task(assistant_cache.run)
+
 # ✅ AÑADIR: Función para crear layout SIN sidebar (usuarios no autenticados)
 
 
@@ -166,6 +166,17 @@ def chat_area() -> rx.Component:
         token_meter(),
         rx.box(
             rx.foreach(ChatState.messages, message_bubble),
+            # Vista previa del stream: el servidor envía solo deltas vía call_script
+            rx.cond(
+                ChatState.streaming,
+                rx.box(
+                    id="chat-streaming-preview",
+                    padding_x="1em",
+                    white_space="pre-wrap",
+                    word_break="break-word",
+                    color="black",
+                ),
+            ),
             id="chat-messages-container",
             padding_x="0.5rem",
             padding_y="1rem",
@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Optional
 
 import reflex as rx
+from sqlmodel import Field
 
 # CAMBIO 1: SQLModel → rx.Model
 
@@ -33,3 +34,77 @@ class AudioTranscription(rx.Model, table=True):
     updated_at: datetime = datetime.now()
     notebook_id: Optional[int] = None
     workspace_id: str = "public"
+
+
+class UploadedDocument(rx.Model, table=True):
+    """Documento subido, direccionado por contenido y compartido entre sesiones.
+
+    `ref_count` cuenta cuántas sesiones usan el `file_id` de OpenAI; el archivo se
+    elimina en OpenAI solo cuando la última sesión lo libera.
+    """
+
+    content_hash: str = Field(index=True, unique=True)  # SHA-256 de los bytes originales
+    file_id: str = Field(index=True)
+    filename: str
+    ref_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class TranscriptionJob(rx.Model, table=True):
+    """Trabajo de transcripción persistente, procesado por el pool de workers.
+
+    Sobrevive a reinicios: cualquier worker puede retomar un trabajo ya enviado a
+    AssemblyAI (`transcript_id`). Los trabajos aún no enviados solo los toma el host
+    donde está el audio (`host`). `locked_until` es el lease del worker que lo procesa.
+    """
+
+    __tablename__ = "transcription_job"
+
+    workspace_id: str = Field(default="public", index=True)
+    filename: str
+    audio_handle: str = ""  # Handle del audio en el almacén local (hasta enviarlo)
+    host: str = ""
+    status: str = Field(default="pending", index=True)  # pending | submitted | processing | completed | failed
+    transcript_id: Optional[str] = Field(default=None, index=True)
+    segments: Optional[str] = None  # JSON con los tramos (modo por segmentos)
+    attempts: int = 0
+    next_poll_at: datetime = Field(default_factory=datetime.now, index=True)
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    error: Optional[str] = None
+    notebook_id: Optional[int] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class SessionFile(rx.Model, table=True):
+    """Archivo de OpenAI en uso por una sesión de chat, para el janitor central.
+
+    Sustituye a los monitores por sesión: el janitor del proceso recorre esta tabla,
+    elimina archivos antiguos o de threads inexistentes y sobrevive a reinicios.
+    """
+
+    session_id: str = Field(index=True)
+    thread_id: Optional[str] = Field(default=None, index=True)
+    file_id: str = Field(index=True)
+    filename: str = ""
+    uploaded_at: datetime = Field(default_factory=datetime.now, index=True)
+    checked_at: Optional[datetime] = None  # Última verificación del thread
+    locked_until: Optional[datetime] = None  # Lease del janitor que lo procesa
+
+
+class PendingFileDeletion(rx.Model, table=True):
+    """Archivo de OpenAI cuya eliminación falló y se reintenta más tarde.
+
+    Normalmente la referencia ya se liberó en el registro de documentos y solo queda
+    pendiente el borrado en OpenAI. Con `release_pending`, el registro falló al liberar
+    la referencia: primero se libera y solo se borra si nadie más usa el archivo.
+    """
+
+    file_id: str = Field(index=True, unique=True)
+    release_pending: bool = False
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
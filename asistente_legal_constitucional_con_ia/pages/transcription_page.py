@@ -228,6 +228,7 @@ def transcription_page() -> rx.Component:
         on_mount=[
             TranscriptionState.refresh_transcriptions,
             TranscriptionState.reset_upload_state,
+            TranscriptionState.resume_active_job,
         ],
     )
 
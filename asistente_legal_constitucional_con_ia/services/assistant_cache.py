@@ -0,0 +1,93 @@
+import asyncio
+import dataclasses
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from openai import OpenAI
+
+from .openai_clients import get_openai_client
+
+logger = logging.getLogger("asistente_legal")
+
+ASSISTANT_CACHE_TTL_S = float(os.getenv("ASSISTANT_CACHE_TTL_S", "600"))
+
+
+@dataclasses.dataclass(frozen=True)
+class AssistantMetadata:
+    model: str
+    tools: Tuple[str, ...]
+    instructions_hash: str
+    fetched_at: float
+
+
+def _metadata_from(assistant) -> AssistantMetadata:
+    tools = []
+    for tool in getattr(assistant, "tools", None) or []:
+        function = getattr(tool, "function", None)
+        tools.append(f"function:{function.name}" if function is not None else getattr(tool, "type", "desconocida"))
+    instructions = getattr(assistant, "instructions", None) or ""
+    return AssistantMetadata(
+        model=getattr(assistant, "model", "") or "",
+        tools=tuple(tools),
+        instructions_hash=hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16],
+        fetched_at=time.time(),
+    )
+
+
+class AssistantCache:
+    """Caché del proceso con los metadatos de los Assistants (modelo, tools, hash de instrucciones).
+
+    Se precarga al iniciar y se refresca en segundo plano, así la primera respuesta de
+    cada usuario no espera a `assistants.retrieve`. Las lecturas nunca bloquean: si la
+    entrada venció se devuelve la anterior y se agenda un refresco.
+    """
+
+    def __init__(self, ttl_s: float = ASSISTANT_CACHE_TTL_S):
+        self.ttl_s = ttl_s
+        self._entries: Dict[str, AssistantMetadata] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def peek(self, assistant_id: str, client: Optional[OpenAI] = None) -> Optional[AssistantMetadata]:
+        """Metadatos cacheados (aunque estén vencidos); si faltan o vencieron y hay cliente, refresca en segundo plano."""
+        entry = self._entries.get(assistant_id)
+        if client is not None and (entry is None or time.time() - entry.fetched_at > self.ttl_s):
+            self.refresh_soon(client, assistant_id)
+        return entry
+
+    def refresh_soon(self, client: OpenAI, assistant_id: str) -> None:
+        # Una sola consulta en vuelo por Assistant, aunque muchas sesiones lo pidan a la vez.
+        task = self._refreshing.get(assistant_id)
+        if task is not None and not task.done():
+            return
+        self._refreshing[assistant_id] = asyncio.create_task(self.refresh(client, assistant_id))
+
+    async def refresh(self, client: OpenAI, assistant_id: str) -> Optional[AssistantMetadata]:
+        try:
+            assistant = await asyncio.to_thread(client.beta.assistants.retrieve, assistant_id)
+        except Exception as e:
+            logger.warning(f"No se pudieron obtener los metadatos del Assistant {assistant_id}: {e}")
+            return self._entries.get(assistant_id)
+        metadata = _metadata_from(assistant)
+        previous = self._entries.get(assistant_id)
+        self._entries[assistant_id] = metadata
+        if previous is None or (previous.model, previous.tools, previous.instructions_hash) != (metadata.model, metadata.tools, metadata.instructions_hash):
+            logger.info(f"Assistant {assistant_id}: modelo={metadata.model}, tools={list(metadata.tools)}, instrucciones={metadata.instructions_hash}")
+        return metadata
+
+    async def run(self) -> None:
+        """Precarga el Assistant configurado y lo mantiene fresco (tarea de ciclo de vida de la app)."""
+        assistant_id = os.getenv("ASSISTANT_ID_CONSTITUCIONAL", "")
+        client = get_openai_client(os.getenv("OPENAI_API_KEY", ""))
+        if not assistant_id or client is None:
+            logger.warning("Caché de Assistant sin precarga: faltan ASSISTANT_ID_CONSTITUCIONAL u OPENAI_API_KEY")
+            return
+        while True:
+            await self.refresh(client, assistant_id)
+            # Refrescar antes de vencer para que las lecturas siempre encuentren datos frescos.
+            await asyncio.sleep(self.ttl_s * 0.8)
+
+
+assistant_cache = AssistantCache()
@@ -0,0 +1,185 @@
+import dataclasses
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("asistente_legal")
+
+# ffmpeg es opcional: sin él, la transcripción por segmentos queda deshabilitada.
+FFMPEG = shutil.which("ffmpeg")
+
+SEGMENT_TARGET_S = float(os.getenv("TRANSCRIPTION_SEGMENT_S", "900"))
+SEGMENT_OVERLAP_S = float(os.getenv("TRANSCRIPTION_SEGMENT_OVERLAP_S", "30"))
+# Los cortes buscan un silencio a ± este porcentaje de la duración objetivo.
+CUT_WINDOW_RATIO = 0.2
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_S = 0.5
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?\d+(?:\.\d+)?)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(\d+(?:\.\d+)?)")
+
+
+@dataclasses.dataclass
+class Segment:
+    """Tramo de audio enviado como transcripción independiente.
+
+    `start_s` incluye el solape con el tramo anterior; `keep_from_s` es el corte real:
+    lo que cae antes pertenece al tramo anterior y solo se usa para casar hablantes.
+    Las utterances se guardan con tiempos absolutos (ms) y etiquetas locales del tramo.
+    """
+
+    index: int
+    start_s: float
+    end_s: float
+    keep_from_s: float
+    transcript_id: Optional[str] = None
+    status: str = "pending"  # pending | submitted | completed
+    utterances: List[Dict[str, Any]] = dataclasses.field(default_factory=list)
+
+
+def segments_to_json(segments: List[Segment]) -> str:
+    return json.dumps([dataclasses.asdict(s) for s in segments])
+
+
+def segments_from_json(data: str) -> List[Segment]:
+    return [Segment(**item) for item in json.loads(data)]
+
+
+def _run_ffmpeg(args: List[str]) -> str:
+    """Ejecuta ffmpeg y devuelve su stderr (donde escribe duración y silencios)."""
+    if not FFMPEG:
+        raise RuntimeError("ffmpeg no está instalado")
+    result = subprocess.run([FFMPEG, "-hide_banner", "-nostats", *args], capture_output=True, text=True)
+    return result.stderr
+
+
+def probe_duration(path: str) -> float:
+    match = _DURATION_RE.search(_run_ffmpeg(["-i", path]))
+    if not match:
+        raise RuntimeError(f"No se pudo leer la duración de {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def detect_silences(path: str, noise_db: int = SILENCE_NOISE_DB, min_silence_s: float = SILENCE_MIN_S) -> List[Tuple[float, float]]:
+    stderr = _run_ffmpeg(["-i", path, "-af", f"silencedetect=noise={noise_db}dB:d={min_silence_s}", "-f", "null", "-"])
+    starts = [max(0.0, float(v)) for v in _SILENCE_START_RE.findall(stderr)]
+    ends = [float(v) for v in _SILENCE_END_RE.findall(stderr)]
+    return list(zip(starts, ends))
+
+
+def plan_segments(duration_s: float, silences: List[Tuple[float, float]], target_s: float = SEGMENT_TARGET_S, overlap_s: float = SEGMENT_OVERLAP_S) -> List[Segment]:
+    """Parte el audio cerca de cada múltiplo de `target_s`, en el silencio más cercano.
+
+    Si no hay silencio dentro de la ventana, corta en el punto ideal. El último tramo
+    absorbe el resto si es menor que 1.5 × target_s. Cada tramo (salvo el primero)
+    empieza `overlap_s` antes del corte para poder reconciliar hablantes.
+    """
+    midpoints = [(start + end) / 2 for start, end in silences]
+    cuts: List[float] = []
+    position = 0.0
+    while duration_s - position > target_s * 1.5:
+        ideal = position + target_s
+        window = target_s * CUT_WINDOW_RATIO
+        candidates = [m for m in midpoints if abs(m - ideal) <= window]
+        cut = min(candidates, key=lambda m: abs(m - ideal)) if candidates else ideal
+        cuts.append(cut)
+        position = cut
+    bounds = [0.0, *cuts, duration_s]
+    return [Segment(index=i, start_s=max(0.0, bounds[i] - overlap_s) if i else 0.0, end_s=bounds[i + 1], keep_from_s=bounds[i]) for i in range(len(bounds) - 1)]
+
+
+def cut_segment(path: str, segment: Segment, out_path: str) -> None:
+    """Extrae el tramo sin recodificar (copia de frames MP3)."""
+    _run_ffmpeg(["-y", "-loglevel", "error", "-ss", f"{segment.start_s:.3f}", "-t", f"{segment.end_s - segment.start_s:.3f}", "-i", path, "-c", "copy", out_path])
+    if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+        raise RuntimeError(f"ffmpeg no generó el segmento {segment.index}")
+
+
+def segment_utterances(segment: Segment, transcript: Any) -> List[Dict[str, Any]]:
+    """Utterances de un transcript de AssemblyAI (o un stub equivalente) en tiempo absoluto."""
+    offset_ms = segment.start_s * 1000
+    if transcript.utterances:
+        return [{"speaker": utt.speaker, "text": utt.text, "start": offset_ms + utt.start, "end": offset_ms + utt.end} for utt in transcript.utterances]
+    if transcript.text:
+        return [{"speaker": "A", "text": transcript.text, "start": offset_ms, "end": segment.end_s * 1000}]
+    return []
+
+
+def _speaker_label(n: int) -> str:
+    return chr(ord("A") + n) if n < 26 else f"S{n + 1}"
+
+
+def _match_speakers(previous: Segment, current: Segment) -> Dict[str, str]:
+    """Empareja hablantes locales del tramo actual con los del anterior.
+
+    Usa el tiempo de habla compartido en la zona de solape: cuanto más coinciden dos
+    hablantes en el mismo audio, más probable que sean la misma persona. Un solape corto
+    rara vez contiene a todos; si quedan tantos hablantes sin pareja en un tramo como en
+    el otro, se emparejan por turno: el que calló antes en el tramo anterior con el que
+    primero habla en el actual.
+    """
+    window_start, window_end = current.start_s * 1000, previous.end_s * 1000
+    shared: Dict[Tuple[str, str], float] = {}
+    for cur in current.utterances:
+        for prev in previous.utterances:
+            start = max(cur["start"], prev["start"], window_start)
+            end = min(cur["end"], prev["end"], window_end)
+            if end > start:
+                key = (cur["speaker"], prev["speaker"])
+                shared[key] = shared.get(key, 0.0) + (end - start)
+    mapping: Dict[str, str] = {}
+    used_previous: set = set()
+    for (cur_speaker, prev_speaker), _ in sorted(shared.items(), key=lambda item: item[1], reverse=True):
+        if cur_speaker not in mapping and prev_speaker not in used_previous:
+            mapping[cur_speaker] = prev_speaker
+            used_previous.add(prev_speaker)
+    last_seen: Dict[str, float] = {}
+    for prev in previous.utterances:
+        last_seen[prev["speaker"]] = max(last_seen.get(prev["speaker"], 0.0), prev["end"])
+    first_seen: Dict[str, float] = {}
+    for cur in current.utterances:
+        first_seen[cur["speaker"]] = min(first_seen.get(cur["speaker"], cur["start"]), cur["start"])
+    pending_previous = sorted((s for s in last_seen if s not in used_previous), key=last_seen.__getitem__)
+    pending_current = sorted((s for s in first_seen if s not in mapping), key=first_seen.__getitem__)
+    if len(pending_previous) == len(pending_current):
+        mapping.update(zip(pending_current, pending_previous))
+    return mapping
+
+
+def stitch_segments(segments: List[Segment]) -> Tuple[List[Dict[str, Any]], int]:
+    """Une el prefijo de tramos completados con etiquetas de hablante globales.
+
+    Devuelve (utterances, tramos_unidos). Se detiene en el primer tramo sin terminar,
+    de modo que el texto publicado siempre es continuo.
+    """
+    stitched: List[Dict[str, Any]] = []
+    global_labels: Dict[Tuple[int, str], str] = {}
+    assigned = 0
+    previous: Optional[Segment] = None
+    joined = 0
+    for segment in segments:
+        if segment.status != "completed":
+            break
+        mapping = _match_speakers(previous, segment) if previous else {}
+        for utt in segment.utterances:
+            # El solape pertenece al tramo anterior: evita frases duplicadas.
+            if (utt["start"] + utt["end"]) / 2 < segment.keep_from_s * 1000:
+                continue
+            key = (segment.index, utt["speaker"])
+            if key not in global_labels:
+                matched = mapping.get(utt["speaker"])
+                if matched is not None and (previous.index, matched) in global_labels:
+                    global_labels[key] = global_labels[(previous.index, matched)]
+                else:
+                    global_labels[key] = _speaker_label(assigned)
+                    assigned += 1
+            stitched.append({**utt, "speaker": global_labels[key]})
+        previous = segment
+        joined += 1
+    return stitched, joined
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+logger = logging.getLogger("asistente_legal")
+
+CACHE_DIR = os.getenv("LEYIA_CACHE_DIR", os.path.join(os.getcwd(), ".leyia_cache"))
+AUDIO_STORE_DIR = os.path.join(CACHE_DIR, "audio")
+AUDIO_BLOB_TTL_S = int(os.getenv("AUDIO_BLOB_TTL_S", str(6 * 3600)))
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class AudioBlobStore:
+    """Almacén local de audios pendientes de transcribir, indexado por un handle opaco.
+
+    El estado de Reflex solo guarda el handle (se serializa a Redis en cada cambio); el
+    audio queda en disco y la tarea en segundo plano lo lee cuando lo necesita. Los blobs
+    que nadie reclama se borran al superar AUDIO_BLOB_TTL_S.
+    """
+
+    def __init__(self, directory: str = AUDIO_STORE_DIR, ttl_s: int = AUDIO_BLOB_TTL_S):
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _path(self, handle: str) -> str:
+        # El handle es un uuid hex; se valida para que no pueda escapar del directorio.
+        if not handle or not all(c in "0123456789abcdef" for c in handle):
+            raise ValueError(f"Handle de audio inválido: {handle!r}")
+        return os.path.join(self.directory, f"{handle}.blob")
+
+    async def put(self, upload_file) -> tuple[str, int]:
+        """Vuelca el upload a disco por bloques. Devuelve (handle, tamaño en bytes)."""
+        await asyncio.to_thread(self._maybe_purge)
+        await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+        handle = uuid.uuid4().hex
+        path = self._path(handle)
+        size = 0
+        try:
+            # Escrituras de hasta ~100 MB: fuera del event loop, como el resto de la E/S a disco.
+            f = await asyncio.to_thread(open, path, "wb")
+            try:
+                while True:
+                    chunk = await upload_file.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await asyncio.to_thread(f.write, chunk)
+                    size += len(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        except BaseException:
+            self.delete(handle)
+            raise
+        logger.info(f"Audio {handle} guardado en el almacén local ({size:,} bytes)")
+        return handle, size
+
+    def path(self, handle: str) -> Optional[str]:
+        """Ruta del blob, o None si expiró o ya se borró."""
+        path = self._path(handle)
+        return path if os.path.exists(path) else None
+
+    def delete(self, handle: str) -> None:
+        if not handle:
+            return
+        try:
+            os.remove(self._path(handle))
+        except (OSError, ValueError):
+            pass
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < min(self.ttl_s, 600):
+                return
+            self._last_purge = now
+        if not os.path.isdir(self.directory):
+            return
+        removed = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime > self.ttl_s:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"Almacén de audio: {removed} blobs expirados eliminados")
+
+
+audio_store = AudioBlobStore()
@@ -0,0 +1,68 @@
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+import reflex as rx
+from sqlalchemy.exc import IntegrityError
+
+from ..models.database import UploadedDocument
+
+logger = logging.getLogger("asistente_legal")
+
+# Funciones síncronas (acceso a BD): llamarlas con asyncio.to_thread desde los handlers.
+
+
+def acquire_existing(digest: str) -> Optional[str]:
+    """Si el contenido ya fue subido, suma una referencia y devuelve su file_id.
+
+    El texto extraído no se guarda aquí: ya está en la caché de texto por hash.
+    """
+    with rx.session() as session:
+        doc = session.exec(UploadedDocument.select().where(UploadedDocument.content_hash == digest).with_for_update()).first()
+        if not doc:
+            return None
+        doc.ref_count += 1
+        doc.updated_at = datetime.now()
+        session.add(doc)
+        session.commit()
+        return doc.file_id
+
+
+def register(digest: str, file_id: str, filename: str) -> Tuple[str, bool]:
+    """Registra un archivo recién subido con una referencia.
+
+    Devuelve (file_id_a_usar, es_duplicado). Si otro worker registró el mismo contenido
+    en paralelo, se usa su file_id y el llamador debe eliminar el archivo que subió.
+    """
+    try:
+        with rx.session() as session:
+            session.add(UploadedDocument(content_hash=digest, file_id=file_id, filename=filename, ref_count=1))
+            session.commit()
+        return file_id, False
+    except IntegrityError:
+        existing = acquire_existing(digest)
+        if existing:
+            return existing, True
+        raise
+
+
+def release(file_id: str) -> bool:
+    """Libera una referencia. Devuelve True si el archivo ya no tiene usuarios y debe eliminarse en OpenAI.
+
+    Los errores de BD se propagan: el llamador debe dejar la liberación pendiente (ver
+    `file_deletion.release_files`), porque para entonces la sesión ya soltó el archivo.
+    """
+    with rx.session() as session:
+        doc = session.exec(UploadedDocument.select().where(UploadedDocument.file_id == file_id).with_for_update()).first()
+        if not doc:
+            # Archivo no compartido (p. ej. subido antes de existir el registro).
+            return True
+        doc.ref_count -= 1
+        if doc.ref_count > 0:
+            doc.updated_at = datetime.now()
+            session.add(doc)
+            session.commit()
+            return False
+        session.delete(doc)
+        session.commit()
+        return True
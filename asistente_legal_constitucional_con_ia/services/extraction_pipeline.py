@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+from ..util.text_extraction import (
+    PARALLEL_PAGE_THRESHOLD,
+    PdfSource,
+    count_pdf_pages,
+    extract_pdf_page_range,
+    extract_pdf_shard,
+    extract_text_from_bytes,
+    extract_text_from_path,
+    page_shards,
+    process_pool_context,
+)
+from .text_cache import text_cache
+
+logger = logging.getLogger("asistente_legal")
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Cada worker recibe unos pocos lotes para que el progreso avance de forma fluida.
+BATCHES_PER_WORKER = 4
+MIN_PAGES_PER_BATCH = 5
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido por el worker para extracción de texto."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=process_pool_context())
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Descarta un pool roto (un worker murió por segfault de MuPDF u OOM) para que el siguiente uso cree otro."""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def extract_text_async(source: PdfSource, filename: str, on_progress: Optional[ProgressCallback] = None, digest: Optional[str] = None) -> Optional[str]:
+    """Extrae texto fuera del event loop, con progreso por página para PDFs.
+
+    Los PDFs se parten en lotes de páginas que corren en paralelo en el pool de
+    procesos; `on_progress(paginas_listas, paginas_totales)` se llama al terminar cada
+    lote. DOCX/TXT se extraen completos en el pool y reportan una sola "página".
+    Si se pasa `digest` (SHA-256 de los bytes), se usa la caché persistente de texto.
+    `source` son los bytes del documento o la ruta de un archivo ya volcado a disco.
+    """
+    if digest:
+        size = os.path.getsize(source) if isinstance(source, str) else len(source)
+        cached = await asyncio.to_thread(text_cache.get, digest, size)
+        if cached is not None:
+            if on_progress:
+                on_progress(1, 1)
+            return cached
+
+    try:
+        text = await _extract(source, filename, on_progress)
+    except BrokenProcessPool as e:
+        # Un pool roto falla todas las tareas siguientes: se recrea y se reintenta una vez.
+        logger.warning(f"Pool de extracción roto procesando '{filename}' ({e}); se recrea y se reintenta")
+        text = await _extract(source, filename, on_progress)
+    if digest and text:
+        await asyncio.to_thread(text_cache.put, digest, text)
+    return text
+
+
+async def _extract(source: PdfSource, filename: str, on_progress: Optional[ProgressCallback]) -> Optional[str]:
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    try:
+        return await _extract_in(pool, loop, source, filename, on_progress)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+async def _extract_in(pool: ProcessPoolExecutor, loop: asyncio.AbstractEventLoop, source: PdfSource, filename: str, on_progress: Optional[ProgressCallback]) -> Optional[str]:
+    on_disk = isinstance(source, str)
+
+    if not filename.lower().endswith(".pdf"):
+        extractor = extract_text_from_path if on_disk else extract_text_from_bytes
+        text = await loop.run_in_executor(pool, extractor, source, filename)
+        if on_progress:
+            on_progress(1, 1)
+        return text
+
+    try:
+        total = await asyncio.to_thread(count_pdf_pages, source)
+    except Exception as e:
+        logger.error(f"Error abriendo PDF '{filename}': {e}")
+        return None
+    if total == 0:
+        if on_progress:
+            on_progress(0, 0)
+        return ""
+
+    # PDFs pequeños: un solo lote (fuera del event loop, sin coste de reparto).
+    shards = 1 if total < PARALLEL_PAGE_THRESHOLD else min(EXTRACTION_WORKERS * BATCHES_PER_WORKER, -(-total // MIN_PAGES_PER_BATCH))
+    # En disco, cada proceso abre el archivo por ruta; en memoria, el PDF se copia una vez
+    # a memoria compartida y los procesos lo leen de ahí.
+    shm = None if on_disk else shared_memory.SharedMemory(create=True, size=max(len(source), 1))
+    try:
+        if shm is not None:
+            shm.buf[: len(source)] = source
+            futures = [asyncio.wrap_future(pool.submit(extract_pdf_shard, shm.name, len(source), start, end)) for start, end in page_shards(total, shards)]
+        else:
+            futures = [asyncio.wrap_future(pool.submit(extract_pdf_page_range, source, start, end)) for start, end in page_shards(total, shards)]
+        done_pages = 0
+        try:
+            for fut in asyncio.as_completed(futures):
+                done_pages += len(await fut)
+                if on_progress:
+                    on_progress(done_pages, total)
+        except BrokenProcessPool:
+            for fut in futures:
+                fut.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error procesando PDF '{filename}': {e}", exc_info=True)
+            for fut in futures:
+                fut.cancel()
+            return None
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    # Los lotes se completan en cualquier orden; se unen en el orden original.
+    return "".join(page for fut in futures for page in fut.result()).strip()
@@ -0,0 +1,212 @@
+import asyncio
+import dataclasses
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import reflex as rx
+from openai import APIConnectionError, APITimeoutError, InternalServerError, NotFoundError, OpenAI, RateLimitError
+
+from ..models.database import PendingFileDeletion
+from . import document_registry
+
+logger = logging.getLogger("asistente_legal")
+
+FILE_DELETE_CONCURRENCY = int(os.getenv("FILE_DELETE_CONCURRENCY", "8"))
+FILE_DELETE_RETRIES = int(os.getenv("FILE_DELETE_RETRIES", "3"))
+RETRY_BASE_S = 0.5
+RETRY_CAP_S = 8.0
+# Cola persistente: espera entre reintentos (crece con cada intento) y lote por barrido.
+QUEUE_RETRY_BASE_S = 60.0
+QUEUE_RETRY_CAP_S = 6 * 3600.0
+QUEUE_BATCH_SIZE = 100
+
+# 429, 5xx y fallos de red: se reintentan con backoff exponencial y jitter.
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError, APITimeoutError)
+
+
+@dataclasses.dataclass
+class DeletionReport:
+    deleted: int = 0
+    failed: int = 0
+    latency_s: float = 0.0
+    failed_ids: List[str] = dataclasses.field(default_factory=list)
+
+    def __str__(self) -> str:
+        return f"{self.deleted} eliminados, {self.failed} fallidos en {self.latency_s:.2f}s"
+
+
+async def _delete_with_retry(client: OpenAI, file_id: str) -> Optional[str]:
+    """Elimina un archivo en OpenAI. Devuelve None si quedó eliminado, o el último error."""
+    # Los reintentos son de este bucle (con jitter): sin los del cliente, que se apilarían.
+    no_retry_client = client.with_options(max_retries=0)
+    for attempt in range(FILE_DELETE_RETRIES + 1):
+        try:
+            await asyncio.to_thread(no_retry_client.files.delete, file_id)
+            return None
+        except NotFoundError:
+            # Ya no existe: el objetivo se cumplió.
+            return None
+        except RETRYABLE_ERRORS as e:
+            if attempt == FILE_DELETE_RETRIES:
+                return str(e)
+            # Full jitter: evita que los reintentos de un lote golpeen la API a la vez.
+            await asyncio.sleep(random.uniform(0, min(RETRY_CAP_S, RETRY_BASE_S * 2**attempt)))
+        except Exception as e:
+            return str(e)
+    return None
+
+
+async def delete_files(client: OpenAI, file_ids: Iterable[str], concurrency: int = FILE_DELETE_CONCURRENCY) -> DeletionReport:
+    """Elimina archivos en OpenAI con concurrencia acotada y reintentos.
+
+    Los que siguen fallando se guardan en la cola persistente `pendingfiledeletion`
+    y el janitor los reintenta; ningún archivo huérfano se pierde.
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    report = DeletionReport()
+    if not file_ids:
+        return report
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(file_id: str) -> Optional[str]:
+        async with semaphore:
+            return await _delete_with_retry(client, file_id)
+
+    errors = await asyncio.gather(*(_one(file_id) for file_id in file_ids))
+    failures: Dict[str, str] = {file_id: error for file_id, error in zip(file_ids, errors) if error is not None}
+    report.deleted = len(file_ids) - len(failures)
+    report.failed = len(failures)
+    report.failed_ids = list(failures)
+    report.latency_s = time.perf_counter() - started
+    if failures:
+        try:
+            await asyncio.to_thread(enqueue_failures, failures)
+        except Exception as e:
+            logger.error(f"No se pudieron encolar {len(failures)} eliminaciones fallidas: {e}. Archivos: {list(failures)}")
+    logger.info(f"Eliminación de archivos en OpenAI: {report}")
+    return report
+
+
+def _release_references(file_ids: List[str]) -> Tuple[List[str], List[str]]:
+    """Libera referencias en el registro. Devuelve (sin usuarios, no liberadas por error de BD)."""
+    releasable, failed = [], []
+    for file_id in file_ids:
+        try:
+            if document_registry.release(file_id):
+                releasable.append(file_id)
+        except Exception as e:
+            logger.error(f"No se pudo liberar referencia de {file_id}: {e}")
+            failed.append(file_id)
+    return releasable, failed
+
+
+async def release_files(client: OpenAI, file_ids: Iterable[str]) -> DeletionReport:
+    """Libera las referencias de la sesión y elimina en OpenAI los archivos que quedaron sin uso.
+
+    Si el registro falla, la liberación queda en la cola persistente: la sesión (o el
+    janitor) ya soltó el archivo y nadie más volvería a liberarlo.
+    """
+    file_ids = list(file_ids)
+    releasable, unreleased = await asyncio.to_thread(_release_references, file_ids)
+    report = await delete_files(client, releasable)
+    if unreleased:
+        try:
+            await asyncio.to_thread(enqueue_releases, unreleased)
+        except Exception as e:
+            logger.error(f"No se pudieron encolar {len(unreleased)} liberaciones pendientes: {e}. Archivos: {unreleased}")
+        report.failed += len(unreleased)
+        report.failed_ids.extend(unreleased)
+    # Los compartidos que siguen en uso cuentan como liberados para la sesión.
+    report.deleted += len(file_ids) - len(releasable) - len(unreleased)
+    return report
+
+
+# Funciones síncronas (acceso a BD): llamarlas con asyncio.to_thread desde los handlers.
+
+
+def enqueue_failures(failures: Dict[str, str]) -> None:
+    with rx.session() as session:
+        for file_id, error in failures.items():
+            pending = session.exec(PendingFileDeletion.select().where(PendingFileDeletion.file_id == file_id)).first()
+            if pending is None:
+                pending = PendingFileDeletion(file_id=file_id, next_attempt_at=datetime.now() + timedelta(seconds=QUEUE_RETRY_BASE_S))
+            pending.last_error = error[:500]
+            session.add(pending)
+        session.commit()
+
+
+def enqueue_releases(file_ids: List[str]) -> None:
+    """Encola archivos cuya referencia en el registro aún debe liberarse antes de eliminarlos."""
+    with rx.session() as session:
+        for file_id in file_ids:
+            pending = session.exec(PendingFileDeletion.select().where(PendingFileDeletion.file_id == file_id)).first()
+            if pending is None:
+                pending = PendingFileDeletion(file_id=file_id, next_attempt_at=datetime.now() + timedelta(seconds=QUEUE_RETRY_BASE_S))
+            pending.release_pending = True
+            pending.last_error = "liberación de referencia pendiente"
+            session.add(pending)
+        session.commit()
+
+
+def mark_released(file_ids: List[str]) -> None:
+    """Marca como liberadas las referencias de entradas de la cola: solo queda eliminar en OpenAI."""
+    with rx.session() as session:
+        for row in session.exec(PendingFileDeletion.select().where(PendingFileDeletion.file_id.in_(file_ids))).all():
+            row.release_pending = False
+            session.add(row)
+        session.commit()
+
+
+def claim_due_retries(limit: int = QUEUE_BATCH_SIZE) -> List[Tuple[str, bool]]:
+    """Reclama entradas vencidas (SKIP LOCKED) como (file_id, liberación_pendiente).
+
+    El próximo intento se aplaza como lease.
+    """
+    now = datetime.now()
+    with rx.session() as session:
+        rows = session.exec(
+            PendingFileDeletion.select().where(PendingFileDeletion.next_attempt_at <= now).order_by(PendingFileDeletion.next_attempt_at).limit(limit).with_for_update(skip_locked=True)
+        ).all()
+        for row in rows:
+            row.attempts += 1
+            row.next_attempt_at = now + timedelta(seconds=min(QUEUE_RETRY_CAP_S, QUEUE_RETRY_BASE_S * 2**row.attempts))
+            session.add(row)
+        session.commit()
+        return [(row.file_id, row.release_pending) for row in rows]
+
+
+def resolve_retries(file_ids: List[str]) -> None:
+    with rx.session() as session:
+        for row in session.exec(PendingFileDeletion.select().where(PendingFileDeletion.file_id.in_(file_ids))).all():
+            session.delete(row)
+        session.commit()
+
+
+async def drain_retry_queue(client: OpenAI) -> DeletionReport:
+    """Reintenta las liberaciones y eliminaciones pendientes vencidas (lo invoca el janitor)."""
+    claimed = await asyncio.to_thread(claim_due_retries)
+    if not claimed:
+        return DeletionReport()
+    file_ids = [file_id for file_id, release_pending in claimed if not release_pending]
+    to_release = [file_id for file_id, release_pending in claimed if release_pending]
+    shared: List[str] = []
+    unreleased: List[str] = []
+    if to_release:
+        releasable, unreleased = await asyncio.to_thread(_release_references, to_release)
+        # Los que siguen compartidos no se eliminan; los que fallaron esperan el siguiente intento.
+        shared = [file_id for file_id in to_release if file_id not in releasable and file_id not in unreleased]
+        if releasable:
+            await asyncio.to_thread(mark_released, releasable)
+        file_ids += releasable
+    report = await delete_files(client, file_ids)
+    succeeded = [file_id for file_id in file_ids if file_id not in report.failed_ids] + shared
+    if succeeded:
+        await asyncio.to_thread(resolve_retries, succeeded)
+    report.deleted += len(shared)
+    report.failed += len(unreleased)
+    return report
@@ -0,0 +1,60 @@
+import time
+from typing import Optional
+
+FLUSH_POLICIES = ("fixed", "adaptive")
+
+
+class FlushScheduler:
+    """Decide cuándo enviar al cliente el texto acumulado durante el streaming.
+
+    Políticas:
+      - "fixed": comportamiento clásico (min_chars, min_interval_s o salto de línea).
+      - "adaptive": el intervalo entre envíos se ajusta al costo medido de cada flush
+        (lock de estado + emisión), sin que un salto de línea fuerce un envío.
+
+    En ambas se respeta un tope duro de actualizaciones por segundo por sesión.
+    """
+
+    def __init__(
+        self,
+        policy: str = "adaptive",
+        min_chars: int = 120,
+        min_interval_s: float = 0.15,
+        max_updates_per_s: float = 8.0,
+        max_interval_s: float = 1.0,
+    ):
+        self.policy = policy if policy in FLUSH_POLICIES else "adaptive"
+        self.min_chars = min_chars
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.hard_interval_s = 1.0 / max_updates_per_s if max_updates_per_s > 0 else 0.0
+        self._ewma_cost_s = 0.0
+        self._last_flush = time.time()
+        self.flushes = 0
+
+    @property
+    def interval_s(self) -> float:
+        """Intervalo objetivo actual entre flushes."""
+        if self.policy == "fixed":
+            return max(self.min_interval_s, self.hard_interval_s)
+        # Mantener el costo de render/lock por debajo de ~25% del tiempo de streaming.
+        adaptive = min(max(self._ewma_cost_s * 4, self.min_interval_s), self.max_interval_s)
+        return max(adaptive, self.hard_interval_s)
+
+    def should_flush(self, pending: str, chunk: str = "", now: Optional[float] = None) -> bool:
+        if not pending:
+            return False
+        now = time.time() if now is None else now
+        elapsed = now - self._last_flush
+        if elapsed < self.hard_interval_s:
+            return False
+        if self.policy == "fixed":
+            return len(pending) >= self.min_chars or "\n" in chunk or elapsed >= self.min_interval_s
+        # Bloques grandes salen en cuanto lo permite el tope; el resto espera el intervalo adaptativo.
+        return len(pending) >= self.min_chars * 4 or elapsed >= self.interval_s
+
+    def record_flush(self, cost_s: float, now: Optional[float] = None) -> None:
+        """Registra un flush y su costo (segundos) para ajustar el intervalo."""
+        self._last_flush = time.time() if now is None else now
+        self._ewma_cost_s = cost_s if self.flushes == 0 else 0.8 * self._ewma_cost_s + 0.2 * cost_s
+        self.flushes += 1
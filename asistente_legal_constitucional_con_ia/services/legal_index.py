@@ -0,0 +1,133 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ..util.citations import Citation, mentions_citation
+
+logger = logging.getLogger("asistente_legal")
+
+CACHE_DIR = os.getenv("LEYIA_CACHE_DIR", os.path.join(os.getcwd(), ".leyia_cache"))
+LEGAL_INDEX_PATH = os.getenv("LEGAL_INDEX_PATH", os.path.join(CACHE_DIR, "legal_index.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    canonical_id TEXT,
+    tipo TEXT,
+    url TEXT UNIQUE,
+    title TEXT,
+    body TEXT,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_documents_canonical_id ON documents (canonical_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, body, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+END;
+"""
+
+
+class LegalIndex:
+    """Índice local de texto completo (SQLite FTS5) de documentos legales ya obtenidos.
+
+    Se alimenta con los resultados de búsquedas remotas. Antes de salir a internet solo
+    se consultan citas exactas (`lookup`), con vigencia por tipo de documento. La
+    búsqueda por frase (`search`, FTS5 con tokenizador unicode61 sin diacríticos; FTS5
+    no trae stemmer en español) es demasiado amplia para evitar la búsqueda remota y
+    solo sirve de respaldo cuando esta falla.
+    """
+
+    def __init__(self, path: str = LEGAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add_documents(self, documents: List[Dict[str, str]], citation: Optional[Citation], tipo: Optional[str]) -> None:
+        """Agrega (o reemplaza por URL) documentos con claves url/title/snippet.
+
+        Solo los resultados cuyo título o URL mencionan la cita quedan bajo su ID canónico;
+        el resto de páginas devueltas por la búsqueda se indexan sin cita.
+        """
+        now = time.time()
+        rows = [
+            (
+                citation.canonical_id if citation and (mentions_citation(d.get("title") or "", citation) or mentions_citation(d["url"], citation)) else None,
+                tipo,
+                d["url"],
+                d.get("title") or "",
+                d.get("snippet") or "",
+                now,
+            )
+            for d in documents
+            if d.get("url")
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("DELETE FROM documents WHERE url = ?", [(r[2],) for r in rows])
+                    conn.executemany(
+                        "INSERT INTO documents (canonical_id, tipo, url, title, body, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo indexar localmente: {e}")
+
+    def lookup(self, citation: Citation, max_age_s: float, limit: int = 5) -> List[Dict[str, str]]:
+        """Documentos de la cita obtenidos hace menos de `max_age_s` cuyo título o URL la mencionan."""
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT url, title, body FROM documents WHERE canonical_id = ? AND fetched_at >= ? ORDER BY fetched_at DESC LIMIT ?",
+                    (citation.canonical_id, time.time() - max_age_s, limit),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Error consultando índice local: {e}")
+            return []
+        # Filas indexadas antes de filtrar por mención pueden no ser el documento citado.
+        rows = [row for row in rows if mentions_citation(row[1], citation) or mentions_citation(row[0], citation)]
+        logger.info(f"Índice local: {len(rows)} resultados para {citation.canonical_id} en {(time.perf_counter() - started) * 1000:.1f} ms")
+        return [{"url": url, "title": title, "snippet": body} for url, title, body in rows]
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, str]]:
+        """Búsqueda por frase en FTS5, sin vigencia (respaldo cuando la búsqueda remota falla)."""
+        phrase = '"' + (query or "").replace('"', " ").strip() + '"'
+        if phrase == '""':
+            return []
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT d.url, d.title, d.body FROM documents_fts f JOIN documents d ON d.id = f.rowid "
+                    "WHERE documents_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (phrase, limit),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Error consultando índice local: {e}")
+            return []
+        logger.info(f"Índice local (frase): {len(rows)} resultados en {(time.perf_counter() - started) * 1000:.1f} ms")
+        return [{"url": url, "title": title, "snippet": body} for url, title, body in rows]
+
+
+legal_index = LegalIndex()
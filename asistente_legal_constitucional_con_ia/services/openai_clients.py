@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import OpenAI
+
+logger = logging.getLogger("asistente_legal")
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY_S = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "60"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "10"))
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "600"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+
+class _PoolStats:
+    """Cuenta peticiones y conexiones nuevas (vía el trace de httpcore) de un pool."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self._lock = threading.Lock()
+
+    def on_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def on_trace(self, event_name: str) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+
+class _ClientEntry:
+    """Cliente OpenAI de una API key con su pool httpx de larga vida.
+
+    Es síncrono: todas las llamadas de la app pasan por asyncio.to_thread.
+    """
+
+    def __init__(self, api_key: str):
+        limits = httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE, keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_S)
+        timeout = httpx.Timeout(OPENAI_TIMEOUT_S, connect=OPENAI_CONNECT_TIMEOUT_S)
+        self.stats = stats = _PoolStats()
+
+        def _trace(event_name: str, info: Dict[str, Any]) -> None:
+            stats.on_trace(event_name)
+
+        def _on_request(request: httpx.Request) -> None:
+            stats.on_request()
+            request.extensions["trace"] = _trace
+
+        self.http_client = httpx.Client(limits=limits, timeout=timeout, event_hooks={"request": [_on_request]})
+        self.client = OpenAI(api_key=api_key, http_client=self.http_client, max_retries=OPENAI_MAX_RETRIES)
+
+
+_clients: Dict[str, _ClientEntry] = {}
+_clients_lock = threading.Lock()
+
+
+def _key_id(api_key: str) -> str:
+    # Se indexa por hash para no mantener ni registrar la clave en claro en métricas o logs.
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _entry(api_key: str) -> _ClientEntry:
+    key_id = _key_id(api_key)
+    entry = _clients.get(key_id)
+    if entry is None:
+        with _clients_lock:
+            entry = _clients.get(key_id)
+            if entry is None:
+                entry = _clients[key_id] = _ClientEntry(api_key)
+                logger.info(f"Cliente OpenAI compartido creado (clave {key_id}, hasta {OPENAI_MAX_CONNECTIONS} conexiones)")
+    return entry
+
+
+def get_openai_client(api_key: str) -> Optional[OpenAI]:
+    """Cliente OpenAI síncrono del proceso para `api_key`; reutiliza conexiones keep-alive."""
+    return _entry(api_key).client if api_key else None
+
+
+def _open_connections(http_client: Any) -> Optional[int]:
+    # httpx no expone el pool; se lee del transporte de httpcore si está disponible.
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    return len(connections) if connections is not None else None
+
+
+def pool_metrics() -> Dict[str, Dict[str, Any]]:
+    """Métricas por clave: peticiones, conexiones nuevas, abiertas y ratio de reutilización."""
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for key_id, entry in list(_clients.items()):
+        stats = entry.stats
+        reuse = 1 - stats.new_connections / stats.requests if stats.requests else 0.0
+        metrics[key_id] = {
+            "requests": stats.requests,
+            "new_connections": stats.new_connections,
+            "open_connections": _open_connections(entry.http_client),
+            "reuse_ratio": round(max(reuse, 0.0), 3),
+        }
+    return metrics
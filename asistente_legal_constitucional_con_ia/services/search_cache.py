@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("asistente_legal")
+
+# TTL por tipo de documento: las gacetas son inmutables, las sentencias casi nunca cambian.
+TTL_BY_TIPO_S = {
+    "gaceta": 90 * 24 * 3600,
+    "sentencia": 30 * 24 * 3600,
+    "ley": 7 * 24 * 3600,
+}
+DEFAULT_TTL_S = 24 * 3600
+LOCAL_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+REDIS_PREFIX = "leyia:search:"
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def make_key(final_query: str, tipo_documento: str, sitio_preferido: Optional[str]) -> str:
+    raw = "|".join((_normalize(final_query), _normalize(tipo_documento), _normalize(sitio_preferido)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """Caché de resultados de búsqueda con dos niveles.
+
+    - Nivel local: LRU en memoria del proceso (acceso en microsegundos).
+    - Nivel compartido: Redis (si REDIS_URL está definida), común a todos los workers.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES, redis_url: Optional[str] = None):
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._redis = None
+        self.stats: Dict[str, int] = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+        if redis_url:
+            try:
+                import redis
+
+                self._redis = redis.Redis.from_url(redis_url, socket_timeout=1)
+            except Exception as e:
+                logger.warning(f"Caché de búsqueda sin Redis: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[0] > now:
+                self._local.move_to_end(key)
+                self.stats["local_hits"] += 1
+                return entry[1]
+            if entry:
+                del self._local[key]
+        if self._redis is not None:
+            try:
+                value = self._redis.get(REDIS_PREFIX + key)
+                if value is not None:
+                    ttl = self._redis.ttl(REDIS_PREFIX + key)
+                    text = value.decode("utf-8")
+                    self._store_local(key, text, ttl if ttl and ttl > 0 else DEFAULT_TTL_S)
+                    with self._lock:
+                        self.stats["shared_hits"] += 1
+                    return text
+            except Exception as e:
+                logger.warning(f"Error leyendo caché compartida: {e}")
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str, ttl_s: int) -> None:
+        self._store_local(key, value, ttl_s)
+        if self._redis is not None:
+            try:
+                self._redis.set(REDIS_PREFIX + key, value.encode("utf-8"), ex=ttl_s)
+            except Exception as e:
+                logger.warning(f"Error escribiendo caché compartida: {e}")
+
+    def _store_local(self, key: str, value: str, ttl_s: int) -> None:
+        with self._lock:
+            self._local[key] = (time.time() + ttl_s, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+
+search_cache = SearchCache(redis_url=os.getenv("REDIS_URL", "").strip() or None)
+
+
+def ttl_for(tipo_documento: str) -> int:
+    return TTL_BY_TIPO_S.get(tipo_documento, DEFAULT_TTL_S)
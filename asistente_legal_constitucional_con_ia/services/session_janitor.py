@@ -0,0 +1,239 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import reflex as rx
+from openai import NotFoundError, OpenAI
+from sqlalchemy import delete, or_
+
+from ..models.database import SessionFile
+from .file_deletion import drain_retry_queue, release_files
+from .openai_clients import get_openai_client, pool_metrics
+
+logger = logging.getLogger("asistente_legal")
+
+JANITOR_INTERVAL_S = float(os.getenv("JANITOR_INTERVAL_S", "300"))
+FILE_MAX_AGE_S = float(os.getenv("SESSION_FILE_MAX_AGE_S", "7200"))
+THREAD_CHECK_INTERVAL_S = float(os.getenv("JANITOR_THREAD_CHECK_INTERVAL_S", "900"))
+JANITOR_MAX_CALLS_PER_S = float(os.getenv("JANITOR_MAX_CALLS_PER_S", "5"))
+JANITOR_CONCURRENCY = int(os.getenv("JANITOR_CONCURRENCY", "4"))
+JANITOR_SWEEP_BUDGET_S = float(os.getenv("JANITOR_SWEEP_BUDGET_S", "120"))
+JANITOR_BATCH_SIZE = 100
+LEASE_S = 300
+
+# Funciones síncronas (acceso a BD): llamarlas con asyncio.to_thread desde los handlers.
+
+
+def track_file(session_id: str, thread_id: Optional[str], file_id: str, filename: str) -> None:
+    with rx.session() as session:
+        session.add(SessionFile(session_id=session_id, thread_id=thread_id, file_id=file_id, filename=filename))
+        session.commit()
+
+
+def set_thread(session_id: str, thread_id: Optional[str]) -> None:
+    """Asocia los archivos de la sesión al thread actual (para detectar threads eliminados)."""
+    with rx.session() as session:
+        for row in session.exec(SessionFile.select().where(SessionFile.session_id == session_id)).all():
+            row.thread_id = thread_id
+            session.add(row)
+        session.commit()
+
+
+def _delete_returning(condition) -> List[str]:
+    # Borrar la fila es la compuerta para liberar la referencia compartida: solo quien
+    # la borra libera el archivo, así una sesión y el janitor nunca liberan dos veces.
+    with rx.session() as session:
+        file_ids = session.exec(delete(SessionFile).where(condition).returning(SessionFile.file_id)).scalars().all()
+        session.commit()
+        return list(file_ids)
+
+
+def untrack_files(session_id: str, file_ids: Optional[List[str]] = None) -> List[str]:
+    """Quita archivos del registro y devuelve los file_id cuyas filas borró esta llamada (a liberar).
+
+    Sin `file_ids`, todos los de la sesión. Los que el janitor ya borró no se devuelven.
+    """
+    condition = SessionFile.session_id == session_id
+    if file_ids is not None:
+        condition = condition & SessionFile.file_id.in_(file_ids)
+    return _delete_returning(condition)
+
+
+def tracked_file_ids(session_id: str) -> set[str]:
+    with rx.session() as session:
+        return {row.file_id for row in session.exec(SessionFile.select().where(SessionFile.session_id == session_id)).all()}
+
+
+def _claim(session, query, now: datetime) -> List[SessionFile]:
+    rows = session.exec(query.where(or_(SessionFile.locked_until.is_(None), SessionFile.locked_until < now)).limit(JANITOR_BATCH_SIZE).with_for_update(skip_locked=True)).all()
+    for row in rows:
+        row.locked_until = now + timedelta(seconds=LEASE_S)
+        session.add(row)
+    return rows
+
+
+def claim_expired_files(max_age_s: float = FILE_MAX_AGE_S) -> List[int]:
+    """Reclama (ids de fila) archivos más antiguos que `max_age_s` (SKIP LOCKED entre workers)."""
+    now = datetime.now()
+    with rx.session() as session:
+        rows = _claim(session, SessionFile.select().where(SessionFile.uploaded_at < now - timedelta(seconds=max_age_s)), now)
+        session.commit()
+        return [row.id for row in rows]
+
+
+def claim_thread_checks(interval_s: float = THREAD_CHECK_INTERVAL_S) -> List[str]:
+    """Threads cuyo último chequeo venció; se marcan como revisados al reclamarlos."""
+    now = datetime.now()
+    with rx.session() as session:
+        rows = session.exec(
+            SessionFile.select()
+            .where(SessionFile.thread_id.is_not(None))
+            .where(or_(SessionFile.checked_at.is_(None), SessionFile.checked_at < now - timedelta(seconds=interval_s)))
+            .limit(JANITOR_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).all()
+        for row in rows:
+            row.checked_at = now
+            session.add(row)
+        session.commit()
+        return sorted({row.thread_id for row in rows})
+
+
+def claim_thread_files(thread_ids: List[str]) -> List[int]:
+    now = datetime.now()
+    with rx.session() as session:
+        rows = _claim(session, SessionFile.select().where(SessionFile.thread_id.in_(thread_ids)), now)
+        session.commit()
+        return [row.id for row in rows]
+
+
+def delete_rows(row_ids: List[int]) -> List[str]:
+    """Borra filas reclamadas y devuelve los file_id de las que seguían existiendo (a liberar)."""
+    return _delete_returning(SessionFile.id.in_(row_ids))
+
+
+class RateLimiter:
+    """Concurrencia acotada y un mínimo de separación entre llamadas a la API."""
+
+    def __init__(self, max_calls_per_s: float, concurrency: int):
+        self.interval_s = 1.0 / max(max_calls_per_s, 0.001)
+        self.concurrency = max(1, concurrency)
+        self._next_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        # Primitivas creadas perezosamente para quedar ligadas al event loop del worker.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            async with self._lock:
+                wait = self._next_at - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_at = time.monotonic() + self.interval_s
+            yield
+
+
+class SessionJanitor:
+    """Janitor único por proceso para archivos y threads de las sesiones de chat.
+
+    Reemplaza los bucles infinitos por sesión (monitor de salud cada 5 min y limpieza
+    por antigüedad cada hora): una sola tarea recorre la tabla `sessionfile` por lotes,
+    con las llamadas a OpenAI limitadas en tasa y concurrencia. Como el registro es
+    persistente, los archivos pendientes se limpian también tras un reinicio.
+    """
+
+    def __init__(self):
+        self.limiter = RateLimiter(JANITOR_MAX_CALLS_PER_S, JANITOR_CONCURRENCY)
+        self.stats: Dict[str, int] = {"sweeps": 0, "files_released": 0, "files_failed": 0, "threads_checked": 0, "threads_missing": 0}
+        self._client: Optional[OpenAI] = None
+
+    async def run(self) -> None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            logger.warning("Janitor de sesiones deshabilitado: OPENAI_API_KEY no configurada")
+            return
+        self._client = get_openai_client(api_key)
+        logger.info(f"Janitor de sesiones iniciado (cada {JANITOR_INTERVAL_S:.0f}s)")
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error en el janitor de sesiones: {e}", exc_info=True)
+            await asyncio.sleep(JANITOR_INTERVAL_S)
+
+    async def sweep(self) -> None:
+        """Un barrido: reintentos pendientes, luego lotes de archivos expirados y de threads.
+
+        Cada fase reclama lotes hasta vaciar la cola o agotar el presupuesto de tiempo del
+        barrido; lo que quede lo toma el siguiente barrido.
+        """
+        deadline = time.monotonic() + JANITOR_SWEEP_BUDGET_S
+        retried = await drain_retry_queue(self._client)
+        self.stats["files_released"] += retried.deleted
+        self.stats["files_failed"] += retried.failed
+
+        expired = 0
+        while time.monotonic() < deadline:
+            row_ids = await asyncio.to_thread(claim_expired_files)
+            if not row_ids:
+                break
+            expired += len(row_ids)
+            await self._release(row_ids)
+
+        checked = 0
+        while time.monotonic() < deadline:
+            thread_ids = await asyncio.to_thread(claim_thread_checks)
+            if not thread_ids:
+                break
+            checked += len(thread_ids)
+            await self._check_threads(thread_ids)
+
+        self.stats["sweeps"] += 1
+        if expired or checked or retried.deleted or retried.failed:
+            logger.info(f"Janitor: {expired} archivos expirados, {checked} threads revisados. Acumulado: {self.stats}")
+        logger.info(f"Pools de conexiones OpenAI: {pool_metrics()}")
+
+    async def _check_threads(self, thread_ids: List[str]) -> None:
+        checks = await asyncio.gather(*(self._thread_exists(thread_id) for thread_id in thread_ids))
+        missing = [thread_id for thread_id, exists in zip(thread_ids, checks) if not exists]
+        self.stats["threads_checked"] += len(thread_ids)
+        self.stats["threads_missing"] += len(missing)
+        if missing:
+            logger.warning(f"Janitor: {len(missing)} threads no encontrados; liberando sus archivos")
+            # Un thread puede tener más archivos que un lote: se reclaman hasta agotarlos.
+            while row_ids := await asyncio.to_thread(claim_thread_files, missing):
+                await self._release(row_ids)
+
+    async def _thread_exists(self, thread_id: str) -> bool:
+        async with self.limiter.slot():
+            try:
+                await asyncio.to_thread(self._client.beta.threads.retrieve, thread_id)
+                return True
+            except NotFoundError:
+                return False
+            except Exception as e:
+                # Ante errores transitorios se asume que existe; se revisa en el próximo ciclo.
+                logger.warning(f"Janitor: no se pudo verificar el thread {thread_id}: {e}")
+                return True
+
+    async def _release(self, row_ids: List[int]) -> None:
+        if not row_ids:
+            return
+        # Solo se liberan las filas que este barrido borró: si la sesión las quitó antes
+        # (borrado del usuario o logout), ya liberó ella la referencia.
+        file_ids = await asyncio.to_thread(delete_rows, row_ids)
+        # Los fallos quedan en la cola persistente de reintentos.
+        report = await release_files(self._client, file_ids)
+        self.stats["files_released"] += report.deleted
+        self.stats["files_failed"] += report.failed
+
+
+session_janitor = SessionJanitor()
@@ -0,0 +1,68 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import AsyncIterator, Iterable, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def aiter_in_thread(stream: Iterable[T], maxsize: int = 256) -> AsyncIterator[T]:
+    """Consume un iterable síncrono (p. ej. el stream de OpenAI) desde un hilo lector.
+
+    Cada lectura bloqueante del socket ocurre en un hilo dedicado que alimenta una
+    `asyncio.Queue`; el event loop solo espera en la cola, así que un stream lento no
+    bloquea al resto de sesiones. Si el consumidor deja de iterar (break/cancelación)
+    se cierra el stream para liberar la conexión y terminar el hilo.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(item) -> None:
+        # Si el consumidor ya se fue, nadie leerá la cola (y su loop puede estar cerrado).
+        if stop.is_set():
+            return
+        # Espera a que haya espacio en la cola (backpressure) sin bloquear el loop.
+        try:
+            fut = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        except RuntimeError:  # loop cerrado
+            return
+        while not stop.is_set():
+            try:
+                fut.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+        fut.cancel()
+
+    def _reader() -> None:
+        try:
+            for item in stream:
+                if stop.is_set():
+                    break
+                _put(item)
+        except BaseException as e:  # propagar al consumidor
+            _put(e)
+        finally:
+            _put(_DONE)
+
+    thread = threading.Thread(target=_reader, name="openai-stream-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        close = getattr(stream, "close", None)
+        if callable(close):
+            try:
+                await asyncio.to_thread(close)
+            except Exception:
+                pass
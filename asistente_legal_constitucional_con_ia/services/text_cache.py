@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, Optional
+
+from ..util.text_extraction import EXTRACTOR_VERSION
+
+logger = logging.getLogger("asistente_legal")
+
+CACHE_DIR = os.getenv("LEYIA_CACHE_DIR", os.path.join(os.getcwd(), ".leyia_cache"))
+TEXT_CACHE_DIR = os.path.join(CACHE_DIR, "extracted_text")
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+class TextCache:
+    """Caché en disco del texto extraído, indexado por SHA-256 del documento + versión del extractor.
+
+    Los textos se guardan comprimidos con zlib. La expulsión es LRU por tamaño total,
+    usando el mtime de cada blob (se actualiza en cada acierto). Al cambiar
+    EXTRACTOR_VERSION las entradas antiguas dejan de coincidir y se purgan al iniciar.
+    """
+
+    def __init__(self, directory: str = TEXT_CACHE_DIR, max_bytes: int = TEXT_CACHE_MAX_BYTES, version: str = EXTRACTOR_VERSION):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "bytes_saved": 0, "evictions": 0}
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.v{self.version}.z")
+
+    def _ensure_ready(self) -> None:
+        if self._total_bytes is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        total = 0
+        suffix = f".v{self.version}.z"
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(suffix):
+                # Entrada de otra versión del extractor: invalidada.
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            total += entry.stat().st_size
+        self._total_bytes = total
+
+    def get(self, digest: str, original_size: int = 0) -> Optional[str]:
+        path = self._path(digest)
+        try:
+            with self._lock:
+                self._ensure_ready()
+            with open(path, "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            text = None
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning(f"Entrada de caché de texto ilegible ({digest}): {e}")
+            text = None
+        with self._lock:
+            if text is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+                self.stats["bytes_saved"] += original_size
+            hits, misses = self.stats["hits"], self.stats["misses"]
+        logger.info(f"Caché de texto: {'acierto' if text is not None else 'fallo'} (tasa de aciertos {hits / max(hits + misses, 1):.0%}, " f"bytes ahorrados {self.stats['bytes_saved']:,})")
+        return text
+
+    def put(self, digest: str, text: str) -> None:
+        data = zlib.compress(text.encode("utf-8"), 6)
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                self._ensure_ready()
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._total_bytes += len(data)
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en caché de texto: {e}")
+
+    def _evict(self) -> None:
+        entries = sorted((e for e in os.scandir(self.directory) if e.name.endswith(".z")), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        target = int(self.max_bytes * 0.9)
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+                self.stats["evictions"] += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+
+
+text_cache = TextCache()
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Dict, List
 
 import tiktoken
@@ -13,14 +14,18 @@ MODEL_TO_ENCODING = {
 }
 
 
-def _get_encoding(model: str):
-    name = MODEL_TO_ENCODING.get(model, "o200k_base")
+@lru_cache(maxsize=None)
+def _get_encoding_by_name(name: str):
     try:
         return tiktoken.get_encoding(name)
     except Exception:
         return tiktoken.get_encoding("cl100k_base")
 
 
+def _get_encoding(model: str):
+    return _get_encoding_by_name(MODEL_TO_ENCODING.get(model, "o200k_base"))
+
+
 def count_text_tokens(text: str, model: str) -> int:
     enc = _get_encoding(model)
     return len(enc.encode(text or ""))
@@ -36,3 +41,39 @@ def count_chat_tokens(messages: List[Dict[str, str]], model: str) -> int:
         tokens += len(enc.encode(m.get("content", "")))
     tokens += 3
     return tokens
+
+
+class StreamingTokenCounter:
+    """Cuenta tokens de una respuesta que llega por fragmentos.
+
+    En lugar de re-codificar todo el texto acumulado en cada flush, solo se
+    tokeniza una ventana final. Cuando la ventana crece, se consolida la parte
+    anterior al último espacio (frontera natural de token) y se conserva una cola
+    corta para que los tokens que cruzan la frontera se cuenten al llegar más texto.
+    """
+
+    def __init__(self, model: str, window_chars: int = 512, tail_chars: int = 64):
+        self._enc = _get_encoding(model)
+        self._window_chars = window_chars
+        self._tail_chars = tail_chars
+        self._committed = 0
+        self._tail = ""
+        self._tail_tokens = 0
+
+    def feed(self, delta: str) -> int:
+        """Agrega un fragmento y devuelve el total aproximado de tokens."""
+        if delta:
+            self._tail += delta
+            if len(self._tail) > self._window_chars:
+                limit = len(self._tail) - self._tail_chars
+                split = max(self._tail.rfind(" ", 0, limit), self._tail.rfind("\n", 0, limit))
+                if split <= 0:
+                    split = limit
+                self._committed += len(self._enc.encode(self._tail[:split]))
+                self._tail = self._tail[split:]
+            self._tail_tokens = len(self._enc.encode(self._tail))
+        return self.total
+
+    @property
+    def total(self) -> int:
+        return self._committed + self._tail_tokens
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List
+
+from ..util.citations import split_citation
+
+logger = logging.getLogger("asistente_legal")
+
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "120"))
+TOOL_MAX_CONCURRENCY_PER_SESSION = int(os.getenv("TOOL_MAX_CONCURRENCY_PER_SESSION", "3"))
+TOOL_MAX_CONCURRENCY_GLOBAL = int(os.getenv("TOOL_MAX_CONCURRENCY_GLOBAL", "16"))
+
+# Límites superiores (segundos) de los buckets del histograma de latencia.
+LATENCY_BUCKETS_S = (0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+_global_semaphore: asyncio.Semaphore | None = None
+_latency_histogram: Dict[str, List[int]] = {}
+
+
+def _get_global_semaphore() -> asyncio.Semaphore:
+    # Se crea perezosamente para quedar ligado al event loop del worker.
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY_GLOBAL)
+    return _global_semaphore
+
+
+def _observe_latency(tool_name: str, seconds: float) -> None:
+    buckets = _latency_histogram.setdefault(tool_name, [0] * (len(LATENCY_BUCKETS_S) + 1))
+    buckets[bisect_left(LATENCY_BUCKETS_S, seconds)] += 1
+
+
+def tool_latency_histogram() -> Dict[str, Dict[str, int]]:
+    """Histograma acumulado por herramienta, con etiquetas tipo '<=2s' y '>120s'."""
+    labels = [f"<={b}s" for b in LATENCY_BUCKETS_S] + [f">{LATENCY_BUCKETS_S[-1]}s"]
+    return {name: dict(zip(labels, counts)) for name, counts in _latency_histogram.items()}
+
+
+def _dedup_key(tool_call) -> str:
+    """Clave de deduplicación: misma herramienta y argumentos equivalentes (citas canónicas)."""
+    try:
+        arguments = json.loads(tool_call.function.arguments)
+        citation, remainder = split_citation(str(arguments.get("query", "")), arguments.get("tipo_documento"))
+    except Exception:
+        return f"{tool_call.function.name}:{tool_call.function.arguments}"
+    if citation and citation.tipo == arguments.get("tipo_documento"):
+        # El resto de términos es parte de la clave: dos artículos de una misma ley no se fusionan.
+        arguments["query"] = f"{citation.canonical_id} {remainder}".strip()
+    return f"{tool_call.function.name}:{json.dumps(arguments, sort_keys=True)}"
+
+
+async def run_tool_calls(tool_calls: List[Any], available_tools: Dict[str, Callable[..., str]]) -> List[Dict[str, str]]:
+    """Ejecuta concurrentemente los tool_calls de un evento requires_action.
+
+    La concurrencia está acotada por sesión (esta llamada) y globalmente por worker.
+    Cada llamada tiene su propio timeout; si vence o falla, se devuelve un mensaje de
+    error como output para poder enviar igualmente los resultados parciales.
+    Las llamadas equivalentes (misma cita canónica) se ejecutan una sola vez.
+    """
+    session_semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY_PER_SESSION)
+    global_semaphore = _get_global_semaphore()
+
+    async def _run_one(tool_call) -> str:
+        function_name = tool_call.function.name
+        started = time.perf_counter()
+        try:
+            if function_name not in available_tools:
+                output = f"Error: la herramienta {function_name} no está disponible."
+            else:
+                arguments = json.loads(tool_call.function.arguments)
+                async with session_semaphore, global_semaphore:
+                    output = await asyncio.wait_for(
+                        asyncio.to_thread(available_tools[function_name], **arguments),
+                        timeout=TOOL_TIMEOUT_S,
+                    )
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout ejecutando herramienta {function_name}")
+            output = f"Error: La herramienta {function_name} tardó demasiado."
+        except Exception as e:
+            logger.error(f"Error en herramienta {function_name}: {e}")
+            output = f"Error ejecutando {function_name}: {str(e)}"
+        elapsed = time.perf_counter() - started
+        _observe_latency(function_name, elapsed)
+        logger.info(f"Herramienta {function_name} completada en {elapsed:.2f}s")
+        return output
+
+    groups: Dict[str, List[Any]] = {}
+    for tool_call in tool_calls:
+        groups.setdefault(_dedup_key(tool_call), []).append(tool_call)
+    outputs = await asyncio.gather(*(_run_one(calls[0]) for calls in groups.values()))
+    return [{"tool_call_id": tc.id, "output": output} for calls, output in zip(groups.values(), outputs) for tc in calls]
@@ -0,0 +1,578 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import assemblyai
+import reflex as rx
+from assemblyai import api as assemblyai_api
+from sqlalchemy import or_, update
+
+from ..models.database import AudioTranscription, Notebook, TranscriptionJob
+from . import audio_segments
+from .audio_segments import Segment, segments_from_json, segments_to_json
+from .audio_store import audio_store
+
+logger = logging.getLogger("asistente_legal")
+
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+POLL_INITIAL_S = float(os.getenv("TRANSCRIPTION_POLL_INITIAL_S", "5"))
+POLL_MAX_S = float(os.getenv("TRANSCRIPTION_POLL_MAX_S", "60"))
+POLL_BACKOFF = 1.5
+# Lease del worker sobre un trabajo. Mientras lo procesa lo renueva cada LEASE_S / 3, así una
+# subida larga a AssemblyAI no deja que otro worker del mismo host lo reclame y lo envíe dos veces.
+LEASE_S = 600
+IDLE_SLEEP_S = 2.0
+MAX_SUBMIT_ATTEMPTS = 3
+HOST = socket.gethostname()
+# Un trabajo pendiente sin cambios ni lease por este tiempo quedó huérfano (su host ya no
+# existe o perdió el audio): se marca fallido para que la UI no espere indefinidamente.
+PENDING_STALE_S = float(os.getenv("TRANSCRIPTION_PENDING_STALE_S", "1800"))
+STALE_CHECK_INTERVAL_S = 60.0
+
+# Webhook de AssemblyAI: si hay URL pública, el sondeo queda solo como respaldo (más espaciado).
+WEBHOOK_URL = os.getenv("ASSEMBLYAI_WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_SECRET = os.getenv("ASSEMBLYAI_WEBHOOK_SECRET", "")
+WEBHOOK_AUTH_HEADER = "X-Leyia-Webhook-Secret"
+FALLBACK_POLL_INITIAL_S = float(os.getenv("TRANSCRIPTION_FALLBACK_POLL_S", "120"))
+FALLBACK_POLL_MAX_S = float(os.getenv("TRANSCRIPTION_FALLBACK_POLL_MAX_S", "600"))
+
+# Modo por segmentos (opcional, requiere ffmpeg): audios largos se parten en silencios y
+# los tramos se transcriben en paralelo; el notebook se actualiza a medida que terminan.
+CHUNKED_ENABLED = os.getenv("TRANSCRIPTION_CHUNKED", "0") == "1"
+CHUNKED_MIN_S = float(os.getenv("TRANSCRIPTION_CHUNKED_MIN_S", "1800"))
+SEGMENT_SUBMIT_CONCURRENCY = 4
+
+ACTIVE_STATUSES = ("pending", "submitted", "processing")
+
+# Funciones síncronas (acceso a BD): llamarlas con asyncio.to_thread desde los handlers.
+
+
+def enqueue(workspace_id: str, filename: str, audio_handle: str) -> int:
+    """Crea un trabajo pendiente para un audio ya guardado en el almacén local."""
+    with rx.session() as session:
+        job = TranscriptionJob(workspace_id=workspace_id, filename=filename, audio_handle=audio_handle, host=HOST)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        logger.info(f"Trabajo de transcripción {job.id} encolado para '{filename}'")
+        return job.id
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    with rx.session() as session:
+        job = session.get(TranscriptionJob, job_id)
+        if not job:
+            return None
+        progress = None
+        if job.segments:
+            segments = segments_from_json(job.segments)
+            progress = f"{sum(seg.status == 'completed' for seg in segments)}/{len(segments)}"
+        return {"id": job.id, "status": job.status, "filename": job.filename, "error": job.error, "notebook_id": job.notebook_id, "workspace_id": job.workspace_id, "progress": progress}
+
+
+def latest_active_job(workspace_id: str) -> Optional[int]:
+    """Trabajo en curso más reciente del workspace (para retomarlo al volver a la página)."""
+    with rx.session() as session:
+        job = session.exec(
+            TranscriptionJob.select()
+            .where(TranscriptionJob.workspace_id == workspace_id)
+            .where(TranscriptionJob.status.in_(ACTIVE_STATUSES))
+            .order_by(TranscriptionJob.created_at.desc())
+        ).first()
+        return job.id if job else None
+
+
+def claim_due_jobs(worker_id: str, limit: int) -> list[int]:
+    """Reclama hasta `limit` trabajos vencidos con SELECT ... FOR UPDATE SKIP LOCKED.
+
+    Varios workers (o procesos) pueden llamarla a la vez sin tomar el mismo trabajo.
+    Los trabajos aún no enviados solo los toma el host que tiene el audio.
+    """
+    now = datetime.now()
+    with rx.session() as session:
+        jobs = session.exec(
+            TranscriptionJob.select()
+            .where(TranscriptionJob.status.in_(ACTIVE_STATUSES))
+            .where(TranscriptionJob.next_poll_at <= now)
+            .where(or_(TranscriptionJob.locked_until.is_(None), TranscriptionJob.locked_until < now))
+            .where(or_(TranscriptionJob.status != "pending", TranscriptionJob.host == HOST))
+            .order_by(TranscriptionJob.next_poll_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        for job in jobs:
+            job.locked_by = worker_id
+            job.locked_until = now + timedelta(seconds=LEASE_S)
+            session.add(job)
+        session.commit()
+        return [job.id for job in jobs]
+
+
+def renew_lease(job_id: int, worker_id: str) -> bool:
+    """Extiende el lease de `worker_id` sobre el trabajo. False si ya no lo tiene."""
+    with rx.session() as session:
+        result = session.exec(
+            update(TranscriptionJob)
+            .where(TranscriptionJob.id == job_id)
+            .where(TranscriptionJob.locked_by == worker_id)
+            .values(locked_until=datetime.now() + timedelta(seconds=LEASE_S))
+        )
+        session.commit()
+        return result.rowcount > 0
+
+
+def fail_stale_pending(stale_s: float = PENDING_STALE_S) -> int:
+    """Marca fallidos los trabajos pendientes huérfanos (cualquier host puede hacerlo). Devuelve cuántos."""
+    now = datetime.now()
+    with rx.session() as session:
+        result = session.exec(
+            update(TranscriptionJob)
+            .where(TranscriptionJob.status == "pending")
+            .where(TranscriptionJob.updated_at < now - timedelta(seconds=stale_s))
+            .where(or_(TranscriptionJob.locked_until.is_(None), TranscriptionJob.locked_until < now))
+            .values(status="failed", error="El servidor que recibió el audio ya no está disponible; vuelve a subir el archivo.", updated_at=now)
+        )
+        session.commit()
+        return result.rowcount
+
+
+def mark_due(job_id: Optional[int] = None, transcript_id: Optional[str] = None) -> Optional[int]:
+    """Adelanta el próximo sondeo de un trabajo notificado por webhook. Devuelve su id.
+
+    Los tramos de un trabajo por segmentos se identifican por `job_id` (va en la URL del
+    webhook); los envíos simples también por `transcript_id`.
+    """
+    with rx.session() as session:
+        if job_id is not None:
+            job = session.get(TranscriptionJob, job_id)
+        else:
+            job = session.exec(TranscriptionJob.select().where(TranscriptionJob.transcript_id == transcript_id)).first()
+        if not job or job.status not in ACTIVE_STATUSES:
+            return None
+        job.next_poll_at = datetime.now()
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+        return job.id
+
+
+def _snapshot(job_id: int) -> Optional[Dict[str, Any]]:
+    with rx.session() as session:
+        job = session.get(TranscriptionJob, job_id)
+        if not job:
+            return None
+        return {"id": job.id, "status": job.status, "audio_handle": job.audio_handle, "transcript_id": job.transcript_id, "attempts": job.attempts, "segments": job.segments}
+
+
+def _update(job_id: int, **fields: Any) -> None:
+    """Actualiza el trabajo y libera el lease del worker."""
+    with rx.session() as session:
+        job = session.get(TranscriptionJob, job_id)
+        if not job:
+            return
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.locked_by = None
+        job.locked_until = None
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+
+
+def save_submitted_segments(job_id: int, segments_json: str) -> None:
+    """Persiste los tramos a medida que se envían, sin liberar el lease.
+
+    Si el envío de otro tramo falla, el reintento solo reenvía los que no tienen
+    `transcript_id` (los ya enviados se facturan y no deben quedar huérfanos).
+    """
+    with rx.session() as session:
+        job = session.get(TranscriptionJob, job_id)
+        if not job:
+            return
+        job.segments = segments_json
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+
+
+def _backoff_s(attempts: int) -> float:
+    if WEBHOOK_URL:
+        return min(FALLBACK_POLL_MAX_S, FALLBACK_POLL_INITIAL_S * POLL_BACKOFF**attempts)
+    return min(POLL_MAX_S, POLL_INITIAL_S * POLL_BACKOFF**attempts)
+
+
+def _format_duration(duration_secs: float) -> str:
+    return f"{int(duration_secs // 60)}:{int(duration_secs % 60):02d}"
+
+
+def _format_utterances(utterances: list) -> str:
+    lines = [f"**Hablante {utt['speaker']}:** {utt['text']}" for utt in utterances]
+    return "## Transcripción con Identificación de Hablantes\n\n" + "\n\n".join(lines)
+
+
+def format_transcript(transcript: assemblyai.Transcript) -> tuple[str, str]:
+    """Texto de la transcripción (con hablantes si los hay) y duración mm:ss."""
+    if transcript.utterances:
+        transcription_text = _format_utterances([{"speaker": utt.speaker, "text": utt.text} for utt in transcript.utterances])
+    else:
+        transcription_text = transcript.text or ""
+    return transcription_text, _format_duration(transcript.audio_duration or 0)
+
+
+def format_segments(segments: list[Segment]) -> tuple[str, str, bool]:
+    """Texto unido de los tramos terminados en orden, duración y si ya está completo."""
+    utterances, joined = audio_segments.stitch_segments(segments)
+    complete = joined == len(segments)
+    transcription_text = _format_utterances(utterances) if utterances else ""
+    if not complete:
+        transcription_text += f"\n\n_⏳ Transcripción en curso: {joined}/{len(segments)} segmentos listos..._"
+    return transcription_text, _format_duration(segments[-1].end_s if complete else segments[joined - 1].end_s if joined else 0), complete
+
+
+def build_notebook_content(transcription_text: str, title: str, filename: str) -> Dict[str, Any]:
+    """Convierte una transcripción a formato notebook JSON."""
+    now = datetime.now().strftime("%d/%m/%Y a las %H:%M")
+    header_cell = {"cell_type": "markdown", "source": [f"# {title}\n\n", f"**Archivo:** {filename}\n\n", f"**Generado:** {now}\n\n", "---\n\n"]}
+    content_cell = {"cell_type": "markdown", "source": ["## 📝 Transcripción Completa\n\n", f"{transcription_text}\n\n"]}
+    return {"cells": [header_cell, content_cell], "metadata": {"kernelspec": {"display_name": "Audio Transcription", "language": "markdown", "name": "audio_transcription"}}}
+
+
+def _write_result(session, job: TranscriptionJob, transcription_text: str, duration: str) -> None:
+    """Crea el notebook y la transcripción del trabajo, o los actualiza si ya existen."""
+    title = f"Transcripción - {os.path.splitext(job.filename)[0]}"
+    content = json.dumps(build_notebook_content(transcription_text, title, job.filename))
+    notebook = session.get(Notebook, job.notebook_id) if job.notebook_id is not None else None
+    if notebook is None:
+        notebook = Notebook(title=title, content=content, workspace_id=job.workspace_id, notebook_type="transcription")
+        session.add(notebook)
+        session.flush()
+        session.add(
+            AudioTranscription(
+                filename=job.filename,
+                transcription_text=transcription_text,
+                notebook_id=notebook.id,
+                audio_duration=duration,
+                workspace_id=job.workspace_id,
+            )
+        )
+        job.notebook_id = notebook.id
+        return
+    notebook.content = content
+    notebook.updated_at = datetime.now()
+    session.add(notebook)
+    transcription = session.exec(AudioTranscription.select().where(AudioTranscription.notebook_id == notebook.id)).first()
+    if transcription:
+        transcription.transcription_text = transcription_text
+        transcription.audio_duration = duration
+        transcription.updated_at = datetime.now()
+        session.add(transcription)
+
+
+def complete_job(job_id: int, transcription_text: str, duration: str) -> Optional[int]:
+    """Guarda notebook + transcripción y marca el trabajo completado, en una sola transacción.
+
+    Idempotente: si el trabajo ya está completado (p. ej. otro worker lo terminó tras un
+    lease vencido), no escribe nada y devuelve el notebook existente.
+    """
+    with rx.session() as session:
+        job = session.exec(TranscriptionJob.select().where(TranscriptionJob.id == job_id).with_for_update()).first()
+        if not job:
+            return None
+        if job.status == "completed":
+            return job.notebook_id
+
+        _write_result(session, job, transcription_text, duration)
+        job.status = "completed"
+        job.error = None
+        job.locked_by = None
+        job.locked_until = None
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+        return job.notebook_id
+
+
+def save_segment_progress(job_id: int, segments: list[Segment], attempts: int, next_poll_at: datetime) -> Optional[int]:
+    """Guarda el avance de un trabajo por segmentos y publica el texto unido hasta ahora.
+
+    Notebook, transcripción y estado de los tramos se escriben en la misma transacción;
+    al terminar el último tramo el trabajo queda completado.
+    """
+    transcription_text, duration, complete = format_segments(segments)
+    with rx.session() as session:
+        job = session.exec(TranscriptionJob.select().where(TranscriptionJob.id == job_id).with_for_update()).first()
+        if not job or job.status == "completed":
+            return job.notebook_id if job else None
+        if transcription_text.strip() and any(seg.status == "completed" for seg in segments):
+            _write_result(session, job, transcription_text, duration)
+        job.segments = segments_to_json(segments)
+        job.status = "completed" if complete else "processing"
+        job.attempts = attempts
+        job.next_poll_at = next_poll_at
+        job.locked_by = None
+        job.locked_until = None
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+        return job.notebook_id
+
+
+def fetch_transcript(transcript_id: str) -> assemblyai.Transcript:
+    """Estado actual de un transcript en una sola consulta.
+
+    `Transcript.get_by_id` sondea hasta que el transcript termina, bloqueando un hilo y
+    saltándose el backoff del pool.
+    """
+    client = assemblyai.Client.get_default()
+    return assemblyai.Transcript.from_response(client=client, response=assemblyai_api.get_transcript(client.http_client, transcript_id))
+
+
+def configure_assemblyai() -> None:
+    api_key = os.getenv("ASSEMBLYAI_API_KEY")
+    if not api_key:
+        raise ValueError("API key de AssemblyAI no configurada en .env")
+    assemblyai.settings.api_key = api_key
+    assemblyai.settings.http_timeout = 300
+    # Permite apuntar a un servidor AssemblyAI falso en pruebas locales.
+    base_url = os.getenv("ASSEMBLYAI_BASE_URL")
+    if base_url:
+        assemblyai.settings.base_url = base_url
+
+
+class TranscriptionWorkerPool:
+    """Pool de workers por proceso que reclama trabajos de la tabla `transcription_job`.
+
+    Reemplaza el bucle de sondeo por sesión: los trabajos y sus resultados sobreviven a
+    reinicios y la concurrencia queda acotada a TRANSCRIPTION_WORKERS por proceso.
+    Se arranca como tarea de ciclo de vida de la app.
+    """
+
+    def __init__(self, concurrency: int = TRANSCRIPTION_WORKERS):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{HOST}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: set[asyncio.Task] = set()
+        self._next_stale_check = 0.0
+
+    def disabled_reason(self) -> Optional[str]:
+        """Motivo por el que este proceso no puede transcribir, o None si el pool está activo.
+
+        Los trabajos pendientes solo los toma el host que tiene el audio: si el pool de
+        este proceso no corre, hay que rechazar la subida en lugar de encolarla.
+        """
+        if not os.getenv("ASSEMBLYAI_API_KEY"):
+            return "API key de AssemblyAI no configurada en .env"
+        if self._wakeup is None:
+            return "El servicio de transcripción no está activo en este servidor."
+        return None
+
+    def notify(self) -> None:
+        """Despierta el pool (trabajo recién encolado en este proceso)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        try:
+            configure_assemblyai()
+        except ValueError as e:
+            logger.warning(f"Pool de transcripción deshabilitado: {e}")
+            return
+        self._wakeup = asyncio.Event()
+        logger.info(f"Pool de transcripción {self.worker_id} iniciado ({self.concurrency} trabajos concurrentes)")
+        while True:
+            await self._fail_stale_jobs()
+            job_ids: list[int] = []
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    job_ids = await asyncio.to_thread(claim_due_jobs, self.worker_id, free)
+                except Exception as e:
+                    logger.error(f"Error reclamando trabajos de transcripción: {e}")
+            for job_id in job_ids:
+                task = asyncio.create_task(self._process(job_id))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            if not job_ids:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), IDLE_SLEEP_S)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _fail_stale_jobs(self) -> None:
+        loop_time = asyncio.get_running_loop().time()
+        if loop_time < self._next_stale_check:
+            return
+        self._next_stale_check = loop_time + STALE_CHECK_INTERVAL_S
+        try:
+            failed = await asyncio.to_thread(fail_stale_pending)
+        except Exception as e:
+            logger.error(f"Error revisando trabajos de transcripción huérfanos: {e}")
+            return
+        if failed:
+            logger.warning(f"{failed} trabajos de transcripción pendientes huérfanos marcados como fallidos")
+
+    async def _process(self, job_id: int) -> None:
+        try:
+            job = await asyncio.to_thread(_snapshot, job_id)
+            if job is None:
+                return
+            async with self._keep_lease(job_id):
+                if job["status"] == "pending":
+                    await self._submit(job)
+                else:
+                    await self._poll(job)
+        except Exception as e:
+            logger.error(f"Error procesando trabajo de transcripción {job_id}: {e}", exc_info=True)
+            # El lease se libera con reintento diferido; el trabajo no se pierde.
+            await asyncio.to_thread(_update, job_id, next_poll_at=datetime.now() + timedelta(seconds=POLL_MAX_S))
+
+    @contextlib.asynccontextmanager
+    async def _keep_lease(self, job_id: int):
+        """Renueva el lease del trabajo mientras dura el bloque."""
+
+        async def _renew() -> None:
+            while True:
+                await asyncio.sleep(LEASE_S / 3)
+                try:
+                    if not await asyncio.to_thread(renew_lease, job_id, self.worker_id):
+                        logger.warning(f"Trabajo {job_id}: el lease ya no pertenece a {self.worker_id}")
+                        return
+                except Exception as e:
+                    logger.warning(f"No se pudo renovar el lease del trabajo {job_id}: {e}")
+
+        renewer = asyncio.create_task(_renew())
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await renewer
+
+    async def _submit(self, job: Dict[str, Any]) -> None:
+        audio_path = audio_store.path(job["audio_handle"]) if job["audio_handle"] else None
+        if not audio_path:
+            await asyncio.to_thread(_update, job["id"], status="failed", error="El audio ya no está disponible; vuelve a subir el archivo.")
+            return
+
+        transcriber = assemblyai.Transcriber()
+        config = assemblyai.TranscriptionConfig(speaker_labels=True, language_code="es")
+        if WEBHOOK_URL:
+            config.set_webhook(f"{WEBHOOK_URL}?job_id={job['id']}", WEBHOOK_AUTH_HEADER if WEBHOOK_SECRET else None, WEBHOOK_SECRET or None)
+        try:
+            # En un reintento se reutiliza el plan guardado, con los tramos ya enviados.
+            segments = segments_from_json(job["segments"]) if job["segments"] else await self._plan_segments(audio_path)
+            if segments:
+                await self._submit_segments(job["id"], transcriber, config, audio_path, segments)
+                fields: Dict[str, Any] = {"segments": segments_to_json(segments)}
+            else:
+                transcript = await asyncio.to_thread(transcriber.submit, audio_path, config)
+                fields = {"transcript_id": transcript.id}
+        except Exception as e:
+            attempts = job["attempts"] + 1
+            if attempts >= MAX_SUBMIT_ATTEMPTS:
+                audio_store.delete(job["audio_handle"])
+                await asyncio.to_thread(_update, job["id"], status="failed", attempts=attempts, error=f"No se pudo enviar el audio: {e}")
+            else:
+                logger.warning(f"Envío del trabajo {job['id']} falló (intento {attempts}): {e}")
+                await asyncio.to_thread(_update, job["id"], attempts=attempts, next_poll_at=datetime.now() + timedelta(seconds=_backoff_s(attempts)))
+            return
+
+        await asyncio.to_thread(_update, job["id"], status="submitted", attempts=0, next_poll_at=datetime.now() + timedelta(seconds=_backoff_s(0)), **fields)
+        # AssemblyAI ya tiene el audio: liberar el blob local.
+        audio_store.delete(job["audio_handle"])
+        logger.info(f"Trabajo {job['id']} enviado a AssemblyAI ({fields.get('transcript_id') or 'por segmentos'})")
+
+    async def _plan_segments(self, audio_path: str) -> Optional[list[Segment]]:
+        """Plan de tramos si el modo por segmentos aplica a este audio; si no, None."""
+        if not CHUNKED_ENABLED or not audio_segments.FFMPEG:
+            return None
+        duration = await asyncio.to_thread(audio_segments.probe_duration, audio_path)
+        if duration < CHUNKED_MIN_S:
+            return None
+        silences = await asyncio.to_thread(audio_segments.detect_silences, audio_path)
+        segments = audio_segments.plan_segments(duration, silences)
+        return segments if len(segments) > 1 else None
+
+    async def _submit_segments(self, job_id: int, transcriber: assemblyai.Transcriber, config: assemblyai.TranscriptionConfig, audio_path: str, segments: list[Segment]) -> None:
+        """Corta y envía en paralelo (acotado) los tramos sin transcript_id, persistiendo cada uno al enviarlo.
+
+        Si algún tramo falla, los demás terminan igualmente y se lanza un error para que
+        el reintento del trabajo envíe solo los que faltan.
+        """
+        missing = [segment for segment in segments if not segment.transcript_id]
+        work_dir = tempfile.mkdtemp(prefix="leyia_segments_")
+        semaphore = asyncio.Semaphore(SEGMENT_SUBMIT_CONCURRENCY)
+        save_lock = asyncio.Lock()
+
+        async def _submit_one(segment: Segment) -> None:
+            async with semaphore:
+                segment_path = os.path.join(work_dir, f"{segment.index:03d}.mp3")
+                try:
+                    await asyncio.to_thread(audio_segments.cut_segment, audio_path, segment, segment_path)
+                    transcript = await asyncio.to_thread(transcriber.submit, segment_path, config)
+                finally:
+                    if os.path.exists(segment_path):
+                        os.remove(segment_path)
+                segment.transcript_id = transcript.id
+                segment.status = "submitted"
+            # Serializado para que una escritura vieja no pise a una más reciente.
+            async with save_lock:
+                await asyncio.to_thread(save_submitted_segments, job_id, segments_to_json(segments))
+
+        try:
+            # return_exceptions: un fallo no deja a los hermanos cortando en work_dir mientras se borra.
+            results = await asyncio.gather(*(_submit_one(segment) for segment in missing), return_exceptions=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise RuntimeError(f"{len(errors)} de {len(missing)} segmentos no se pudieron enviar: {errors[0]}")
+        logger.info(f"Audio enviado en {len(segments)} segmentos ({len(missing)} en este intento)")
+
+    async def _poll(self, job: Dict[str, Any]) -> None:
+        if job["segments"]:
+            await self._poll_segments(job)
+            return
+        transcript = await asyncio.to_thread(fetch_transcript, job["transcript_id"])
+        if transcript.status == assemblyai.TranscriptStatus.completed:
+            transcription_text, duration = format_transcript(transcript)
+            notebook_id = await asyncio.to_thread(complete_job, job["id"], transcription_text, duration)
+            logger.info(f"Trabajo {job['id']} completado (notebook {notebook_id})")
+        elif transcript.status == assemblyai.TranscriptStatus.error:
+            await asyncio.to_thread(_update, job["id"], status="failed", error=f"Error de AssemblyAI: {transcript.error}")
+        else:
+            attempts = job["attempts"] + 1
+            status = "processing" if transcript.status == assemblyai.TranscriptStatus.processing else job["status"]
+            await asyncio.to_thread(_update, job["id"], status=status, attempts=attempts, next_poll_at=datetime.now() + timedelta(seconds=_backoff_s(attempts)))
+
+    async def _poll_segments(self, job: Dict[str, Any]) -> None:
+        segments = segments_from_json(job["segments"])
+        pending = [segment for segment in segments if segment.status != "completed"]
+        results = await asyncio.gather(*(asyncio.to_thread(fetch_transcript, segment.transcript_id) for segment in pending), return_exceptions=True)
+        for segment, transcript in zip(pending, results):
+            if isinstance(transcript, Exception):
+                logger.warning(f"Error consultando el segmento {segment.index} del trabajo {job['id']}: {transcript}")
+                continue
+            if transcript.status == assemblyai.TranscriptStatus.completed:
+                segment.utterances = audio_segments.segment_utterances(segment, transcript)
+                segment.status = "completed"
+            elif transcript.status == assemblyai.TranscriptStatus.error:
+                await asyncio.to_thread(_update, job["id"], status="failed", error=f"Error de AssemblyAI en el segmento {segment.index + 1}: {transcript.error}")
+                return
+        # Si algún tramo terminó, el resto suele estar cerca: reiniciar el backoff.
+        attempts = 0 if len(pending) > sum(segment.status != "completed" for segment in segments) else job["attempts"] + 1
+        notebook_id = await asyncio.to_thread(save_segment_progress, job["id"], segments, attempts, datetime.now() + timedelta(seconds=_backoff_s(attempts)))
+        done = sum(segment.status == "completed" for segment in segments)
+        logger.info(f"Trabajo {job['id']}: {done}/{len(segments)} segmentos listos (notebook {notebook_id})")
+
+
+transcription_pool = TranscriptionWorkerPool()
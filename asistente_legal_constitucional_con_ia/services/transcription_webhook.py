@@ -0,0 +1,41 @@
+import asyncio
+import hmac
+import logging
+
+from fastapi import FastAPI, Request, Response
+
+from .transcription_jobs import WEBHOOK_AUTH_HEADER, WEBHOOK_SECRET, mark_due, transcription_pool
+
+logger = logging.getLogger("asistente_legal")
+
+# App FastAPI que Reflex monta como api_transformer; sus rutas conviven con las del backend.
+webhook_api = FastAPI()
+
+
+@webhook_api.post("/webhooks/assemblyai")
+async def assemblyai_webhook(request: Request) -> Response:
+    """Recibe la notificación de AssemblyAI al terminar una transcripción.
+
+    Solo adelanta el sondeo del trabajo: el pool obtiene el resultado con una única
+    consulta y lo guarda de forma idempotente, igual que en el sondeo de respaldo.
+    """
+    if WEBHOOK_SECRET and not hmac.compare_digest(request.headers.get(WEBHOOK_AUTH_HEADER, ""), WEBHOOK_SECRET):
+        return Response(status_code=401)
+    try:
+        payload = await request.json()
+    except ValueError:
+        return Response(status_code=400)
+
+    transcript_id = payload.get("transcript_id") if isinstance(payload, dict) else None
+    job_param = request.query_params.get("job_id", "")
+    if not transcript_id and not job_param.isdigit():
+        return Response(status_code=400)
+
+    job_id = await asyncio.to_thread(mark_due, int(job_param) if job_param.isdigit() else None, transcript_id)
+    if job_id is None:
+        # Desconocido o ya terminado: 200 para que AssemblyAI no reintente.
+        logger.info(f"Webhook de AssemblyAI sin trabajo activo ({transcript_id})")
+        return Response(status_code=200)
+    logger.info(f"Webhook de AssemblyAI: trabajo {job_id} listo ({payload.get('status')})")
+    transcription_pool.notify()
+    return Response(status_code=200)
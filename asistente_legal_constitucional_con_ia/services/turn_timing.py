@@ -0,0 +1,56 @@
+import contextlib
+import logging
+import os
+import random
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger("asistente_legal")
+
+# Fracción de turnos en modo diagnóstico (llamadas extra a la API solo para logs). 0 = nunca.
+CHAT_DEBUG_SAMPLE_RATE = float(os.getenv("CHAT_DEBUG_SAMPLE_RATE", "0"))
+
+PHASE_LABELS = {
+    "thread_create": "thread",
+    "message_create": "mensaje",
+    "run_create": "run",
+    "tools": "herramientas",
+    "tool_submit": "envío herramientas",
+    "usage": "usage",
+}
+
+
+class TurnTimer:
+    """Desglose de latencia de un turno del chat.
+
+    Mide cada fase (crear thread, mensaje y run, herramientas), el tiempo hasta el
+    primer token y el total. Además decide por muestreo si el turno es de diagnóstico.
+    """
+
+    def __init__(self, debug_sample_rate: float = CHAT_DEBUG_SAMPLE_RATE):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.first_token_s: Optional[float] = None
+        self.debug = debug_sample_rate > 0 and random.random() < debug_sample_rate
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def mark_first_token(self) -> None:
+        if self.first_token_s is None:
+            self.first_token_s = time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        parts = [f"total={time.perf_counter() - self.started:.2f}s"]
+        if self.first_token_s is not None:
+            parts.append(f"primer token={self.first_token_s:.2f}s")
+        parts.extend(f"{PHASE_LABELS.get(name, name)}={seconds:.2f}s" for name, seconds in self.phases.items())
+        return ", ".join(parts)
+
+    def log(self) -> None:
+        logger.info(f"Latencia del turno{' [diagnóstico]' if self.debug else ''}: {self.summary()}")
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional, Union
+
+logger = logging.getLogger("asistente_legal")
+
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD_MB", "8")) * 1024 * 1024
+UPLOAD_MEMORY_BUDGET = int(os.getenv("UPLOAD_MEMORY_BUDGET_MB", "256")) * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class MemoryBudget:
+    """Presupuesto de memoria por worker para uploads en procesamiento.
+
+    `acquire(n)` espera (backpressure) hasta que haya `n` bytes libres; una carga mayor
+    que el presupuesto completo se admite sola, cuando no hay otras en curso.
+
+    Acota lo que se retiene durante extracción y subida a OpenAI. No acota la recepción:
+    el endpoint de upload de Reflex copia cada archivo a un `BytesIO` antes de llamar al
+    handler, así que el lote completo ya está en memoria cuando se reserva.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit = limit_bytes
+        self.in_use = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _cond(self) -> asyncio.Condition:
+        # Se crea perezosamente para quedar ligado al event loop del worker.
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, n: int) -> int:
+        n = min(n, self.limit)
+        async with self._cond():
+            if self.in_use + n > self.limit:
+                logger.info(f"Upload en espera: presupuesto de memoria ocupado ({self.in_use:,}/{self.limit:,} bytes)")
+            await self._cond().wait_for(lambda: self.in_use + n <= self.limit)
+            self.in_use += n
+        return n
+
+    async def release(self, n: int) -> None:
+        async with self._cond():
+            self.in_use -= n
+            self._cond().notify_all()
+
+
+upload_budget = MemoryBudget(UPLOAD_MEMORY_BUDGET)
+
+
+class SpooledUpload:
+    """Upload leído por bloques: en memoria hasta un umbral, luego volcado a un archivo privado.
+
+    Calcula el SHA-256 mientras lee. Al terminar cierra el upload de Reflex, que libera su
+    copia en memoria: los archivos grandes quedan solo en disco durante la extracción.
+    `source` es `bytes` (archivo pequeño) o la ruta del archivo en disco.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.size = 0
+        self.digest = ""
+        self._data: Optional[bytearray] = bytearray()
+        self._bytes: Optional[bytes] = None
+        self._path: Optional[str] = None
+
+    @classmethod
+    async def read(cls, upload_file, threshold: int = UPLOAD_SPOOL_THRESHOLD) -> "SpooledUpload":
+        spooled = cls(upload_file.name)
+        hasher = hashlib.sha256()
+        handle = None
+        try:
+            while True:
+                chunk = await upload_file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                spooled.size += len(chunk)
+                if handle is None and spooled.size > threshold:
+                    fd, spooled._path = tempfile.mkstemp(prefix="leyia_upload_", suffix=os.path.splitext(upload_file.name)[1])
+                    handle = os.fdopen(fd, "wb")
+                    await asyncio.to_thread(handle.write, spooled._data)
+                    spooled._data = None
+                if handle is not None:
+                    await asyncio.to_thread(handle.write, chunk)
+                else:
+                    spooled._data.extend(chunk)
+        except BaseException:
+            if handle is not None:
+                handle.close()
+            spooled.close()
+            raise
+        finally:
+            await upload_file.close()
+        if handle is not None:
+            handle.close()
+        else:
+            # Una sola copia inmutable; `source` la devuelve sin volver a copiar.
+            spooled._bytes = bytes(spooled._data)
+            spooled._data = None
+        spooled.digest = hasher.hexdigest()
+        return spooled
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        return self._path if self._path else (self._bytes or b"")
+
+    @property
+    def in_memory(self) -> bool:
+        return self._path is None
+
+    def close(self) -> None:
+        self._data = None
+        self._bytes = None
+        if self._path:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._path = None
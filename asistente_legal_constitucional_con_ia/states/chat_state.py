@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import json
 import logging
 import os
@@ -8,16 +9,48 @@ from typing import Any, Dict, List, Optional, TypedDict
 
 import reflex as rx
 from dotenv import load_dotenv
-from openai import APIError, OpenAI
+from openai import APIError, NotFoundError, OpenAI
 
+from asistente_legal_constitucional_con_ia.services import document_registry, session_janitor
+from asistente_legal_constitucional_con_ia.services.assistant_cache import (
+    assistant_cache,
+)
+from asistente_legal_constitucional_con_ia.services.extraction_pipeline import (
+    extract_text_async,
+)
+from asistente_legal_constitucional_con_ia.services.file_deletion import (
+    delete_files,
+    release_files,
+)
+from asistente_legal_constitucional_con_ia.services.flush_scheduler import (
+    FlushScheduler,
+)
+from asistente_legal_constitucional_con_ia.services.openai_clients import (
+    get_openai_client,
+)
+from asistente_legal_constitucional_con_ia.services.stream_pump import (
+    aiter_in_thread,
+)
 from asistente_legal_constitucional_con_ia.services.token_counter import (
-    count_text_tokens,
+    StreamingTokenCounter,
+)
+from asistente_legal_constitucional_con_ia.services.tool_runner import (
+    run_tool_calls,
+    tool_latency_histogram,
+)
+from asistente_legal_constitucional_con_ia.services.turn_timing import (
+    TurnTimer,
+)
+from asistente_legal_constitucional_con_ia.services.upload_spool import (
+    UPLOAD_SPOOL_THRESHOLD,
+    SpooledUpload,
+    upload_budget,
 )
 from asistente_legal_constitucional_con_ia.util.scraper import (
     scrape_proyectos_recientes_camara,
 )
 from asistente_legal_constitucional_con_ia.util.text_extraction import (
-    extract_text_from_bytes,
+    classify_pdf,
 )
 from asistente_legal_constitucional_con_ia.util.tools import (
     buscar_documento_legal,
@@ -117,7 +150,10 @@ class ChatState(rx.State):
     max_chat_messages: int = 80  # conservar últimas 80 entradas en UI
     stream_min_chars: int = 120  # umbral de chars para actualizar streaming_response
     stream_min_interval_s: float = 0.15  # tiempo mínimo entre updates
+    stream_flush_policy: str = os.getenv("STREAM_FLUSH_POLICY", "adaptive")  # fixed | adaptive
+    stream_max_updates_per_s: float = float(os.getenv("STREAM_MAX_UPDATES_PER_S", "8"))  # tope duro por sesión
     ocr_max_pages: int = 0  # OCR deshabilitado
+    upload_spool_max_bytes: int = 16 * 1024 * 1024  # textos mayores se vuelcan a un spool anónimo
 
     model_name: str = ""
     last_prompt_tokens: int = 0
@@ -164,9 +200,8 @@ class ChatState(rx.State):
 
     @staticmethod
     def get_client(api_key: str):
-        if api_key:
-            return OpenAI(api_key=api_key)
-        return None
+        # Cliente compartido del proceso: conserva el pool de conexiones keep-alive entre handlers.
+        return get_openai_client(api_key)
 
     def scroll_to_bottom(self):
         return rx.call_script(
@@ -181,6 +216,20 @@ class ChatState(rx.State):
             """
         )
 
+    def append_stream_delta(self, delta: str):
+        """Envía solo el fragmento nuevo al cliente, que lo acumula en la vista previa del stream.
+
+        Así cada flush transmite un payload proporcional al texto nuevo, no a toda la respuesta.
+        """
+        return rx.call_script(
+            f"""
+            (function(){{
+                const el = document.getElementById('chat-streaming-preview');
+                if (el) el.textContent += {json.dumps(delta)};
+            }})();
+            """
+        )
+
     def focus_input(self):
         return rx.call_script(
             """
@@ -249,79 +298,179 @@ class ChatState(rx.State):
             self.uploading = False
             return
 
-        for i, file in enumerate(files):
+        pending_files = []
+        for file in files:
             if any(f["filename"] == file.name for f in self.file_info_list):
                 self.upload_error = f"El archivo '{file.name}' ya fue subido."
                 logger.warning(self.upload_error)
                 yield rx.toast.error(self.upload_error)
                 continue
+            pending_files.append(file)
 
-            try:
-                logger.info(f"Procesando archivo: {file.name}")
-                upload_data = await file.read()
-                # Primera pasada: extracción directa SIN OCR para PDFs (skip_ocr=True)
-                extracted_text = extract_text_from_bytes(upload_data, file.name, skip_ocr=True)
-
-                # Si es PDF y el texto es insuficiente, rechazar (OCR deshabilitado)
-                if file.name.lower().endswith(".pdf") and (not extracted_text or len(extracted_text.strip()) < 100):
-                    self.upload_error = f"El archivo '{file.name}' parece escaneado o sin texto digital. (OCR deshabilitado)"
-                    logger.warning(self.upload_error)
-                    yield rx.toast.warning("PDF escaneado sin texto. Sube un PDF con texto seleccionable.")
-                    continue
+        # Extracción concurrente en el pool de procesos; el progreso avanza por página (0-90%).
+        file_fractions = [0.0] * len(pending_files)
 
-                if not extracted_text or not extracted_text.strip():
-                    self.upload_error = f"No se pudo extraer texto de '{file.name}'."
-                    logger.warning(self.upload_error)
-                    yield rx.toast.warning(self.upload_error)
-                    continue
+        def _on_progress(index: int):
+            def _update(done: int, total: int):
+                file_fractions[index] = done / total if total else 1.0
+
+            return _update
+
+        # Backpressure: el lote completo reserva su parte del presupuesto de memoria del worker
+        # (una sola reserva, para que un lote grande no se bloquee a sí mismo) y espera turno.
+        reserved = await upload_budget.acquire(sum(getattr(file, "size", None) or UPLOAD_SPOOL_THRESHOLD for file in pending_files))
+        spools: list[SpooledUpload] = []
+        try:
+            extraction_tasks: list[Optional[asyncio.Task]] = [None] * len(pending_files)
+            digests: list[str] = [""] * len(pending_files)
+            for i, file in enumerate(pending_files):
+                logger.info(f"Procesando archivo: {file.name}")
+                try:
+                    # Lectura por bloques: los archivos grandes se vuelcan a disco y se extraen desde ahí.
+                    spooled = await SpooledUpload.read(file)
+                    spools.append(spooled)
+                    digest = spooled.digest
+                    digests[i] = digest
 
-                original_name_no_ext = os.path.splitext(file.name)[0]
-                temp_filename = f"{original_name_no_ext}_processed.txt"
-                temp_dir = tempfile.gettempdir()
-                tmp_path = os.path.join(temp_dir, temp_filename)
+                    # Contenido ya subido por cualquier sesión: reutilizar file_id sin extraer ni subir.
+                    try:
+                        existing_file_id = await asyncio.to_thread(document_registry.acquire_existing, digest)
+                    except Exception as e:
+                        logger.warning(f"Registro de documentos no disponible: {e}")
+                        existing_file_id = None
+                    if existing_file_id:
+                        file_id = existing_file_id
+                        spooled.close()
+                        file_fractions[i] = 1.0
+                        if any(f["file_id"] == file_id for f in self.file_info_list):
+                            await asyncio.to_thread(document_registry.release, file_id)
+                            self.upload_error = f"El contenido de '{file.name}' ya fue subido en esta sesión."
+                            logger.warning(self.upload_error)
+                            yield rx.toast.error(self.upload_error)
+                            continue
+                        self.file_info_list.append({"file_id": file_id, "filename": file.name, "uploaded_at": time.time()})
+                        self.session_files.append({"file_id": file_id, "filename": file.name, "uploaded_at": time.time()})
+                        await asyncio.to_thread(session_janitor.track_file, self._session_id(), self.thread_id, file_id, file.name)
+                        logger.info(f"'{file.name}' reutiliza el archivo compartido {file_id}.")
+                        yield rx.toast.success(f"'{file.name}' procesado y subido.")
+                        continue
+
+                    # Pre-chequeo rápido (muestreo de páginas): rechazar PDFs escaneados sin extraerlos completos.
+                    if file.name.lower().endswith(".pdf"):
+                        try:
+                            pdf_kind = await asyncio.to_thread(classify_pdf, spooled.source)
+                        except Exception as e:
+                            logger.warning(f"No se pudo clasificar '{file.name}': {e}")
+                            pdf_kind = "mixed"
+                        if pdf_kind == "scanned":
+                            spooled.close()
+                            file_fractions[i] = 1.0
+                            self.upload_error = f"El archivo '{file.name}' parece escaneado o sin texto digital. (OCR deshabilitado)"
+                            logger.warning(self.upload_error)
+                            yield rx.toast.warning("PDF escaneado sin texto. Sube un PDF con texto seleccionable.")
+                            continue
+
+                    extraction_tasks[i] = asyncio.create_task(extract_text_async(spooled.source, file.name, _on_progress(i), digest=digest))
+                except Exception as e:
+                    # Un fallo de lectura o del registro afecta solo a este archivo.
+                    file_fractions[i] = 1.0
+                    self.upload_error = f"Error procesando '{file.name}': {e}"
+                    logger.error(self.upload_error, exc_info=True)
+                    yield rx.toast.error(self.upload_error)
 
-                with open(tmp_path, "w", encoding="utf-8") as tmp_file:
-                    tmp_file.write(extracted_text)
+            waiting = {task for task in extraction_tasks if task is not None}
+            while waiting:
+                _, waiting = await asyncio.wait(waiting, timeout=0.3)
+                self.upload_progress = round(sum(file_fractions) / len(file_fractions) * 90)
+                yield
 
+            for i, file in enumerate(pending_files):
+                task = extraction_tasks[i]
+                if task is None:
+                    continue
                 try:
-                    response = await asyncio.to_thread(self._upload_file_to_openai, client, tmp_path)
+                    if task.exception() is not None:
+                        logger.error(f"Error extrayendo texto de '{file.name}': {task.exception()!r}", exc_info=task.exception())
+                        self.upload_error = f"Error extrayendo texto de '{file.name}'. Inténtalo de nuevo."
+                        yield rx.toast.error(self.upload_error)
+                        continue
+                    extracted_text = task.result()
+
+                    # Si es PDF y el texto es insuficiente, rechazar (OCR deshabilitado)
+                    if file.name.lower().endswith(".pdf") and (not extracted_text or len(extracted_text.strip()) < 100):
+                        self.upload_error = f"El archivo '{file.name}' parece escaneado o sin texto digital. (OCR deshabilitado)"
+                        logger.warning(self.upload_error)
+                        yield rx.toast.warning("PDF escaneado sin texto. Sube un PDF con texto seleccionable.")
+                        continue
+
+                    if not extracted_text or not extracted_text.strip():
+                        self.upload_error = f"No se pudo extraer texto de '{file.name}'."
+                        logger.warning(self.upload_error)
+                        yield rx.toast.warning(self.upload_error)
+                        continue
+
+                    original_name_no_ext = os.path.splitext(file.name)[0]
+                    upload_filename = f"{original_name_no_ext}_processed.txt"
 
-                    self.file_info_list.append({"file_id": response.id, "filename": file.name, "uploaded_at": time.time()})
-                    self.session_files.append({"file_id": response.id, "filename": file.name, "uploaded_at": time.time()})
+                    try:
+                        response = await asyncio.to_thread(self._upload_file_to_openai, client, upload_filename, extracted_text)
+                        file_id = response.id
+                        try:
+                            file_id, duplicated = await asyncio.to_thread(document_registry.register, digests[i], response.id, file.name)
+                            if duplicated:
+                                # Otro worker subió el mismo contenido en paralelo: usar el suyo.
+                                await delete_files(client, [response.id])
+                        except Exception as e:
+                            logger.warning(f"No se pudo registrar '{file.name}' en el registro de documentos: {e}")
+
+                        self.file_info_list.append({"file_id": file_id, "filename": file.name, "uploaded_at": time.time()})
+                        self.session_files.append({"file_id": file_id, "filename": file.name, "uploaded_at": time.time()})
+                        await asyncio.to_thread(session_janitor.track_file, self._session_id(), self.thread_id, file_id, file.name)
+
+                        logger.info(f"'{file.name}' subido con id {file_id}.")
+                        self.upload_error = ""
+                        yield rx.toast.success(f"'{file.name}' procesado y subido.")
+                    except APIError as e:
+                        self.upload_error = f"Error al subir '{file.name}': {getattr(e, 'message', str(e))}"
+                        logger.error(self.upload_error)
+                        yield rx.toast.error(self.upload_error)
 
-                    logger.info(f"'{file.name}' subido con id {response.id}.")
-                    self.upload_error = ""
-                    yield rx.toast.success(f"'{file.name}' procesado y subido.")
-                except APIError as e:
-                    self.upload_error = f"Error al subir '{file.name}': {getattr(e, 'message', str(e))}"
+                except Exception as e:
+                    self.uploading = False
+                    self.is_performing_ocr = False
+                    self.ocr_progress = ""
+                    self.upload_error = f"Error procesando '{file.name}': {e}"
                     logger.error(self.upload_error)
                     yield rx.toast.error(self.upload_error)
-                finally:
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
-
-            except Exception as e:
-                self.uploading = False
-                self.is_performing_ocr = False
-                self.ocr_progress = ""
-                self.upload_error = f"Error procesando '{file.name}': {e}"
-                logger.error(self.upload_error)
-                yield rx.toast.error(self.upload_error)
 
-            self.upload_progress = round((i + 1) / len(files) * 100)
-            yield
+                self.upload_progress = 90 + round((i + 1) / len(pending_files) * 10)
+                yield
+        finally:
+            for spooled in spools:
+                spooled.close()
+            await upload_budget.release(reserved)
+            # Aunque algo escape, el indicador de carga no queda activo.
+            self.uploading = False
+            self.is_performing_ocr = False
+            self.ocr_progress = ""
 
-        self.uploading = False
-        self.is_performing_ocr = False
-        self.ocr_progress = ""
         logger.info("handle_upload: proceso terminado")
         yield
 
-    def _upload_file_to_openai(self, client: OpenAI, path: str):
-        with open(path, "rb") as f_obj:
-            return client.files.create(file=f_obj, purpose="assistants")
+    def _upload_file_to_openai(self, client: OpenAI, filename: str, text: str):
+        """Sube el texto extraído sin pasar por un archivo temporal con nombre.
+
+        El buffer vive en memoria y solo se vuelca a disco (anónimo, por proceso) si supera
+        `upload_spool_max_bytes`, así dos usuarios con el mismo nombre de archivo no colisionan.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=self.upload_spool_max_bytes) as buffer:
+            buffer.write(text.encode("utf-8"))
+            buffer.seek(0)
+            return client.files.create(file=(filename, buffer, "text/plain"), purpose="assistants")
+
+    def _session_id(self) -> str:
+        """Identificador estable de la sesión del navegador (clave del registro del janitor)."""
+        return self.router.session.client_token
 
     @rx.event(background=True)
     async def delete_file(self, file_id: str):
@@ -332,13 +481,20 @@ class ChatState(rx.State):
 
         filename = next((f["filename"] for f in self.file_info_list if f["file_id"] == file_id), "archivo")
         try:
-            await asyncio.to_thread(client.files.delete, file_id)
+            # Libera la referencia (solo si la fila del registro no la borró ya el janitor);
+            # se elimina en OpenAI solo si nadie más usa el archivo.
+            # Si el borrado falla, queda en la cola persistente de reintentos.
+            released = await asyncio.to_thread(session_janitor.untrack_files, self._session_id(), [file_id])
+            report = await release_files(client, released)
             # FIX: en eventos background, modificar estado dentro de `async with self:`
             async with self:
                 self.file_info_list = [f for f in self.file_info_list if f["file_id"] != file_id]
                 self.session_files = [f for f in self.session_files if f["file_id"] != file_id]
-            yield rx.toast.success(f"'{filename}' eliminado.")
-        except APIError as e:
+            if report.failed:
+                yield rx.toast.warning(f"'{filename}' quitado de la sesión; su eliminación en OpenAI se reintentará.")
+            else:
+                yield rx.toast.success(f"'{filename}' eliminado.")
+        except Exception as e:
             yield rx.toast.error(f"Error eliminando '{filename}': {getattr(e, 'message', str(e))}")
 
     @rx.event(background=True)
@@ -391,29 +547,21 @@ class ChatState(rx.State):
     # === NUEVO: helpers de modelo, costo y usage ===
 
     async def _ensure_model_name(self, client: OpenAI):
-        """Obtiene y cachea el modelo del Assistant para costos/estimaciones."""
-        # Si ya hay modelo cacheado, no hagas nada
-        if self.model_name:
-            return
+        """Toma el modelo del Assistant de la caché del proceso para costos/estimaciones.
 
-        # Si no hay cliente o assistant_id, usa fallback
+        No consulta la API en la ruta de la respuesta: la caché se precarga al iniciar y
+        se refresca en segundo plano. Mientras no haya datos se usa el modelo por defecto.
+        """
         if not client or not self.assistant_id:
             async with self:
                 if not self.model_name:
                     self.model_name = "gpt-4o-mini"
             return
 
-        # Recuperar el modelo fuera del context manager
-        try:
-            assistant = await asyncio.to_thread(client.beta.assistants.retrieve, self.assistant_id)
-            model = getattr(assistant, "model", "") or "gpt-4o-mini"
-        except Exception:
-            model = "gpt-4o-mini"
-
-        # Asignar al estado dentro del context manager
-        async with self:
-            if not self.model_name:
-                self.model_name = model
+        metadata = assistant_cache.peek(self.assistant_id, client)
+        if metadata and metadata.model and metadata.model != self.model_name:
+            async with self:
+                self.model_name = metadata.model
 
     def _estimate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
         """USD aproximados por 1M tokens (ajusta a tus precios)."""
@@ -538,6 +686,7 @@ class ChatState(rx.State):
             logger.info(f"DEBUG: Archivo en sesión: {fi['filename']} -> {fi['file_id']}")
         logger.info(f"generate_response_streaming: INICIO. thread_id={self.thread_id}")
         client = self.get_client(self.openai_api_key)
+        timer = TurnTimer()
 
         try:
 
@@ -547,24 +696,33 @@ class ChatState(rx.State):
             if not last_user_message:
                 raise ValueError("No se encontró el último mensaje del usuario.")
 
+            # El janitor pudo liberar archivos por antigüedad con la pestaña abierta:
+            # adjuntar un file_id eliminado haría fallar messages.create.
+            await self._prune_released_files()
+
             # Snapshot de archivos actuales
             current_files = self.session_files[-3:].copy()
 
             # Mantener un único thread por sesión, crear solo si no existe
             if not self.thread_id:
-                thread = await asyncio.to_thread(client.beta.threads.create)
+                with timer.phase("thread_create"):
+                    thread = await asyncio.to_thread(client.beta.threads.create)
                 async with self:
                     self.thread_id = thread.id
                 logger.info(f"Thread nuevo creado: {self.thread_id}")
+                if current_files:
+                    await asyncio.to_thread(session_janitor.set_thread, self._session_id(), self.thread_id)
 
             logger.info(f"DEBUG THREAD - thread_id: {self.thread_id}")
 
-            # Inspección opcional de mensajes previos del thread (debug)
-            try:
-                existing_messages = await asyncio.to_thread(client.beta.threads.messages.list, thread_id=self.thread_id, limit=3)
-                logger.debug(f"DEBUG THREAD - mensajes existentes: {len(existing_messages.data)}")
-            except Exception as e:
-                logger.debug(f"Error verificando mensajes del thread: {e}")
+            # Inspección de mensajes previos del thread: solo en turnos de diagnóstico (muestreo),
+            # así los turnos normales no pagan una llamada extra a la API.
+            if timer.debug:
+                try:
+                    existing_messages = await asyncio.to_thread(client.beta.threads.messages.list, thread_id=self.thread_id, limit=3)
+                    logger.info(f"DEBUG THREAD - mensajes existentes: {len(existing_messages.data)}")
+                except Exception as e:
+                    logger.info(f"Error verificando mensajes del thread: {e}")
 
             attachments = [{"file_id": fi["file_id"], "tools": [{"type": "file_search"}]} for fi in current_files]
 
@@ -581,13 +739,31 @@ class ChatState(rx.State):
             else:
                 message_content = f"{last_user_message}\n\n[SISTEMA: No hay archivos subidos]"
 
-            await asyncio.to_thread(
-                client.beta.threads.messages.create,
-                thread_id=self.thread_id,
-                role="user",
-                content=message_content,
-                attachments=attachments,
-            )
+            with timer.phase("message_create"):
+                try:
+                    await asyncio.to_thread(
+                        client.beta.threads.messages.create,
+                        thread_id=self.thread_id,
+                        role="user",
+                        content=message_content,
+                        attachments=attachments,
+                    )
+                except NotFoundError:
+                    # El thread ya no existe en OpenAI (el janitor pudo haber liberado sus archivos):
+                    # se reemplaza por uno nuevo y se reintenta el envío una vez.
+                    logger.warning(f"Thread {self.thread_id} no encontrado; se crea uno nuevo")
+                    thread = await asyncio.to_thread(client.beta.threads.create)
+                    async with self:
+                        self.thread_id = thread.id
+                    if current_files:
+                        await asyncio.to_thread(session_janitor.set_thread, self._session_id(), self.thread_id)
+                    await asyncio.to_thread(
+                        client.beta.threads.messages.create,
+                        thread_id=self.thread_id,
+                        role="user",
+                        content=message_content,
+                        attachments=attachments,
+                    )
 
             tools_for_run = TOOLS_DEFINITION.copy()
             if current_files:
@@ -596,18 +772,19 @@ class ChatState(rx.State):
                 logger.info("Sin archivos de sesión: NO habilitando file_search")
 
             try:
-                run_stream = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        client.beta.threads.runs.create,
-                        thread_id=self.thread_id,
-                        assistant_id=self.assistant_id,
-                        tools=tools_for_run,
-                        stream=True,
-                    ),
-                    timeout=300,
-                )
+                with timer.phase("run_create"):
+                    run_stream = await asyncio.wait_for(
+                        asyncio.to_thread(
+                            client.beta.threads.runs.create,
+                            thread_id=self.thread_id,
+                            assistant_id=self.assistant_id,
+                            tools=tools_for_run,
+                            stream=True,
+                        ),
+                        timeout=300,
+                    )
             except asyncio.TimeoutError:
-                logger.error("Timeout creando run de OpenAI")
+                logger.error(f"Timeout creando run de OpenAI ({timer.summary()})")
                 async with self:
                     if self.messages:
                         self.messages[-1]["content"] = "Error: La respuesta tardó demasiado."
@@ -617,130 +794,133 @@ class ChatState(rx.State):
 
             logger.info("generate_response_streaming: Run creado con stream=True.")
 
-            first_chunk_processed = False
             accumulated_response = ""
             accumulated_content = ""
-            last_update_time = time.time()
+            flush_scheduler = FlushScheduler(
+                policy=self.stream_flush_policy,
+                min_chars=self.stream_min_chars,
+                min_interval_s=self.stream_min_interval_s,
+                max_updates_per_s=self.stream_max_updates_per_s,
+            )
             last_scroll_time = 0.0
             usage_applied = False
+            run_failed = False
+            token_counter = StreamingTokenCounter(self.model_name or "gpt-4o-mini")
 
             while True:
                 should_break_outer_loop = False
 
-                for event in run_stream:
-                    # Intentar capturar el run_id al inicio
-                    try:
-                        ev = getattr(event, "event", "")
-                        data = getattr(event, "data", None)
-                        if ev.startswith("thread.run.") and data is not None and getattr(data, "id", None):
-                            async with self:
-                                self.current_run_id = data.id
-                    except Exception:
-                        pass
-
-                    if event.event == "thread.message.delta":
-                        delta = event.data.delta
-                        if delta.content:
-                            text_chunk = delta.content[0].text.value
-                            if text_chunk:
-                                accumulated_content += text_chunk
-                                current_time = time.time()
-                                should_update = len(accumulated_content) >= self.stream_min_chars or "\n" in text_chunk or (current_time - last_update_time) >= self.stream_min_interval_s
-
-                                if should_update:
-                                    async with self:
-                                        if not first_chunk_processed:
-                                            # vaciar placeholder solo al final; mostrar stream en streaming_response
-                                            first_chunk_processed = True
-                                        accumulated_response += accumulated_content
-                                        self.streaming_response = accumulated_response
-                                        self.approx_output_tokens = count_text_tokens(self.streaming_response, self.model_name or "gpt-4o-mini")
-                                    yield
+                # Lectura del stream en un hilo dedicado: no bloquea el event loop
+                async with contextlib.aclosing(aiter_in_thread(run_stream)) as events:
+                    async for event in events:
+                        # Intentar capturar el run_id al inicio
+                        try:
+                            ev = getattr(event, "event", "")
+                            data = getattr(event, "data", None)
+                            if ev.startswith("thread.run.") and data is not None and getattr(data, "id", None):
+                                async with self:
+                                    self.current_run_id = data.id
+                        except Exception:
+                            pass
 
-                                    # scroll con moderación
-                                    if (current_time - last_scroll_time) >= 0.8 or len(accumulated_response) % 1000 == 0:
-                                        yield self.scroll_to_bottom()
-                                        last_scroll_time = current_time
+                        if event.event == "thread.message.delta":
+                            delta = event.data.delta
+                            if delta.content:
+                                text_chunk = delta.content[0].text.value
+                                if text_chunk:
+                                    timer.mark_first_token()
+                                    accumulated_content += text_chunk
+                                    current_time = time.time()
+
+                                    if flush_scheduler.should_flush(accumulated_content, text_chunk, current_time):
+                                        # El texto acumulado vive en el handler; al cliente solo viaja el delta
+                                        # y el estado solo se toca para el contador de tokens.
+                                        accumulated_response += accumulated_content
+                                        async with self:
+                                            self.approx_output_tokens = token_counter.feed(accumulated_content)
+                                        yield self.append_stream_delta(accumulated_content)
 
-                                    accumulated_content = ""
-                                    last_update_time = current_time
+                                        # scroll con moderación
+                                        if (current_time - last_scroll_time) >= 0.8 or len(accumulated_response) % 1000 == 0:
+                                            yield self.scroll_to_bottom()
+                                            last_scroll_time = current_time
 
-                    elif event.event == "thread.run.requires_action":
-                        run_id = event.data.id
-                        async with self:
-                            self.current_run_id = run_id
+                                        accumulated_content = ""
+                                        flush_scheduler.record_flush(time.time() - current_time)
 
-                        tool_outputs = []
-                        # feedback ligero para UI
-                        try:
-                            first_args = json.loads(event.data.required_action.submit_tool_outputs.tool_calls[0].function.arguments)
-                            first_query = first_args.get("query", "...")
+                        elif event.event == "thread.run.requires_action":
+                            run_id = event.data.id
                             async with self:
-                                self.streaming_response = f"Buscando: '{first_query}'..."
-                            yield
-                        except Exception:
-                            pass
-
-                        for tool_call in event.data.required_action.submit_tool_outputs.tool_calls:
-                            function_name = tool_call.function.name
-                            arguments = json.loads(tool_call.function.arguments)
-                            if function_name in AVAILABLE_TOOLS:
-                                try:
-                                    output = await asyncio.wait_for(
-                                        asyncio.to_thread(AVAILABLE_TOOLS[function_name], **arguments),
-                                        timeout=120,
-                                    )
-                                except asyncio.TimeoutError:
-                                    logger.error(f"Timeout ejecutando herramienta {function_name}")
-                                    output = f"Error: La herramienta {function_name} tardó demasiado."
-                                except Exception as e:
-                                    logger.error(f"Error en herramienta {function_name}: {e}")
-                                    output = f"Error ejecutando {function_name}: {str(e)}"
-                                tool_outputs.append({"tool_call_id": tool_call.id, "output": output})
-
-                        if tool_outputs:
-                            run_stream = await asyncio.to_thread(
-                                client.beta.threads.runs.submit_tool_outputs,
-                                thread_id=self.thread_id,
-                                run_id=run_id,
-                                tool_outputs=tool_outputs,
-                                stream=True,
-                            )
-                            break
+                                self.current_run_id = run_id
 
-                    elif event.event in ["thread.run.completed", "thread.run.failed", "error"]:
-                        if event.event == "thread.run.completed":
-                            # NUEVO: usage directo desde el evento
+                            # feedback ligero para UI
                             try:
-                                usage = getattr(getattr(event, "data", None), "usage", None)
-                                if usage:
-                                    async with self:
-                                        self._apply_usage_object(usage)
-                                    usage_applied = True
+                                first_args = json.loads(event.data.required_action.submit_tool_outputs.tool_calls[0].function.arguments)
+                                first_query = first_args.get("query", "...")
+                                async with self:
+                                    self.streaming_response = f"Buscando: '{first_query}'..."
+                                yield
                             except Exception:
                                 pass
-                        else:
-                            logger.error(f"Stream: Run fallido. Evento: {event.event}")
-                            async with self:
-                                self.streaming_response = "Repite la solicitud por favor."
+
+                            # Tool calls independientes se ejecutan en paralelo (concurrencia acotada)
+                            with timer.phase("tools"):
+                                tool_outputs = await run_tool_calls(
+                                    event.data.required_action.submit_tool_outputs.tool_calls,
+                                    AVAILABLE_TOOLS,
+                                )
+                            logger.info(f"Latencia de herramientas: {tool_latency_histogram()}")
+
+                            if tool_outputs:
+                                with timer.phase("tool_submit"):
+                                    run_stream = await asyncio.to_thread(
+                                        client.beta.threads.runs.submit_tool_outputs,
+                                        thread_id=self.thread_id,
+                                        run_id=run_id,
+                                        tool_outputs=tool_outputs,
+                                        stream=True,
+                                    )
+                                break
+
+                        elif event.event in ["thread.run.completed", "thread.run.failed", "error"]:
+                            if event.event == "thread.run.completed":
+                                # NUEVO: usage directo desde el evento
+                                try:
+                                    usage = getattr(getattr(event, "data", None), "usage", None)
+                                    if usage:
+                                        async with self:
+                                            self._apply_usage_object(usage)
+                                        usage_applied = True
+                                except Exception:
+                                    pass
+                            else:
+                                logger.error(f"Stream: Run fallido. Evento: {event.event}")
+                                run_failed = True
+                                async with self:
+                                    self.streaming_response = "Repite la solicitud por favor."
+                            should_break_outer_loop = True
+                            break
+                    else:
+                        # El stream terminó sin evento final ni tool calls: no reintentar.
                         should_break_outer_loop = True
-                        break
 
                 if should_break_outer_loop:
                     break
 
+            logger.info(f"Streaming: {flush_scheduler.flushes} flushes (política={flush_scheduler.policy}, intervalo final={flush_scheduler.interval_s:.2f}s)")
+
             # Actualizar cualquier contenido restante
             if accumulated_content:
+                accumulated_response += accumulated_content
                 async with self:
-                    accumulated_response += accumulated_content
-                    self.streaming_response = accumulated_response
-                    self.approx_output_tokens = count_text_tokens(self.streaming_response, self.model_name or "gpt-4o-mini")
-                yield
+                    self.approx_output_tokens = token_counter.feed(accumulated_content)
+                yield self.append_stream_delta(accumulated_content)
 
             # NUEVO: recuperar usage si no vino en el stream
             if not usage_applied and self.thread_id and self.current_run_id:
                 try:
-                    run_obj = await asyncio.to_thread(client.beta.threads.runs.retrieve, self.thread_id, self.current_run_id)
+                    with timer.phase("usage"):
+                        run_obj = await asyncio.to_thread(client.beta.threads.runs.retrieve, self.thread_id, self.current_run_id)
                     usage = getattr(run_obj, "usage", None)
                     if usage:
                         async with self:
@@ -748,8 +928,10 @@ class ChatState(rx.State):
                 except Exception as e:
                     logger.debug(f"No se pudo recuperar usage del run: {e}")
 
-            # Consolidar streaming_response dentro del mensaje
+            # Consolidar la respuesta completa dentro del mensaje (único envío del texto entero)
             async with self:
+                if accumulated_response and not run_failed:
+                    self.streaming_response = accumulated_response
                 if self.messages:
                     self.messages[-1]["content"] = self.streaming_response or "Sin contenido."
                 self.processing = False
@@ -764,9 +946,10 @@ class ChatState(rx.State):
             yield ChatState.reset_focus_trigger
 
             logger.info("generate_response_streaming: Bucle principal completado.")
+            timer.log()
 
         except Exception as e:
-            logger.error(f"Error en generate_response_streaming: {e}", exc_info=True)
+            logger.error(f"Error en generate_response_streaming: {e} ({timer.summary()})", exc_info=True)
             async with self:
                 if self.messages:
                     self.messages[-1]["content"] = f"Error inesperado: {e}"
@@ -918,8 +1101,6 @@ class ChatState(rx.State):
                     "content": "¡Hola! Soy LeyIA, tu Asistente Legal. " "Puedes hacerme una pregunta o subir un " "documento para analizarlo.",
                 }
             ]
-        if self.has_api_keys:
-            return [ChatState.monitor_session_health, ChatState.cleanup_by_timestamp]
 
     @rx.event
     def initialize_chat_simple(self):
@@ -931,79 +1112,36 @@ class ChatState(rx.State):
                 }
             ]
 
+    async def _prune_released_files(self):
+        """Quita de la sesión los archivos que el janitor central ya liberó (antigüedad o thread eliminado).
+
+        Se llama desde eventos background antes de adjuntar archivos a un mensaje.
+        """
+        if not self.session_files:
+            return
+        try:
+            tracked = await asyncio.to_thread(session_janitor.tracked_file_ids, self._session_id())
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el registro de archivos de sesión: {e}")
+            return
+        async with self:
+            released = {f["file_id"] for f in self.session_files if f["file_id"] not in tracked}
+            if released:
+                logger.info(f"{len(released)} archivos liberados por el janitor retirados de la sesión")
+                self.session_files = [f for f in self.session_files if f["file_id"] not in released]
+                self.file_info_list = [f for f in self.file_info_list if f["file_id"] not in released]
+
     @rx.event(background=True)
     async def cleanup_session_files(self):
         """Limpia archivos de la sesión en OpenAI (background para no bloquear UI)."""
         client = self.get_client(self.openai_api_key)
         if client and self.session_files:
-            for file_info in list(self.session_files):
-                try:
-                    await asyncio.to_thread(client.files.delete, file_info["file_id"])
-                except APIError:
-                    pass
-            async with self:
-                self.session_files = []
-
-    @rx.event(background=True)
-    async def monitor_session_health(self):
-        logger.info("Monitor de sesión iniciado")
-        while True:
-            await asyncio.sleep(300)
-            if self.session_files and self.thread_id:
-                client = self.get_client(self.openai_api_key)
-                if client:
-                    try:
-                        await asyncio.to_thread(client.beta.threads.retrieve, self.thread_id)
-                        logger.info(f"Thread {self.thread_id} activo - {len(self.session_files)} archivos")
-                    except APIError as e:
-                        if "No thread found" in str(e) or getattr(e, "status_code", None) == 404:
-                            logger.warning(f"Thread {self.thread_id} no encontrado. Limpiando archivos...")
-                            await self._cleanup_orphaned_files()
-                        else:
-                            logger.error(f"Error verificando thread: {e}")
-                    except Exception as e:
-                        logger.error(f"Error de conexión verificando thread: {e}")
-
-    async def _cleanup_orphaned_files(self):
-        client = self.get_client(self.openai_api_key)
-        if client and self.session_files:
-            logger.info(f"Limpiando {len(self.session_files)} archivos huérfanos")
-            for file_info in list(self.session_files):
-                try:
-                    await asyncio.to_thread(client.files.delete, file_info["file_id"])
-                    logger.info(f"Archivo huérfano eliminado: {file_info['filename']}")
-                except APIError:
-                    pass
+            # Un solo lote concurrente en lugar de N borrados secuenciales
+            released = await asyncio.to_thread(session_janitor.untrack_files, self._session_id())
+            report = await release_files(client, released)
+            logger.info(f"Limpieza de archivos de sesión: {report}")
             async with self:
                 self.session_files = []
-                self.thread_id = None
-                logger.info("Estado de sesión limpiado por thread huérfano")
-
-    @rx.event(background=True)
-    async def cleanup_by_timestamp(self):
-        logger.info("Monitor de limpieza por timestamp iniciado")
-        while True:
-            await asyncio.sleep(3600)
-            if self.session_files:
-                current_time = time.time()
-                old_files = []
-                for file_info in self.session_files:
-                    file_age = current_time - file_info.get("uploaded_at", current_time)
-                    if file_age > 7200:
-                        old_files.append(file_info)
-
-                if old_files:
-                    logger.info(f"Encontrados {len(old_files)} archivos antiguos para limpiar")
-                    client = self.get_client(self.openai_api_key)
-                    if client:
-                        for file_info in old_files:
-                            try:
-                                await asyncio.to_thread(client.files.delete, file_info["file_id"])
-                                logger.info(f"Archivo antiguo eliminado: {file_info['filename']}")
-                            except APIError:
-                                pass
-                        async with self:
-                            self.session_files = [f for f in self.session_files if f not in old_files]
 
     def _convert_chat_to_notebook(self, chat_messages: List[Dict[str, str]], title: str) -> Dict[str, Any]:
         from datetime import datetime
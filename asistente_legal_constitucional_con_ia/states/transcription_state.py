@@ -3,20 +3,35 @@
 
 import asyncio
 import dataclasses
-import json
+import logging
 import os
-from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-import assemblyai
 import reflex as rx
 from ..auth_config import lauth
 from dotenv import load_dotenv
 
 from ..models.database import AudioTranscription, Notebook
+from ..services import transcription_jobs
+from ..services.audio_store import audio_store
+from ..services.transcription_jobs import transcription_pool
 
 load_dotenv()
 
+logger = logging.getLogger("asistente_legal")
+
+JOB_WATCH_INTERVAL_S = 2.0
+JOB_WATCH_MAX_INTERVAL_S = 15.0
+# Tope de la suscripción de una sesión; el trabajo sigue en el pool y se retoma al volver.
+JOB_WATCH_MAX_S = float(os.getenv("TRANSCRIPTION_WATCH_MAX_S", "7200"))
+
+# Traducir estados técnicos del trabajo a mensajes amigables
+JOB_STATUS_MESSAGES = {
+    "pending": "⏳ Subiendo audio al servidor de transcripción...",
+    "submitted": "⏱️ Tu archivo está en cola. Puede tomar 2-5 minutos dependiendo de la duración...",
+    "processing": "🎙️ Transcribiendo tu audio. Esto puede tomar varios minutos...",
+}
+
 
 @dataclasses.dataclass
 class TranscriptionType:
@@ -42,8 +57,7 @@ class TranscriptionState(rx.State):
     uploaded_files: list[str] = []
     
     # Variables temporales para pasar datos entre handlers
-    _pending_audio_data: bytes = b""
-    _pending_filename: str = ""
+    _active_job_id: int = 0  # Trabajo de transcripción persistente que sigue esta sesión
     _pending_workspace_id: str = ""  # Workspace ID del usuario para background task
     
     # ✅ NUEVO: Caché del workspace_id para evitar consultas repetidas a Redis
@@ -145,8 +159,9 @@ class TranscriptionState(rx.State):
     @rx.event
     async def handle_transcription_request(self, files: List[rx.UploadFile]):
         """
-        Handler de upload: Solo valida y lee el archivo.
-        Delega el procesamiento pesado a process_transcription_background.
+        Handler de upload: valida el archivo, lo guarda en el almacén local y encola
+        un trabajo persistente. El pool de transcripción procesa el trabajo; este estado
+        solo se suscribe a su avance (watch_transcription_job).
         """
         if not files:
             return
@@ -159,204 +174,137 @@ class TranscriptionState(rx.State):
                 yield rx.toast.error(f"'{file.name}' no es un MP3.")
                 return
 
+            # Sin pool activo el trabajo quedaría pendiente para siempre: fallar de inmediato
+            disabled_reason = transcription_pool.disabled_reason()
+            if disabled_reason:
+                self.error_message = f"Error de configuración: {disabled_reason}"
+                yield rx.toast.error(self.error_message)
+                return
+
             # ✅ MEJORA UI: Feedback INMEDIATO al usuario antes de cualquier operación
             self.transcribing = True
             self.progress_message = f"🔄 Iniciando proceso para '{file.name}'..."
             self.error_message = ""
             yield  # 👈 Actualizar UI INMEDIATAMENTE
             
-            # Leer archivo (< 1 segundo, no causa timeout)
-            self.progress_message = "📖 Leyendo archivo de audio..."
-            yield  # 👈 Mostrar que estamos leyendo
-            
-            # ✅ OPTIMIZADO: Obtener workspace_id ANTES de entrar al background task usando versión cacheada
-            # Esto reduce el tiempo de respuesta de 10-15s a < 1s en la primera llamada
-            # y < 100ms en llamadas subsecuentes (usa caché de sesión)
+            # ✅ OPTIMIZADO: Obtener workspace_id usando versión cacheada
             self.progress_message = "🔐 Verificando credenciales de usuario..."
             yield  # 👈 Indicar que estamos verificando
             
             self._pending_workspace_id = await self.get_user_workspace_id_cached()
             
-            # Actualizar mensaje después de obtener workspace_id
-            self.progress_message = f"📤 Preparando envío de '{file.name}' a AssemblyAI..."
-            yield  # 👈 Confirmar preparación
+            self.progress_message = "📖 Leyendo archivo de audio..."
+            yield  # 👈 Mostrar que estamos leyendo
             
-            # Almacenar datos temporalmente
-            self._pending_audio_data = await file.read()
-            self._pending_filename = file.name
+            # Volcar el audio al almacén local por bloques; en el estado solo queda el handle
+            audio_handle, audio_size = await audio_store.put(file)
+            logger.debug(f"Audio '{file.name}' fuera del estado: {audio_size:,} bytes en disco, {len(audio_handle)} bytes de handle")
+
+            # Encolar el trabajo persistente y despertar al pool de este proceso
+            self._active_job_id = await asyncio.to_thread(transcription_jobs.enqueue, self._pending_workspace_id, file.name, audio_handle)
+            transcription_pool.notify()
             self.uploaded_files = [file.name]
-            
+            self.progress_message = JOB_STATUS_MESSAGES["pending"]
             yield
             
-            # Iniciar procesamiento en background usando yield from
-            yield TranscriptionState.process_transcription_background
+            yield TranscriptionState.watch_transcription_job
             
         except Exception as e:
             self.error_message = f"Error al leer archivo: {str(e)}"
             self.transcribing = False
             yield rx.toast.error(self.error_message)
 
+    @rx.event
+    async def resume_active_job(self):
+        """Retoma la suscripción a un trabajo en curso del usuario (p. ej. tras recargar la página)."""
+        try:
+            workspace_id = await self.get_user_workspace_id_cached()
+            job_id = await asyncio.to_thread(transcription_jobs.latest_active_job, workspace_id)
+        except Exception as e:
+            logger.warning(f"No se pudo consultar trabajos activos: {e}")
+            return
+        if not job_id:
+            return
+        self._pending_workspace_id = workspace_id
+        self._active_job_id = job_id
+        self.transcribing = True
+        self.progress_message = "⏱️ Retomando tu transcripción en curso..."
+        yield TranscriptionState.watch_transcription_job
+
     @rx.event(background=True)
-    async def process_transcription_background(self):
+    async def watch_transcription_job(self):
         """
-        Procesa la transcripción usando AssemblyAI.
-        Se ejecuta en background para evitar timeouts de lock.
+        Sigue el estado del trabajo en la BD y lo refleja en la UI.
+        El envío y el sondeo a AssemblyAI los hace el pool; si el worker se reinicia,
+        el trabajo continúa y esta suscripción solo lee su estado.
         """
-        # Copiar datos en variables locales y limpiar mensajes de error previos
         async with self:
-            audio_data = self._pending_audio_data
-            filename = self._pending_filename
-            self.error_message = ""  # Limpiar errores de ejecuciones anteriores
-            
-            if not audio_data:
-                self.error_message = "No hay datos de audio para procesar"
-                self.transcribing = False
-                return
-
-        try:
-            # Configurar AssemblyAI
-            api_key = os.getenv("ASSEMBLYAI_API_KEY")
-            if not api_key:
-                raise ValueError("API key de AssemblyAI no configurada en .env")
-
-            assemblyai.settings.http_timeout = 300
-            assemblyai.settings.api_key = api_key
-            transcriber = assemblyai.Transcriber()
-            config = assemblyai.TranscriptionConfig(
-                speaker_labels=True, 
-                language_code="es"
-            )
-
-            # Enviar el trabajo
-            async with self:
-                self.progress_message = f"⏳ Subiendo audio al servidor de transcripción..."
-            
-            submitted_transcript = await asyncio.to_thread(
-                transcriber.submit, 
-                audio_data, 
-                config
-            )
-
-            async with self:
-                self.progress_message = f"⏱️ Tu archivo está en cola. Puede tomar 2-5 minutos dependiendo de la duración..."
-
-            # Sondear el estado
-            while True:
-                polled_transcript = await asyncio.to_thread(
-                    assemblyai.Transcript.get_by_id, 
-                    submitted_transcript.id
-                )
+            job_id = self._active_job_id
+            workspace_id = self._pending_workspace_id or "public"
+        if not job_id:
+            return
 
-                if polled_transcript.status == assemblyai.TranscriptStatus.completed:
-                    async with self:
-                        self.progress_message = "¡Éxito! Generando notebook..."
-                        self.error_message = ""  # Limpiar cualquier error residual
-                    
-                    await self._process_successful_transcription(
-                        polled_transcript, 
-                        filename
-                    )
-                    
-                    async with self:
-                        self.transcribing = False
-                        self.progress_message = ""
-                        self.error_message = ""  # Asegurar que está limpio al final
-                        self._pending_audio_data = b""
-                        self._pending_filename = ""
-                        self._pending_workspace_id = ""
-                    
-                    yield rx.toast.success(f"¡Notebook de '{filename}' generado!")
-                    break
-
-                elif polled_transcript.status == assemblyai.TranscriptStatus.error:
-                    raise RuntimeError(
-                        f"Error de AssemblyAI: {polled_transcript.error}"
-                    )
-                else:
-                    # Traducir estados técnicos a mensajes amigables
-                    status_messages = {
-                        "queued": "⏱️ En cola de procesamiento. Tu transcripción iniciará pronto...",
-                        "processing": "🎙️ Transcribiendo tu audio. Esto puede tomar varios minutos...",
-                    }
-                    async with self:
-                        self.progress_message = status_messages.get(
-                            str(polled_transcript.status),
-                            f"⚙️ Procesando... Verificando estado cada 5 segundos..."
-                        )
-                    await asyncio.sleep(5)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + JOB_WATCH_MAX_S
+        interval = JOB_WATCH_INTERVAL_S
+        while True:
+            try:
+                job = await asyncio.to_thread(transcription_jobs.get_job, job_id)
+            except Exception as e:
+                logger.warning(f"Error leyendo trabajo de transcripción {job_id}: {e}")
+                job = {"status": "unknown"}
 
-        except Exception as e:
-            # Log detallado para debugging
-            import traceback
-            error_detail = f"Error en el proceso: {str(e)}\nTraceback: {traceback.format_exc()}"
-            print(f"DEBUG EXCEPTION: {error_detail}")
-            
             async with self:
-                self.error_message = f"Error en el proceso: {str(e)}"
-                self.transcribing = False
-                self._pending_audio_data = b""
-                self._pending_filename = ""
-                self._pending_workspace_id = ""
-            yield rx.toast.error(self.error_message)
-
-    async def _process_successful_transcription(self, transcript: assemblyai.Transcript, filename: str):
-        """Helper para procesar una transcripción exitosa."""
-        # ... (la lógica para crear el texto de la transcripción y el notebook_title sigue igual)
-        if transcript.utterances:
-            lines = [f"**Hablante {utt.speaker}:** {utt.text}" for utt in transcript.utterances]
-            transcription_text = "## Transcripción con Identificación de Hablantes\n\n" + "\n\n".join(lines)
-        else:
-            transcription_text = transcript.text or ""
-
-        notebook_title = f"Transcripción - {os.path.splitext(filename)[0]}"
-        duration_secs = transcript.audio_duration or 0
-        duration_fmt = f"{int(duration_secs // 60)}:{int(duration_secs % 60):02d}"
-
-        # Crea el registro en la BD
-        await self._create_transcription_notebook(transcription_text, notebook_title, filename, duration_fmt)
+                # Otro trabajo reemplazó a este en la sesión: dejar de seguirlo
+                if self._active_job_id != job_id:
+                    return
 
-        # Obtener el workspace_id guardado
-        workspace_id = self._pending_workspace_id or "public"
-        
-        # 1. Obtener los datos actualizados usando el método auxiliar
-        updated_transcriptions = self._fetch_user_transcriptions_data(workspace_id)
+            if job is None:
+                async with self:
+                    self.error_message = "El trabajo de transcripción no existe."
+                    self.transcribing = False
+                    self._active_job_id = 0
+                yield rx.toast.error(self.error_message)
+                return
 
-        # 2. Modificar el estado de forma segura desde la tarea en segundo plano
-        async with self:
-            self.transcriptions = updated_transcriptions
-            self.current_transcription = "SUCCESS"
-            self.uploaded_files = []
+            if job["status"] == "completed":
+                updated_transcriptions = self._fetch_user_transcriptions_data(workspace_id)
+                async with self:
+                    self.transcriptions = updated_transcriptions
+                    self.current_transcription = "SUCCESS"
+                    self.uploaded_files = []
+                    self.transcribing = False
+                    self.progress_message = ""
+                    self.error_message = ""
+                    self._active_job_id = 0
+                yield rx.toast.success(f"¡Notebook de '{job['filename']}' generado!")
+                return
 
-    async def _create_transcription_notebook(self, transcription_text: str, title: str, filename: str, duration: str):
-        """Crea un notebook y el registro de transcripción en la BD."""
-        # Usar el workspace_id almacenado en lugar de llamar a get_user_workspace_id()
-        async with self:
-            workspace_id = self._pending_workspace_id or "public"
-        
-        with rx.session() as session:
-            from ..models.database import Notebook
+            if job["status"] == "failed":
+                async with self:
+                    self.error_message = f"Error en el proceso: {job['error']}"
+                    self.transcribing = False
+                    self._active_job_id = 0
+                yield rx.toast.error(self.error_message)
+                return
 
-            notebook_content = self._convert_transcription_to_notebook(transcription_text, title, filename)
+            if loop.time() >= deadline:
+                # El trabajo no se cancela: el notebook aparecerá al terminar y resume_active_job lo retoma.
+                async with self:
+                    self.transcribing = False
+                    self.progress_message = ""
+                    self._active_job_id = 0
+                yield rx.toast.info("La transcripción sigue en curso. Vuelve más tarde: el notebook aparecerá al terminar.")
+                return
 
-            notebook = Notebook(
-                title=title,
-                content=json.dumps(notebook_content),
-                workspace_id=workspace_id,
-                notebook_type="transcription",
-            )
-            session.add(notebook)
-            session.commit()
-            session.refresh(notebook)
-
-            transcription = AudioTranscription(
-                filename=filename,
-                transcription_text=transcription_text,
-                notebook_id=notebook.id,
-                audio_duration=duration,
-                workspace_id=workspace_id,
-            )
-            session.add(transcription)
-            session.commit()
+            async with self:
+                if job.get("progress"):
+                    self.progress_message = f"🎙️ Transcribiendo por segmentos: {job['progress']} listos. El notebook se va completando..."
+                else:
+                    self.progress_message = JOB_STATUS_MESSAGES.get(job["status"], "⚙️ Procesando...")
+            await asyncio.sleep(interval)
+            # Los trabajos tardan minutos: espaciar la lectura de la BD mientras tanto.
+            interval = min(JOB_WATCH_MAX_INTERVAL_S, interval * 1.5)
 
     @rx.event
     async def load_user_transcriptions(self, workspace_id: Optional[str] = None):
@@ -430,10 +378,7 @@ class TranscriptionState(rx.State):
 
     def _convert_transcription_to_notebook(self, transcription_text: str, title: str, filename: str) -> Dict[str, Any]:
         """Convierte una transcripción a formato notebook JSON."""
-        now = datetime.now().strftime("%d/%m/%Y a las %H:%M")
-        header_cell = {"cell_type": "markdown", "source": [f"# {title}\n\n", f"**Archivo:** {filename}\n\n", f"**Generado:** {now}\n\n", "---\n\n"]}
-        content_cell = {"cell_type": "markdown", "source": ["## 📝 Transcripción Completa\n\n", f"{transcription_text}\n\n"]}
-        return {"cells": [header_cell, content_cell], "metadata": {"kernelspec": {"display_name": "Audio Transcription", "language": "markdown", "name": "audio_transcription"}}}
+        return transcription_jobs.build_notebook_content(transcription_text, title, filename)
 
     @rx.event
     async def reset_upload_state(self):
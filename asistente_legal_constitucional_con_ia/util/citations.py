@@ -0,0 +1,107 @@
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Patrones compilados una sola vez: este módulo corre en el camino caliente de cada búsqueda.
+_SEP = r"[\s\-\./]*"
+_YEAR = r"(?P<year>\d{4}|\d{2})"
+# Leyes y gacetas no tienen una regla de siglo fiable: solo se reconocen con el año completo.
+_YEAR4 = r"(?P<year>\d{4})"
+_YEAR_SEP = r"(?:\s*(?:de|del|/|-)\s*|\s+)"
+
+_SENTENCIA_RE = re.compile(
+    r"(?:\bsentencia\s+)?\b(?P<kind>su|c|t)" + _SEP + r"(?P<num>\d{1,4})(?:\s*[a-z](?![a-z]))?" + _YEAR_SEP + _YEAR + r"\b",
+    re.IGNORECASE,
+)
+_LEY_RE = re.compile(
+    r"\b(?:ley|l\.)\s*(?:n(?:o|ú|u)?(?:m(?:ero)?)?\.?\s*)?(?P<num>\d{1,5})" + _YEAR_SEP + _YEAR4 + r"\b",
+    re.IGNORECASE,
+)
+_GACETA_RE = re.compile(
+    r"\bgaceta(?:\s+del\s+congreso)?\s*(?:n(?:o|ú|u)?(?:m(?:ero)?)?\.?\s*)?(?P<num>\d{1,5})" + _YEAR_SEP + _YEAR4 + r"\b",
+    re.IGNORECASE,
+)
+_BARE_NUM_YEAR_RE = re.compile(r"^\s*(?:n(?:o|ú|u)?\.?\s*)?(?P<num>\d{1,5})" + _YEAR_SEP + _YEAR4 + r"\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Citation:
+    """Cita legal normalizada."""
+
+    tipo: str  # 'ley' | 'sentencia' | 'gaceta'
+    numero: str  # Tal como se escribió: '1437', 'C-123', 'T-025'
+    anio: int
+
+    @property
+    def canonical_id(self) -> str:
+        """Identificador estable, p. ej. 'sentencia:T-25:2004'. Los ceros a la izquierda solo se quitan aquí."""
+        numero = re.sub(r"\d+", lambda m: str(int(m.group())), self.numero)
+        return f"{self.tipo}:{numero}:{self.anio}"
+
+    @property
+    def query(self) -> str:
+        """Forma de búsqueda canónica, p. ej. 'Sentencia C-123 de 2023'."""
+        if self.tipo == "gaceta":
+            return f"{self.numero} de {self.anio}"
+        return f"{self.tipo.capitalize()} {self.numero} de {self.anio}"
+
+
+def _sentencia_year(year: str) -> int:
+    value = int(year)
+    if len(year) == 2:
+        # La Corte Constitucional existe desde 1992: '92'..'99' son 199x, el resto 20xx.
+        value += 1900 if value >= 90 else 2000
+    return value
+
+
+def _from_match(tipo: str, match: re.Match) -> Citation:
+    # El número se conserva como se escribió ('T-025'): es la forma que aparece en el texto oficial.
+    num = match.group("num")
+    if tipo == "sentencia":
+        return Citation(tipo=tipo, numero=f"{match.group('kind').upper()}-{num}", anio=_sentencia_year(match.group("year")))
+    return Citation(tipo=tipo, numero=num, anio=int(match.group("year")))
+
+
+def _normalize_terms(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s\-]", " ", text).lower().split())
+
+
+def split_citation(text: str, tipo_documento: Optional[str] = None) -> Tuple[Optional[Citation], str]:
+    """Separa la primera cita de un texto: 'Ley 1437 de 2011 artículo 137' -> (Ley 1437/2011, 'artículo 137').
+
+    El resto se devuelve normalizado (minúsculas, sin puntuación) para formar claves.
+    `tipo_documento` desambigua las formas sin prefijo como '758 de 2017'.
+    """
+    if not text:
+        return None, ""
+    order = ("sentencia", "ley", "gaceta")
+    if tipo_documento in order:
+        order = (tipo_documento,) + tuple(t for t in order if t != tipo_documento)
+    patterns = {"sentencia": _SENTENCIA_RE, "ley": _LEY_RE, "gaceta": _GACETA_RE}
+    for tipo in order:
+        match = patterns[tipo].search(text)
+        if match:
+            return _from_match(tipo, match), _normalize_terms(text[: match.start()] + " " + text[match.end() :])
+    if tipo_documento in ("ley", "gaceta"):
+        match = _BARE_NUM_YEAR_RE.match(text)
+        if match:
+            return _from_match(tipo_documento, match), ""
+    return None, _normalize_terms(text)
+
+
+def mentions_citation(text: str, citation: Citation) -> bool:
+    """Indica si un texto (título, URL) menciona la cita dada."""
+    pattern = {"sentencia": _SENTENCIA_RE, "ley": _LEY_RE, "gaceta": _GACETA_RE}[citation.tipo]
+    # En URLs los separadores suelen ser '_' o '+' ('ley_1437_2011.html').
+    normalized = re.sub(r"[_+]", " ", text or "")
+    return any(_from_match(citation.tipo, match).canonical_id == citation.canonical_id for match in pattern.finditer(normalized))
+
+
+def parse_citation(text: str, tipo_documento: Optional[str] = None) -> Optional[Citation]:
+    """Interpreta un texto que es exactamente una cita ('C-123/23', 'ley 1437 de 2011', '758 de 2017').
+
+    Devuelve None si el texto no es una cita o si trae otros términos (artículo, tema):
+    reescribirlo a la forma canónica perdería esos términos.
+    """
+    citation, remainder = split_citation(text, tipo_documento)
+    return citation if citation and not remainder else None
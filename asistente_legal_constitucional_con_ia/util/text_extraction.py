@@ -1,33 +1,271 @@
 import io
 import logging
-from typing import Optional
+import multiprocessing
+import os
+import re
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, Optional, Union
 
 import docx
 import fitz
+from docx.table import Table
 
 logging.basicConfig(level=logging.INFO)
 
+# Incrementar cuando cambie el texto producido por el extractor (invalida cachés de texto).
+EXTRACTOR_VERSION = "2"
+
+# Por debajo de este número de páginas la extracción sigue en un solo proceso
+# (el reparto por páginas lo hace services.extraction_pipeline).
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "64"))
+
+
+# Un PDF puede venir en memoria (bytes) o como ruta a un archivo en disco; con una ruta
+# MuPDF lee el archivo bajo demanda en lugar de cargarlo completo.
+PdfSource = Union[bytes, str]
+
+
+def process_pool_context():
+    """Contexto para pools de procesos de extracción.
+
+    El backend es multihilo (to_thread, pools httpx, SQLAlchemy, lectores del stream):
+    hacer fork de él puede heredar locks tomados y bloquear al hijo. forkserver (o spawn
+    donde no existe) arranca los workers desde un proceso limpio.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _open_pdf(source: PdfSource):
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def count_pdf_pages(source: PdfSource) -> int:
+    """Número de páginas de un PDF (abre solo la tabla de páginas, sin extraer texto)."""
+    with _open_pdf(source) as doc:
+        return doc.page_count
+
+
+def extract_pdf_page_range(source: PdfSource, start: int, end: int) -> list[str]:
+    """Extrae el texto de las páginas [start, end) de un PDF.
+
+    Función de nivel de módulo para poder ejecutarse en un pool de procesos.
+    """
+    with _open_pdf(source) as doc:
+        return [doc[i].get_text() for i in range(start, min(end, doc.page_count))]
+
+
+def _sample_page_indexes(total_pages: int, samples: int) -> list[int]:
+    if total_pages <= samples:
+        return list(range(total_pages))
+    step = (total_pages - 1) / max(samples - 1, 1)
+    return sorted({round(i * step) for i in range(samples)})
+
+
+def classify_pdf(source: PdfSource, samples: int = 5) -> str:
+    """Clasifica un PDF como 'digital', 'scanned' o 'mixed' muestreando unas pocas páginas.
+
+    Por página se mira la capa de texto, las fuentes embebidas y la fracción del área
+    cubierta por imágenes, sin extraer el documento completo.
+    """
+    with _open_pdf(source) as doc:
+        kinds = set()
+        for index in _sample_page_indexes(doc.page_count, samples):
+            page = doc[index]
+            chars = len(page.get_text().strip())
+            page_area = abs(page.rect) or 1.0
+            image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+            has_fonts = bool(page.get_fonts())
+            if chars >= 100 or (has_fonts and chars >= 20):
+                kinds.add("digital")
+            elif image_area / page_area >= 0.5 or not has_fonts:
+                kinds.add("scanned")
+            else:
+                kinds.add("digital")
+    if not kinds:
+        return "scanned"
+    return kinds.pop() if len(kinds) == 1 else "mixed"
+
+
+def extract_pdf_shard(shm_name: str, size: int, start: int, end: int) -> list[str]:
+    """Como `extract_pdf_page_range`, pero leyendo el PDF desde memoria compartida.
+
+    Evita serializar el documento completo hacia cada proceso del pool. MuPDF lee el
+    PDF directamente de la vista sobre la memoria compartida, sin copiarlo por lote.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        return extract_pdf_page_range(view, start, end)
+    finally:
+        # La vista debe liberarse antes de cerrar el segmento.
+        view.release()
+        shm.close()
+
+
+def page_shards(total_pages: int, shards: int) -> list[tuple[int, int]]:
+    """Divide [0, total_pages) en `shards` rangos contiguos de tamaño similar."""
+    if total_pages <= 0:
+        return []
+    shards = max(1, min(shards, total_pages))
+    step = -(-total_pages // shards)
+    return [(start, min(start + step, total_pages)) for start in range(0, total_pages, step)]
+
+
+@dataclass(frozen=True)
+class TextChunk:
+    """Fragmento de texto extraído con su ubicación en el documento.
+
+    `start`/`end` son offsets de caracteres dentro de la concatenación de todos los
+    fragmentos, es decir, del texto que devuelve `chunks_to_text`.
+    """
+
+    text: str
+    start: int
+    end: int
+    page: Optional[int] = None  # 1-based, solo PDFs
+    heading_path: tuple[str, ...] = ()
+
+
+# Estructura típica de normas colombianas: LIBRO > TÍTULO > CAPÍTULO > ARTÍCULO.
+_LEGAL_HEADING_LEVELS = (
+    ("libro", re.compile(r"^\s*LIBRO\s+\S+", re.IGNORECASE)),
+    ("titulo", re.compile(r"^\s*T[ÍI]TULO\s+[IVXLC\d]+\b", re.IGNORECASE)),
+    ("capitulo", re.compile(r"^\s*CAP[ÍI]TULO\s+[IVXLC\d]+\b", re.IGNORECASE)),
+    ("articulo", re.compile(r"^\s*ART[ÍI]CULO\s+\d+", re.IGNORECASE)),
+)
+
+
+def _legal_heading_level(line: str) -> Optional[int]:
+    for level, (_, pattern) in enumerate(_LEGAL_HEADING_LEVELS):
+        if pattern.match(line):
+            return level
+    return None
+
+
+def _push_heading(path: tuple[str, ...], levels: tuple[int, ...], level: int, title: str) -> tuple[tuple[str, ...], tuple[int, ...]]:
+    keep = [i for i, lvl in enumerate(levels) if lvl < level]
+    return tuple(path[i] for i in keep) + (title.strip(),), tuple(levels[i] for i in keep) + (level,)
+
+
+def _iter_pdf_chunks(source: PdfSource) -> Iterator[tuple[str, Optional[int], tuple[str, ...]]]:
+    path: tuple[str, ...] = ()
+    levels: tuple[int, ...] = ()
+    with _open_pdf(source) as doc:
+        for number, page in enumerate(doc, start=1):
+            text = page.get_text()
+            page_path = path
+            for line in text.splitlines():
+                level = _legal_heading_level(line)
+                if level is not None:
+                    path, levels = _push_heading(path, levels, level, line)
+            yield text, number, page_path
+
+
+def _docx_heading_level(paragraph) -> Optional[int]:
+    style = (getattr(paragraph.style, "name", "") or "").lower()
+    for prefix in ("heading ", "título ", "titulo "):
+        if style.startswith(prefix) and style[len(prefix):].strip().isdigit():
+            return int(style[len(prefix):].strip())
+    if style in ("title", "título", "titulo"):
+        return 0
+    return None
+
+
+def _iter_docx_chunks(source: PdfSource) -> Iterator[tuple[str, Optional[int], tuple[str, ...]]]:
+    """Una sección por encabezado; las tablas se incluyen en orden como filas 'a | b | c'."""
+    document = docx.Document(source if isinstance(source, str) else io.BytesIO(source))
+    path: tuple[str, ...] = ()
+    levels: tuple[int, ...] = ()
+    lines: list[str] = []
+    for block in document.iter_inner_content():
+        if isinstance(block, Table):
+            lines.extend(" | ".join(cell.text.strip() for cell in row.cells) for row in block.rows)
+            continue
+        level = _docx_heading_level(block)
+        if level is not None and block.text.strip():
+            if lines:
+                yield "\n".join(lines) + "\n", None, path
+                lines = []
+            path, levels = _push_heading(path, levels, level, block.text)
+        lines.append(block.text)
+    if lines:
+        yield "\n".join(lines) + "\n", None, path
+
+
+def _read_txt_blocks(source: PdfSource, size: int) -> Iterator[str]:
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="ignore") as f:
+            while block := f.read(size):
+                yield block
+        return
+    text = source.decode("utf-8", errors="ignore")
+    for start in range(0, len(text), size):
+        yield text[start : start + size]
+
+
+def _iter_txt_chunks(source: PdfSource, max_chars: int = 4000) -> Iterator[tuple[str, Optional[int], tuple[str, ...]]]:
+    # Bloques de hasta `max_chars`, cortados en el último salto de línea cuando lo hay.
+    pending = ""
+    for block in _read_txt_blocks(source, max_chars):
+        pending += block
+        while len(pending) > max_chars:
+            cut = pending.rfind("\n", 0, max_chars)
+            end = cut + 1 if cut > 0 else max_chars
+            yield pending[:end], None, ()
+            pending = pending[end:]
+    if pending:
+        yield pending, None, ()
+
+
+def iter_text_chunks(source: PdfSource, filename: str) -> Iterator[TextChunk]:
+    """Genera los fragmentos de un PDF (por página), DOCX (por sección) o TXT (por bloques).
+
+    `source` son los bytes del documento o la ruta de un archivo ya volcado a disco.
+    Permite procesar, indexar o subir el documento por partes sin tener todo el texto
+    en memoria. Lanza ValueError si el formato no es soportado.
+    """
+    name = filename.lower()
+    if name.endswith(".pdf"):
+        raw: Iterable = _iter_pdf_chunks(source)
+    elif name.endswith(".docx"):
+        raw = _iter_docx_chunks(source)
+    elif name.endswith(".txt"):
+        raw = _iter_txt_chunks(source)
+    else:
+        raise ValueError(f"Unsupported file format: {filename}")
+    offset = 0
+    for text, page, heading_path in raw:
+        yield TextChunk(text=text, start=offset, end=offset + len(text), page=page, heading_path=heading_path)
+        offset += len(text)
+
+
+def chunks_to_text(chunks: Iterable[TextChunk]) -> str:
+    """Une los fragmentos; los offsets `start`/`end` de cada uno indexan este texto."""
+    return "".join(chunk.text for chunk in chunks)
+
 
 def extract_text_from_bytes(file_bytes: bytes, filename: str, progress_callback=None, skip_ocr: bool = True) -> Optional[str]:
-    """Extrae texto de PDF, DOCX o TXT.
+    """Extrae texto de PDF, DOCX o TXT en el proceso actual.
 
     OCR deshabilitado: si un PDF tiene poco texto (<100 chars) se devuelve lo encontrado
-    sin intentar reconocimiento de imágenes.
+    sin intentar reconocimiento de imágenes. Para PDFs grandes con reparto por páginas
+    en el pool compartido, usar `services.extraction_pipeline.extract_text_async`.
     """
     try:
         if filename.lower().endswith(".pdf"):
             logging.info(f"Processing PDF '{filename}' with PyMuPDF (OCR deshabilitado).")
-            text = []
-            with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-                for page in doc:
-                    text.append(page.get_text())
-            joined = "".join(text).strip()
+            with _open_pdf(file_bytes) as doc:
+                joined = "".join(page.get_text() for page in doc).strip()
             # Si es muy poco, devolver tal cual (el llamador decidirá si rechaza el PDF)
             return joined
         elif filename.lower().endswith(".docx"):
             logging.info(f"Processing DOCX '{filename}'.")
-            doc = docx.Document(io.BytesIO(file_bytes))
-            return "\n".join([para.text for para in doc.paragraphs]).strip()
+            # Incluye tablas, en orden con los párrafos.
+            return chunks_to_text(iter_text_chunks(file_bytes, filename)).strip()
         elif filename.lower().endswith(".txt"):
             logging.info(f"Processing TXT '{filename}'.")
             return file_bytes.decode("utf-8", errors="ignore").strip()
@@ -40,3 +278,23 @@ def extract_text_from_bytes(file_bytes: bytes, filename: str, progress_callback=
             exc_info=True,
         )
         return None
+
+
+def extract_text_from_path(path: str, filename: str) -> Optional[str]:
+    """Como `extract_text_from_bytes`, para documentos ya volcados a disco.
+
+    Los PDFs se leen por ruta (MuPDF accede al archivo bajo demanda); DOCX/TXT se leen
+    por fragmentos desde el archivo, sin cargar antes sus bytes.
+    """
+    name = filename.lower()
+    if not name.endswith((".pdf", ".docx", ".txt")):
+        logging.error(f"Unsupported file format: {filename}")
+        return None
+    try:
+        if name.endswith(".pdf"):
+            with _open_pdf(path) as doc:
+                return "".join(page.get_text() for page in doc).strip()
+        return chunks_to_text(iter_text_chunks(path, filename)).strip()
+    except Exception as e:
+        logging.error(f"Error processing file '{filename}': {e}", exc_info=True)
+        return None
@@ -6,6 +6,10 @@ import os
 from dotenv import load_dotenv
 from tavily import TavilyClient
 
+from ..services.legal_index import legal_index
+from ..services.search_cache import make_key, search_cache, ttl_for
+from .citations import split_citation
+
 MAX_CONTENT_SNIPPET_LENGTH = 2000
 
 try:
@@ -32,27 +36,54 @@ def buscar_documento_legal(query: str, tipo_documento: str, sitio_preferido: str
 
     print(f"--- Herramienta 'buscar_documento_legal' con query: '{query}', tipo: {tipo_documento}, sitio: {sitio_preferido} ---")
 
-    final_query = query
+    # Formas como "C-123/23" o "sentencia c 123 de 2023" colapsan a la misma cita canónica.
+    # Solo se reescribe la cita: los demás términos (artículo, tema) se conservan aparte.
+    citation, remainder = split_citation(query, tipo_documento)
+    if citation and citation.tipo != tipo_documento:
+        citation = None
+    if citation:
+        query = citation.query
+    extra_terms = f" {remainder}" if citation and remainder else ""
+
+    final_query = query + extra_terms
     filetype = None
 
     # Estrategias de búsqueda por tipo de documento
     if tipo_documento == "gaceta":
         # Para gacetas, construimos un query más robusto.
-        final_query = f'"Gaceta del Congreso" {query}'
+        final_query = f'"Gaceta del Congreso" {query}{extra_terms}'
         filetype = "pdf"
         # No se recomienda un sitio preferido para gacetas para ampliar la búsqueda.
     elif tipo_documento == "sentencia" and not sitio_preferido:
         # Si es una sentencia y no hay sitio, acotamos el query.
-        final_query = f'"{query}"'
+        final_query = f'"{query}"{extra_terms}'
     elif tipo_documento == "ley" and not sitio_preferido:
         # Si es una ley y no hay sitio, acotamos el query.
-        final_query = f'"{query}"'
+        final_query = f'"{query}"{extra_terms}'
 
     if sitio_preferido:
         final_query += f" site:{sitio_preferido}"
     if filetype:
         final_query += f" filetype:{filetype}"
 
+    cache_key = make_key(f"{citation.canonical_id}{extra_terms}" if citation else final_query, tipo_documento, sitio_preferido)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        print(f"--- Resultado desde caché para '{final_query}' ({search_cache.stats}) ---")
+        return cached
+
+    # Primer nivel: índice local (sin latencia de red), solo para una cita exacta con
+    # documentos vigentes según el TTL de su tipo.
+    if citation and not remainder:
+        local_results = legal_index.lookup(citation, ttl_for(tipo_documento))
+        if sitio_preferido:
+            local_results = [r for r in local_results if sitio_preferido in (r.get("url") or "")]
+        if local_results:
+            print(f"--- {len(local_results)} resultados desde el índice local ---")
+            output = json.dumps(local_results, ensure_ascii=False)
+            search_cache.set(cache_key, output, ttl_for(tipo_documento))
+            return output
+
     print(f"--- Query final enviado a Tavily: '{final_query}' ---")
 
     try:
@@ -66,7 +97,15 @@ def buscar_documento_legal(query: str, tipo_documento: str, sitio_preferido: str
 
         # Devolvemos solo la información esencial para el LLM.
         results_to_return = [{"url": r.get("url"), "title": r.get("title"), "snippet": r.get("content", "")[:MAX_CONTENT_SNIPPET_LENGTH]} for r in results]
-        return json.dumps(results_to_return, ensure_ascii=False)
+        output = json.dumps(results_to_return, ensure_ascii=False)
+        legal_index.add_documents(results_to_return, citation, tipo_documento)
+        search_cache.set(cache_key, output, ttl_for(tipo_documento))
+        return output
 
     except Exception as e:
+        # Sin servicio remoto, lo ya indexado localmente (aunque esté vencido) es mejor que nada.
+        local_results = legal_index.search(query + extra_terms)
+        if local_results:
+            print(f"--- Búsqueda remota fallida ({e}); {len(local_results)} resultados del índice local ---")
+            return json.dumps(local_results, ensure_ascii=False)
         return f"Error al procesar la búsqueda en internet. El servicio devolvió el siguiente mensaje: {str(e)}"
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# rxconfig.py exige DATABASE_URL al importar Reflex, y los servicios guardan cachés bajo el
+# directorio de trabajo: las pruebas usan un directorio temporal propio, nunca la BD real.
+_TEST_DIR = tempfile.mkdtemp(prefix="leyia_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'test.sqlite3')}")
+os.environ.setdefault("LEYIA_CACHE_DIR", os.path.join(_TEST_DIR, "cache"))
@@ -0,0 +1,90 @@
+import asyncio
+import dataclasses
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+
+from asistente_legal_constitucional_con_ia.services.assistant_cache import AssistantCache
+
+
+class _Assistants:
+    """`client.beta.assistants` falso: cuenta las consultas y tarda `delay_s` en responder."""
+
+    def __init__(self, model: str = "gpt-4o", delay_s: float = 0.05):
+        self.model = model
+        self.delay_s = delay_s
+        self.calls = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def retrieve(self, assistant_id):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay_s)
+        if self.fail:
+            raise RuntimeError("API no disponible")
+        return SimpleNamespace(
+            model=self.model,
+            instructions="Eres un asistente legal.",
+            tools=[SimpleNamespace(type="file_search"), SimpleNamespace(type="function", function=SimpleNamespace(name="buscar_documento_legal"))],
+        )
+
+
+def _client(assistants: _Assistants):
+    return SimpleNamespace(beta=SimpleNamespace(assistants=assistants))
+
+
+def test_reads_never_wait_and_share_one_refresh():
+    assistants = _Assistants()
+    cache = AssistantCache(ttl_s=60)
+
+    async def _sessions():
+        # 100 sesiones nuevas piden el modelo a la vez antes de que la caché tenga datos.
+        started = time.perf_counter()
+        first = [cache.peek("asst_1", _client(assistants)) for _ in range(100)]
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*cache._refreshing.values())
+        return first, elapsed
+
+    first, elapsed = asyncio.run(_sessions())
+
+    assert first == [None] * 100
+    assert elapsed < assistants.delay_s
+    assert assistants.calls == 1
+    metadata = cache.peek("asst_1")
+    assert metadata.model == "gpt-4o"
+    assert metadata.tools == ("file_search", "function:buscar_documento_legal")
+
+
+def test_stale_entry_is_served_while_refreshing():
+    assistants = _Assistants()
+    cache = AssistantCache(ttl_s=60)
+
+    async def _run():
+        await cache.refresh(_client(assistants), "asst_1")
+        stale = cache._entries["asst_1"]
+        cache._entries["asst_1"] = dataclasses.replace(stale, fetched_at=stale.fetched_at - 120)
+        assistants.model = "gpt-4.1"
+        served = cache.peek("asst_1", _client(assistants))
+        await asyncio.gather(*cache._refreshing.values())
+        return served
+
+    served = asyncio.run(_run())
+
+    assert served.model == "gpt-4o"
+    assert cache.peek("asst_1").model == "gpt-4.1"
+    assert assistants.calls == 2
+
+
+def test_failed_refresh_keeps_previous_entry():
+    assistants = _Assistants(delay_s=0)
+    cache = AssistantCache(ttl_s=60)
+    asyncio.run(cache.refresh(_client(assistants), "asst_1"))
+    assistants.fail = True
+
+    assert asyncio.run(cache.refresh(_client(assistants), "asst_1")).model == "gpt-4o"
+    assert cache.peek("asst_1").model == "gpt-4o"
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from asistente_legal_constitucional_con_ia.services.audio_segments import SEGMENT_OVERLAP_S, Segment, plan_segments, segment_utterances, stitch_segments
+
+UTTERANCE_S = 20.0
+GAP_S = 2.0
+DURATION_S = 3000.0
+SPEAKERS = ["ana", "beto", "carla"]
+
+
+def _script():
+    """Audio sintético: tres hablantes que se turnan, con silencios de 2 s entre frases."""
+    utterances, silences, t, n = [], [], 0.0, 0
+    while t + UTTERANCE_S <= DURATION_S:
+        utterances.append({"who": SPEAKERS[n % 3], "start_s": t, "end_s": t + UTTERANCE_S, "text": f"frase {n}"})
+        silences.append((t + UTTERANCE_S, t + UTTERANCE_S + GAP_S))
+        t += UTTERANCE_S + GAP_S
+        n += 1
+    return utterances, silences
+
+
+class _StubTranscriber:
+    """Transcribe un tramo como lo haría AssemblyAI: tiempos relativos y etiquetas locales por tramo."""
+
+    def __init__(self, script):
+        self.script = script
+
+    def transcribe(self, segment: Segment):
+        # Una frase cortada al inicio del tramo se transcribe solo desde el corte.
+        inside = [{**u, "start_s": max(u["start_s"], segment.start_s)} for u in self.script if u["end_s"] > segment.start_s and u["start_s"] < segment.end_s]
+        # Cada tramo numera a sus hablantes por orden de aparición (A, B, C...), como un envío independiente.
+        local = {}
+        for u in inside:
+            local.setdefault(u["who"], chr(ord("A") + len(local)))
+        return SimpleNamespace(
+            text=" ".join(u["text"] for u in inside),
+            utterances=[
+                SimpleNamespace(speaker=local[u["who"]], text=u["text"], start=(u["start_s"] - segment.start_s) * 1000, end=(u["end_s"] - segment.start_s) * 1000)
+                for u in inside
+            ],
+        )
+
+
+def _transcribe(segments, stub, indexes):
+    for segment in segments:
+        if segment.index in indexes:
+            segment.utterances = segment_utterances(segment, stub.transcribe(segment))
+            segment.status = "completed"
+
+
+def test_plan_cuts_on_silences_with_overlap():
+    _, silences = _script()
+    segments = plan_segments(DURATION_S, silences, target_s=900)
+    assert len(segments) == 3
+    assert segments[0].start_s == 0 and segments[-1].end_s == DURATION_S
+    for previous, current in zip(segments, segments[1:]):
+        assert any(start <= current.keep_from_s <= end for start, end in silences)
+        assert current.keep_from_s == previous.end_s
+        assert current.start_s == current.keep_from_s - SEGMENT_OVERLAP_S
+
+
+def test_plan_without_silences_cuts_at_target():
+    segments = plan_segments(2000, [], target_s=900, overlap_s=10)
+    assert [(s.keep_from_s, s.end_s) for s in segments] == [(0.0, 900.0), (900.0, 2000)]
+
+
+def test_short_audio_is_a_single_segment():
+    assert len(plan_segments(1200, [], target_s=900)) == 1
+
+
+@pytest.mark.parametrize("overlap_s", [SEGMENT_OVERLAP_S, 5.0, 90.0])
+def test_stub_transcriber_stitches_full_script_with_consistent_speakers(overlap_s):
+    script, silences = _script()
+    segments = plan_segments(DURATION_S, silences, target_s=900, overlap_s=overlap_s)
+    _transcribe(segments, _StubTranscriber(script), {s.index for s in segments})
+
+    stitched, joined = stitch_segments(segments)
+
+    assert joined == len(segments)
+    # Sin frases duplicadas por el solape ni perdidas en los cortes.
+    assert [u["text"] for u in stitched] == [u["text"] for u in script]
+    # Cada hablante real conserva una única etiqueta global en todos los tramos.
+    labels = {}
+    for utterance, original in zip(stitched, script):
+        assert labels.setdefault(original["who"], utterance["speaker"]) == utterance["speaker"]
+    assert len(set(labels.values())) == len(SPEAKERS)
+
+
+def test_progressive_stitching_stops_at_first_pending_segment():
+    script, silences = _script()
+    segments = plan_segments(DURATION_S, silences, target_s=900)
+    _transcribe(segments, _StubTranscriber(script), {0, 2})
+
+    stitched, joined = stitch_segments(segments)
+
+    assert joined == 1
+    assert stitched and stitched[-1]["end"] <= segments[0].end_s * 1000
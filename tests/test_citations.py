@@ -0,0 +1,104 @@
+import random
+import time
+
+import pytest
+
+from asistente_legal_constitucional_con_ia.util.citations import Citation, mentions_citation, parse_citation, split_citation
+
+
+@pytest.mark.parametrize(
+    "text, tipo, canonical_id",
+    [
+        ("C-123/23", "sentencia", "sentencia:C-123:2023"),
+        ("sentencia c 123 de 2023", "sentencia", "sentencia:C-123:2023"),
+        ("Sentencia C-123 de 2023.", "sentencia", "sentencia:C-123:2023"),
+        ("T-760 de 2008", "sentencia", "sentencia:T-760:2008"),
+        ("SU-214/16", "sentencia", "sentencia:SU-214:2016"),
+        ("C-355/06", "sentencia", "sentencia:C-355:2006"),
+        ("T-406/92", "sentencia", "sentencia:T-406:1992"),
+        ("Ley 1437 de 2011", "ley", "ley:1437:2011"),
+        ("ley No. 1437 de 2011", "ley", "ley:1437:2011"),
+        ("758 de 2017", "gaceta", "gaceta:758:2017"),
+        ("Gaceta del Congreso 758 de 2017", "gaceta", "gaceta:758:2017"),
+    ],
+)
+def test_surface_forms_collapse_to_canonical_id(text, tipo, canonical_id):
+    citation = parse_citation(text, tipo)
+    assert citation is not None and citation.canonical_id == canonical_id
+
+
+def test_canonical_query():
+    assert Citation("sentencia", "C-123", 2023).query == "Sentencia C-123 de 2023"
+    assert Citation("gaceta", "758", 2017).query == "758 de 2017"
+
+
+@pytest.mark.parametrize(
+    "text, tipo, canonical_id, remainder",
+    [
+        ("Ley 1437 de 2011 artículo 137", "ley", "ley:1437:2011", "artículo 137"),
+        ("derecho a la salud tutela t 760 de 2008", "sentencia", "sentencia:T-760:2008", "derecho a la salud tutela"),
+    ],
+)
+def test_extra_terms_are_kept_apart(text, tipo, canonical_id, remainder):
+    citation, rest = split_citation(text, tipo)
+    assert citation.canonical_id == canonical_id
+    assert rest == remainder
+    # Solo una cita completa se reescribe a su forma canónica.
+    assert parse_citation(text, tipo) is None
+
+
+def test_leading_zeros_kept_in_query_only():
+    citation, _ = split_citation("Tutela T 025 de 2004", "sentencia")
+    assert citation.query == "Sentencia T-025 de 2004"
+    assert citation.canonical_id == parse_citation("T-25/04", "sentencia").canonical_id == "sentencia:T-25:2004"
+    assert mentions_citation("Sentencia T-25 de 2004", citation)
+
+
+def test_two_digit_years_only_for_sentencias():
+    assert parse_citation("T-025/04", "sentencia").anio == 2004
+    # Para leyes y gacetas no se adivina el siglo.
+    assert parse_citation("Ley 23 de 82", "ley") is None
+    assert parse_citation("758 de 17", "gaceta") is None
+    assert parse_citation("Ley 23 de 1982", "ley").canonical_id == "ley:23:1982"
+
+
+def test_text_without_citation():
+    assert parse_citation("derecho a la salud", "sentencia") is None
+    assert split_citation("Derecho a la Salud!", "sentencia") == (None, "derecho a la salud")
+
+
+def test_mentions_citation_in_titles_and_urls():
+    ley = Citation("ley", "1437", 2011)
+    assert mentions_citation("http://www.secretariasenado.gov.co/senado/basedoc/ley_1437_2011.html", ley)
+    assert not mentions_citation("Ley 1438 de 2011", ley)
+    sentencia = Citation("sentencia", "C-123", 2023)
+    assert mentions_citation("https://www.corteconstitucional.gov.co/relatoria/2023/C-123-23.htm", sentencia)
+    assert mentions_citation("Comunicado: Sentencia T-100/20 y Sentencia C-123 de 2023", sentencia)
+
+
+def _corpus(size: int):
+    """Citas con las formas que llegan al tool: mayúsculas, separadores, años de 2 dígitos y texto extra."""
+    rng = random.Random(7)
+    forms = [
+        ("sentencia", lambda: f"{rng.choice(['C', 'T', 'SU', 'c', 't'])}-{rng.randint(1, 999)}/{rng.randint(0, 99):02d}"),
+        ("sentencia", lambda: f"sentencia {rng.choice(['c', 't', 'su'])} {rng.randint(1, 999)} de {rng.randint(1992, 2024)}"),
+        ("sentencia", lambda: f"Sentencia {rng.choice(['C', 'T'])}-{rng.randint(1, 999):03d} de {rng.randint(1992, 2024)}."),
+        ("ley", lambda: f"Ley {rng.choice(['', 'No. ', 'n° '])}{rng.randint(1, 2400)} de {rng.randint(1900, 2024)}"),
+        ("ley", lambda: f"ley {rng.randint(1, 2400)} de {rng.randint(1900, 2024)} artículo {rng.randint(1, 300)}"),
+        ("gaceta", lambda: f"Gaceta del Congreso {rng.randint(1, 1800)} de {rng.randint(1991, 2024)}"),
+        ("sentencia", lambda: "derecho fundamental a la salud y al mínimo vital"),
+    ]
+    return [(tipo, make()) for tipo, make in (rng.choice(forms) for _ in range(size))]
+
+
+def test_benchmark_100k_citations():
+    corpus = _corpus(100_000)
+    started = time.perf_counter()
+    ids = [citation.canonical_id for tipo, text in corpus if (citation := split_citation(text, tipo)[0]) is not None]
+    elapsed = time.perf_counter() - started
+
+    per_call_us = elapsed / len(corpus) * 1e6
+    print(f"\n{len(corpus)} citas en {elapsed:.2f} s ({per_call_us:.1f} µs/cita), {len(ids)} reconocidas, {len(set(ids))} IDs canónicos")
+    assert len(ids) > len(corpus) * 0.75
+    # Frente a los segundos de un round-trip a Tavily, unas decenas de µs por consulta son despreciables.
+    assert per_call_us < 200
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("reflex")
+pytest.importorskip("openai")
+sqlmodel = pytest.importorskip("sqlmodel")
+
+import httpx
+import reflex as rx
+from openai import RateLimitError
+
+from asistente_legal_constitucional_con_ia.models.database import PendingFileDeletion, UploadedDocument
+from asistente_legal_constitucional_con_ia.services import document_registry, file_deletion
+
+
+class _Files:
+    """API de archivos de OpenAI: responde 429 las primeras `rate_limited` veces por archivo."""
+
+    def __init__(self, rate_limited: int = 0):
+        self.rate_limited = rate_limited
+        self.attempts: dict[str, int] = {}
+        self.deleted: list[str] = []
+
+    def delete(self, file_id: str):
+        self.attempts[file_id] = self.attempts.get(file_id, 0) + 1
+        if self.attempts[file_id] <= self.rate_limited:
+            raise RateLimitError("rate limited", response=httpx.Response(429, request=httpx.Request("DELETE", "https://api.openai.com")), body=None)
+        self.deleted.append(file_id)
+
+
+class _Client:
+    def __init__(self, files: _Files):
+        self.files = files
+
+    def with_options(self, **options):
+        return self
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = sqlmodel.create_engine(f"sqlite:///{tmp_path / 'files.db'}", connect_args={"check_same_thread": False})
+    sqlmodel.SQLModel.metadata.create_all(engine, tables=[UploadedDocument.__table__, PendingFileDeletion.__table__])
+    monkeypatch.setattr(rx, "session", lambda: sqlmodel.Session(engine))
+    monkeypatch.setattr(file_deletion, "RETRY_BASE_S", 0.001)
+    yield engine
+    engine.dispose()
+
+
+def _pending(engine) -> dict[str, PendingFileDeletion]:
+    with sqlmodel.Session(engine) as session:
+        return {row.file_id: row for row in session.exec(PendingFileDeletion.select()).all()}
+
+
+def _make_due(engine) -> None:
+    with sqlmodel.Session(engine) as session:
+        for row in session.exec(PendingFileDeletion.select()).all():
+            row.next_attempt_at = datetime.now()
+            session.add(row)
+        session.commit()
+
+
+def _register(digest: str, file_id: str, refs: int) -> None:
+    document_registry.register(digest, file_id, f"{digest}.pdf")
+    for _ in range(refs - 1):
+        document_registry.acquire_existing(digest)
+
+
+def test_rate_limited_deletions_are_retried(engine):
+    files = _Files(rate_limited=2)
+    report = asyncio.run(file_deletion.delete_files(_Client(files), ["file-a", "file-b", "file-a"]))
+    assert (report.deleted, report.failed) == (2, 0)
+    assert sorted(files.deleted) == ["file-a", "file-b"]
+    assert _pending(engine) == {}
+
+
+def test_exhausted_retries_go_to_the_durable_queue(engine):
+    files = _Files(rate_limited=file_deletion.FILE_DELETE_RETRIES + 1)
+    report = asyncio.run(file_deletion.delete_files(_Client(files), ["file-a"]))
+    assert report.failed_ids == ["file-a"]
+    assert not _pending(engine)["file-a"].release_pending
+
+    _make_due(engine)
+    drained = asyncio.run(file_deletion.drain_retry_queue(_Client(files)))
+    assert drained.deleted == 1
+    assert files.deleted == ["file-a"] and _pending(engine) == {}
+
+
+def test_registry_error_keeps_the_release_queued(engine, monkeypatch):
+    _register("shared", "file-shared", refs=2)
+    _register("solo", "file-solo", refs=1)
+
+    def broken_release(file_id):
+        raise RuntimeError("base de datos no disponible")
+
+    files = _Files()
+    with monkeypatch.context() as patch:
+        patch.setattr(document_registry, "release", broken_release)
+        report = asyncio.run(file_deletion.release_files(_Client(files), ["file-shared", "file-solo"]))
+
+    # Nada se borra sin saber si otra sesión usa el archivo, pero tampoco se olvida.
+    assert report.failed == 2 and files.deleted == []
+    assert {file_id for file_id, row in _pending(engine).items() if row.release_pending} == {"file-shared", "file-solo"}
+
+    _make_due(engine)
+    asyncio.run(file_deletion.drain_retry_queue(_Client(files)))
+
+    # El compartido solo pierde una referencia; el que quedó sin usuarios se elimina en OpenAI.
+    assert files.deleted == ["file-solo"]
+    assert _pending(engine) == {}
+    with sqlmodel.Session(engine) as session:
+        docs = {doc.file_id: doc.ref_count for doc in session.exec(UploadedDocument.select()).all()}
+    assert docs == {"file-shared": 1}
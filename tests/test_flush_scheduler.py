@@ -0,0 +1,43 @@
+from asistente_legal_constitucional_con_ia.services.flush_scheduler import FlushScheduler
+
+
+def test_empty_pending_never_flushes():
+    scheduler = FlushScheduler("fixed")
+    scheduler.record_flush(0.0, now=0.0)
+    assert not scheduler.should_flush("", "\n", now=10.0)
+
+
+def test_hard_cap_blocks_even_large_blocks():
+    scheduler = FlushScheduler("adaptive", min_chars=10, max_updates_per_s=8)
+    scheduler.record_flush(0.0, now=100.0)
+    assert not scheduler.should_flush("x" * 1000, now=100.1)
+    assert scheduler.should_flush("x" * 1000, now=100.13)
+
+
+def test_fixed_policy_flushes_on_newline():
+    scheduler = FlushScheduler("fixed", min_chars=120, min_interval_s=1.0, max_updates_per_s=8)
+    scheduler.record_flush(0.0, now=100.0)
+    assert scheduler.should_flush("abc", "c\n", now=100.2)
+    assert not scheduler.should_flush("abc", "c", now=100.2)
+    assert scheduler.should_flush("x" * 120, "x", now=100.2)
+
+
+def test_adaptive_interval_follows_flush_cost():
+    scheduler = FlushScheduler("adaptive", min_chars=120, min_interval_s=0.15, max_interval_s=1.0, max_updates_per_s=8)
+    scheduler.record_flush(0.1, now=0.0)
+    assert scheduler.interval_s == 0.4
+    # Un salto de línea no fuerza el envío en la política adaptativa.
+    assert not scheduler.should_flush("abc", "\n", now=0.3)
+    assert scheduler.should_flush("abc", now=0.45)
+    assert scheduler.should_flush("x" * 480, now=0.2)
+
+
+def test_adaptive_interval_is_bounded():
+    scheduler = FlushScheduler("adaptive", min_interval_s=0.15, max_interval_s=1.0, max_updates_per_s=8)
+    assert scheduler.interval_s == 0.15
+    scheduler.record_flush(5.0, now=0.0)
+    assert scheduler.interval_s == 1.0
+
+
+def test_unknown_policy_falls_back_to_adaptive():
+    assert FlushScheduler("bursty").policy == "adaptive"
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from asistente_legal_constitucional_con_ia.services.legal_index import LegalIndex
+from asistente_legal_constitucional_con_ia.util.citations import parse_citation
+
+SENTENCIA = parse_citation("C-123/23", "sentencia")
+RESULTS = [
+    {"url": "https://www.corteconstitucional.gov.co/relatoria/2023/C-123-23.htm", "title": "Sentencia C-123/23", "snippet": "derecho a la salud"},
+    {"url": "https://blog.example.com/comentario", "title": "Comentario jurisprudencial", "snippet": "derecho a la salud"},
+]
+
+
+def _index() -> LegalIndex:
+    index = LegalIndex(":memory:")
+    index.add_documents(RESULTS, SENTENCIA, "sentencia")
+    return index
+
+
+def test_lookup_returns_only_pages_that_mention_the_citation():
+    hits = _index().lookup(SENTENCIA, max_age_s=3600)
+    assert [hit["url"] for hit in hits] == [RESULTS[0]["url"]]
+
+
+def test_lookup_respects_max_age(monkeypatch):
+    index = _index()
+    later = time.time() + 7200
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert index.lookup(SENTENCIA, max_age_s=3600) == []
+
+
+def test_phrase_search_finds_all_indexed_pages():
+    assert len(_index().search("derecho a la salud")) == 2
+    assert _index().search("") == []
+
+
+TEMAS = ["derecho a la salud", "mínimo vital", "debido proceso", "libertad de expresión", "consulta previa", "acción de tutela", "cosa juzgada", "igualdad"]
+
+
+def _fill(index: LegalIndex, size: int) -> None:
+    """Corpus sintético: cinco páginas por sentencia, con título de la cita y un resumen temático."""
+    for n in range(size // 5):
+        citation = parse_citation(f"T-{n % 1000 + 1}/{n // 1000 % 30 + 1:02d}", "sentencia")
+        tema = TEMAS[n % len(TEMAS)]
+        index.add_documents(
+            [{"url": f"https://relatoria.example/{n}/{k}", "title": f"Sentencia {citation.numero} de {citation.anio}", "snippet": f"{tema}: análisis número {n}-{k}"} for k in range(5)],
+            citation,
+            "sentencia",
+        )
+
+
+@pytest.mark.parametrize("size", [10_000, 100_000])
+def test_benchmark_query_latency(tmp_path, size):
+    index = LegalIndex(str(tmp_path / "legal_index.sqlite3"))
+    _fill(index, size)
+    citations = [parse_citation(f"T-{n % 1000 + 1}/{n // 1000 % 30 + 1:02d}", "sentencia") for n in range(0, size // 5, max(1, size // 1000))]
+
+    def _percentiles(run):
+        timings = []
+        for item in citations:
+            started = time.perf_counter()
+            run(item)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+    lookup = _percentiles(lambda c: index.lookup(c, max_age_s=3600))
+    search = _percentiles(lambda c: index.search(TEMAS[c.anio % len(TEMAS)]))
+    print(f"\n{size} documentos: lookup p50/p99 {lookup[0]:.2f}/{lookup[1]:.2f} ms, frase p50/p99 {search[0]:.2f}/{search[1]:.2f} ms")
+    assert index.lookup(citations[0], max_age_s=3600)
+    # Frente a los segundos de una búsqueda en Tavily, el índice local responde en milisegundos.
+    assert lookup[1] < 50 and search[1] < 250
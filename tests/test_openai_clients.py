@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from openai import OpenAI
+
+from asistente_legal_constitucional_con_ia.services import openai_clients
+
+CALLS = 50
+
+
+class _FakeOpenAI(ThreadingHTTPServer):
+    """API de OpenAI falsa con keep-alive: responde GET /v1/models y cuenta conexiones TCP aceptadas."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.connections = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        body = json.dumps({"object": "list", "data": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    server = _FakeOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(openai_clients, "_clients", {})
+    yield openai_clients
+    for entry in openai_clients._clients.values():
+        entry.http_client.close()
+
+
+def test_one_client_per_api_key(registry):
+    assert registry.get_openai_client("sk-a") is registry.get_openai_client("sk-a")
+    assert registry.get_openai_client("sk-a") is not registry.get_openai_client("sk-b")
+    assert registry.get_openai_client("") is None
+    # Las métricas se indexan por hash: la clave no aparece en claro.
+    assert all("sk-" not in key_id for key_id in registry.pool_metrics())
+
+
+def test_shared_pool_reuses_connections(registry, fake_server):
+    def _per_call():
+        with OpenAI(api_key="sk-test", base_url=fake_server.base_url, max_retries=0) as client:
+            client.models.list()
+
+    shared = registry.get_openai_client("sk-test").with_options(base_url=fake_server.base_url)
+
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        _per_call()
+    per_call_s = time.perf_counter() - started
+    per_call_connections = fake_server.connections
+
+    fake_server.connections = 0
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        shared.models.list()
+    shared_s = time.perf_counter() - started
+
+    metrics = next(iter(registry.pool_metrics().values()))
+    print(
+        f"\n{CALLS} llamadas: cliente por llamada {per_call_s * 1000:.0f} ms y {per_call_connections} conexiones;"
+        f" cliente compartido {shared_s * 1000:.0f} ms y {fake_server.connections} conexión(es), métricas {metrics}"
+    )
+    assert per_call_connections == CALLS
+    assert shared_s < per_call_s
+    assert fake_server.connections == 1
+    assert metrics["requests"] == CALLS and metrics["new_connections"] == 1
+    assert metrics["open_connections"] == 1
+    assert metrics["reuse_ratio"] == round(1 - 1 / CALLS, 3)
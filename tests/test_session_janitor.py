@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("reflex")
+pytest.importorskip("openai")
+pytest.importorskip("sqlalchemy")
+
+import httpx
+from openai import NotFoundError
+
+from asistente_legal_constitucional_con_ia.services import session_janitor
+from asistente_legal_constitucional_con_ia.services.file_deletion import DeletionReport
+from asistente_legal_constitucional_con_ia.services.session_janitor import JANITOR_BATCH_SIZE, RateLimiter, SessionJanitor
+
+
+class _Registry:
+    """Registro `sessionfile` en memoria: una fila por sesión, la mitad ya expirada y un thread de cada cuatro eliminado."""
+
+    def __init__(self, sessions: int):
+        self.rows = {i: (f"file-{i}", f"thread-{i}") for i in range(sessions)}
+        self.expired = [i for i in range(sessions) if i % 2 == 0]
+        self.missing_threads = {f"thread-{i}" for i in range(sessions) if i % 4 == 1}
+        self.unchecked = [f"thread-{i}" for i in range(sessions)]
+        self.released = []
+
+    def claim_expired_files(self):
+        claimed, self.expired = self.expired[:JANITOR_BATCH_SIZE], self.expired[JANITOR_BATCH_SIZE:]
+        return [i for i in claimed if i in self.rows]
+
+    def claim_thread_checks(self):
+        claimed, self.unchecked = self.unchecked[:JANITOR_BATCH_SIZE], self.unchecked[JANITOR_BATCH_SIZE:]
+        return claimed
+
+    def claim_thread_files(self, thread_ids):
+        return [i for i, (_, thread_id) in self.rows.items() if thread_id in thread_ids][:JANITOR_BATCH_SIZE]
+
+    def delete_rows(self, row_ids):
+        return [self.rows.pop(i)[0] for i in row_ids if i in self.rows]
+
+    async def release_files(self, client, file_ids):
+        self.released.extend(file_ids)
+        return DeletionReport(deleted=len(file_ids))
+
+    def retrieve_thread(self, thread_id):
+        if thread_id in self.missing_threads:
+            raise NotFoundError("not found", response=httpx.Response(404, request=httpx.Request("GET", "https://api.openai.com")), body=None)
+        return SimpleNamespace(id=thread_id)
+
+
+def _janitor(monkeypatch, registry: _Registry) -> SessionJanitor:
+    async def no_retries(client):
+        return DeletionReport()
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(session_janitor, "JANITOR_INTERVAL_S", 0)
+    monkeypatch.setattr(session_janitor, "get_openai_client", lambda api_key: SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(retrieve=registry.retrieve_thread))))
+    monkeypatch.setattr(session_janitor, "pool_metrics", dict)
+    monkeypatch.setattr(session_janitor, "drain_retry_queue", no_retries)
+    for name in ("claim_expired_files", "claim_thread_checks", "claim_thread_files", "delete_rows", "release_files"):
+        monkeypatch.setattr(session_janitor, name, getattr(registry, name))
+    janitor = SessionJanitor()
+    janitor.limiter = RateLimiter(max_calls_per_s=1e6, concurrency=session_janitor.JANITOR_CONCURRENCY)
+    return janitor
+
+
+async def _run_sweeps(janitor: SessionJanitor, sweeps: int) -> int:
+    """Corre el janitor hasta `sweeps` barridos y devuelve el pico de tareas asyncio vivas."""
+    peak = 0
+    task = asyncio.create_task(janitor.run())
+    while janitor.stats["sweeps"] < sweeps:
+        peak = max(peak, len(asyncio.all_tasks()))
+        await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Al detenerlo no queda ninguna tarea colgando: solo la de la prueba.
+    assert len(asyncio.all_tasks()) == 1
+    return peak
+
+
+@pytest.mark.parametrize("sessions", [10, 5000])
+def test_background_tasks_do_not_grow_with_sessions(monkeypatch, sessions):
+    registry = _Registry(sessions)
+    janitor = _janitor(monkeypatch, registry)
+
+    peak = asyncio.run(_run_sweeps(janitor, sweeps=5))
+
+    # Prueba + janitor + como mucho un lote de verificaciones de thread, sin importar cuántas sesiones haya.
+    assert peak <= JANITOR_BATCH_SIZE + 2
+    assert janitor.stats["sweeps"] >= 5
+    assert janitor.stats["threads_checked"] > 0
+
+
+def test_each_file_is_released_once(monkeypatch):
+    registry = _Registry(400)
+    janitor = _janitor(monkeypatch, registry)
+
+    asyncio.run(_run_sweeps(janitor, sweeps=10))
+
+    assert len(registry.released) == len(set(registry.released))
+    expected = {f"file-{i}" for i in range(400) if i % 2 == 0 or i % 4 == 1}
+    assert set(registry.released) == expected
+
+
+def test_one_sweep_drains_every_batch(monkeypatch):
+    registry = _Registry(1000)
+    # Un thread eliminado con más archivos que un lote.
+    for i in range(1000, 1000 + 3 * JANITOR_BATCH_SIZE):
+        registry.rows[i] = (f"file-{i}", "thread-1")
+    janitor = _janitor(monkeypatch, registry)
+    janitor._client = session_janitor.get_openai_client("sk-test")
+
+    asyncio.run(janitor.sweep())
+
+    assert janitor.stats["sweeps"] == 1
+    assert not registry.expired and not registry.unchecked
+    assert not any(thread_id in registry.missing_threads for _, thread_id in registry.rows.values())
+    assert len(registry.released) == len(set(registry.released)) == 500 + 250 + 3 * JANITOR_BATCH_SIZE
+
+
+def test_sweep_stops_at_its_time_budget(monkeypatch):
+    registry = _Registry(1000)
+    janitor = _janitor(monkeypatch, registry)
+    janitor._client = session_janitor.get_openai_client("sk-test")
+    monkeypatch.setattr(session_janitor, "JANITOR_SWEEP_BUDGET_S", 0)
+
+    asyncio.run(janitor.sweep())
+
+    # Sin presupuesto no se reclama nada; el siguiente barrido retoma la cola.
+    assert registry.released == []
+    assert len(registry.expired) == 500
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+pytest.importorskip("reflex")
+
+from reflex.event import fix_events
+from reflex.state import StateUpdate
+
+from asistente_legal_constitucional_con_ia.services.flush_scheduler import FlushScheduler
+from asistente_legal_constitucional_con_ia.states.chat_state import ChatState
+
+ANSWER_CHARS = 20_000
+CHUNK_CHARS = 4  # tamaño típico de un delta de texto de OpenAI
+CHUNK_INTERVAL_S = 0.01
+
+
+def _flushes():
+    """Trozos de texto que el scheduler envía al cliente durante una respuesta de ~20 KB."""
+    answer = ("La Corte Constitucional reitera que la acción de tutela procede \"de forma subsidiaria\".\n" * 400)[:ANSWER_CHARS]
+    scheduler = FlushScheduler("fixed", min_chars=120, min_interval_s=0.15, max_updates_per_s=8)
+    scheduler.record_flush(0.0, now=0.0)
+    pending, now, flushed = "", 0.0, []
+    for offset in range(0, len(answer), CHUNK_CHARS):
+        chunk = answer[offset : offset + CHUNK_CHARS]
+        pending += chunk
+        now += CHUNK_INTERVAL_S
+        if scheduler.should_flush(pending, chunk, now):
+            flushed.append(pending)
+            scheduler.record_flush(0.0, now=now)
+            pending = ""
+    if pending:
+        flushed.append(pending)
+    return answer, flushed
+
+
+def _full_text_update(text: str) -> str:
+    """Mensaje que enviaba cada flush antes: el delta de estado con toda la respuesta acumulada."""
+    return StateUpdate(delta={ChatState.get_full_name(): {"streaming_response_rx_state_": text}}).json()
+
+
+def _delta_update(delta: str) -> str:
+    """Mensaje que envía ahora cada flush: un call_script que agrega solo el texto nuevo."""
+    return StateUpdate(events=fix_events([ChatState.append_stream_delta.fn(None, delta)], "token")).json()
+
+
+def test_delta_flush_carries_the_new_text():
+    payload = json.loads(_delta_update('cita "textual"\n'))
+    assert payload["delta"] == {}
+    assert json.dumps('cita "textual"\n') in payload["events"][0]["payload"]["javascript_code"]
+
+
+def test_bytes_per_answer_grow_linearly_with_deltas():
+    answer, flushed = _flushes()
+    assert "".join(flushed) == answer
+
+    accumulated, full_bytes, delta_bytes = "", 0, 0
+    for text in flushed:
+        accumulated += text
+        full_bytes += len(_full_text_update(accumulated).encode())
+        delta_bytes += len(_delta_update(text).encode())
+
+    print(f"\nrespuesta de {len(answer)} chars en {len(flushed)} flushes: texto completo {full_bytes / 1024:.0f} KB, deltas {delta_bytes / 1024:.0f} KB ({full_bytes / delta_bytes:.1f}x)")
+    # Con el texto completo los bytes crecen de forma cuadrática con la longitud de la respuesta;
+    # con deltas, cada carácter viaja una vez más un sobrecosto fijo por flush.
+    assert delta_bytes < full_bytes / 5
+    assert delta_bytes < len(answer) + len(flushed) * 400
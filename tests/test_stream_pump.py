@@ -0,0 +1,154 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from asistente_legal_constitucional_con_ia.services.stream_pump import aiter_in_thread
+
+CHATS = 10
+TOKENS = 10
+FIRST_TOKEN_DELAY_S = 0.05
+TOKEN_INTERVAL_S = 0.02
+
+
+class _ClosableStream:
+    """Iterable síncrono y bloqueante, como el stream de OpenAI."""
+
+    def __init__(self, items, delay_s=0.0, error=None):
+        self.items, self.delay_s, self.error = items, delay_s, error
+        self.closed = False
+
+    def __iter__(self):
+        for item in self.items:
+            time.sleep(self.delay_s)
+            yield item
+        if self.error:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+async def _collect(stream, limit=None):
+    items = []
+    async for item in aiter_in_thread(stream):
+        items.append(item)
+        if limit and len(items) == limit:
+            break
+    return items
+
+
+def test_items_arrive_in_order_and_errors_propagate():
+    assert asyncio.run(_collect(_ClosableStream(range(5)))) == list(range(5))
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(_ClosableStream(range(2), error=ValueError("corte"))))
+
+
+def test_stream_is_closed_when_the_consumer_stops():
+    stream = _ClosableStream(range(1000), delay_s=0.001)
+    assert asyncio.run(_collect(stream, limit=3)) == [0, 1, 2]
+    assert stream.closed
+
+
+def test_slow_stream_does_not_block_the_event_loop():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await _collect(_ClosableStream(range(5), delay_s=0.05))
+        task.cancel()
+        return ticks
+
+    # 250 ms de lecturas bloqueantes: el loop siguió atendiendo al resto.
+    assert asyncio.run(main()) >= 10
+
+
+class _FakeAssistantsSSE(ThreadingHTTPServer):
+    """Servidor falso de Assistants: POST /v1/threads/{id}/runs responde un stream SSE."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SSEHandler)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _event(self, name: str, data) -> None:
+        self.wfile.write(f"event: {name}\ndata: {data if isinstance(data, str) else json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        run = {"id": "run_1", "object": "thread.run", "status": "in_progress"}
+        self._event("thread.run.created", run)
+        time.sleep(FIRST_TOKEN_DELAY_S)
+        for n in range(TOKENS):
+            delta = {"id": "msg_1", "object": "thread.message.delta", "delta": {"content": [{"index": 0, "type": "text", "text": {"value": f"palabra{n} "}}]}}
+            self._event("thread.message.delta", delta)
+            time.sleep(TOKEN_INTERVAL_S)
+        self._event("thread.run.completed", {**run, "status": "completed"})
+        self._event("done", "[DONE]")
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+async def _load(client, pump: bool) -> list[float]:
+    """N chats simultáneos; devuelve el tiempo hasta el primer token de cada uno."""
+
+    async def chat() -> float:
+        started = time.perf_counter()
+        stream = await asyncio.to_thread(client.beta.threads.runs.create, thread_id="thread_1", assistant_id="asst_1", stream=True)
+        first_token = None
+        events = aiter_in_thread(stream) if pump else _blocking(stream)
+        async for event in events:
+            if event.event == "thread.message.delta" and first_token is None:
+                first_token = time.perf_counter() - started
+        return first_token
+
+    return await asyncio.gather(*(chat() for _ in range(CHATS)))
+
+
+async def _blocking(stream):
+    # Como antes: `for event in run_stream` dentro del handler, cada lectura bloquea el loop.
+    for event in stream:
+        yield event
+
+
+def test_load_benchmark_time_to_first_token():
+    openai = pytest.importorskip("openai")
+    server = _FakeAssistantsSSE()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = openai.OpenAI(api_key="sk-test", base_url=server.base_url, max_retries=0)
+        blocking = asyncio.run(_load(client, pump=False))
+        pumped = asyncio.run(_load(client, pump=True))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = {name: (_percentile(ttft, 0.5), _percentile(ttft, 0.99)) for name, ttft in (("bloqueante", blocking), ("hilo lector", pumped))}
+    print(f"\nTTFT con {CHATS} chats simultáneos (p50/p99 s): " + ", ".join(f"{name}={p50:.3f}/{p99:.3f}" for name, (p50, p99) in report.items()))
+    # Sin bloqueo, el último chat no espera a que terminen los demás streams.
+    stream_s = FIRST_TOKEN_DELAY_S + TOKENS * TOKEN_INTERVAL_S
+    assert report["hilo lector"][1] < stream_s
+    assert report["bloqueante"][1] > report["hilo lector"][1]
@@ -0,0 +1,226 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+docx = pytest.importorskip("docx")
+
+from asistente_legal_constitucional_con_ia.util.text_extraction import (
+    chunks_to_text,
+    extract_text_from_bytes,
+    extract_text_from_path,
+    iter_text_chunks,
+    page_shards,
+)
+
+
+@pytest.mark.parametrize(
+    "total, shards, expected",
+    [
+        (10, 3, [(0, 4), (4, 8), (8, 10)]),
+        (3, 8, [(0, 1), (1, 2), (2, 3)]),
+        (5, 0, [(0, 5)]),
+        (0, 4, []),
+    ],
+)
+def test_page_shards_cover_all_pages_in_order(total, shards, expected):
+    assert page_shards(total, shards) == expected
+
+
+def _pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((72, 72), f"Pagina {number:03d}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    from asistente_legal_constitucional_con_ia.services import extraction_pipeline
+
+    monkeypatch.setattr(extraction_pipeline, "PARALLEL_PAGE_THRESHOLD", 4)
+    monkeypatch.setattr(extraction_pipeline, "EXTRACTION_WORKERS", 2)
+    yield extraction_pipeline
+    if extraction_pipeline._pool is not None:
+        extraction_pipeline._pool.shutdown()
+        extraction_pipeline._pool = None
+
+
+def test_sharded_extraction_keeps_page_order(pipeline):
+    progress = []
+    text = asyncio.run(pipeline.extract_text_async(_pdf(40), "gaceta.pdf", on_progress=lambda done, total: progress.append((done, total))))
+    assert [line for line in text.splitlines() if line.strip()] == [f"Pagina {n:03d}" for n in range(40)]
+    assert progress[-1] == (40, 40)
+    assert len(progress) > 1
+
+
+def test_sequential_extraction_matches_sharded(pipeline):
+    data = _pdf(12)
+    assert extract_text_from_bytes(data, "gaceta.pdf") == asyncio.run(pipeline.extract_text_async(data, "gaceta.pdf"))
+
+
+def test_broken_pool_is_rebuilt_and_retried(pipeline):
+    # Un worker que muere (segfault de MuPDF, OOM) deja el pool roto para siempre.
+    broken = pipeline.get_extraction_pool()
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+
+    assert asyncio.run(pipeline.extract_text_async(b"texto de prueba", "nota.txt")) == "texto de prueba"
+    assert pipeline._pool is not broken
+
+
+def _text_pdf(pages: int) -> bytes:
+    """PDF con una página de texto corrido por hoja, como una gaceta digital."""
+    line = "ARTÍCULO {n}. La Corte Constitucional reitera el precedente sobre la acción de tutela."
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), "\n".join(line.format(n=number * 40 + k) for k in range(40)), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+async def _blocking_profile(work) -> tuple[float, float]:
+    """Ejecuta `work` mientras un tick de 5 ms mide cuánto tarda el loop en atenderlo.
+
+    Devuelve (tiempo total, mayor retraso de un tick): el retraso máximo es el tiempo que
+    el event loop estuvo bloqueado sin poder atender a otras sesiones.
+    """
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    running = True
+
+    async def _ticker():
+        nonlocal worst
+        while running:
+            expected = loop.time() + 0.005
+            await asyncio.sleep(0.005)
+            worst = max(worst, loop.time() - expected)
+
+    ticker = asyncio.create_task(_ticker())
+    await asyncio.sleep(0.02)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    running = False
+    await ticker
+    return elapsed, worst
+
+
+@pytest.mark.parametrize("pages", [50, 500])
+def test_benchmark_event_loop_blocking(pipeline, monkeypatch, pages):
+    data = _text_pdf(pages)
+    monkeypatch.setattr(pipeline, "EXTRACTION_WORKERS", min(4, os.cpu_count() or 1))
+    # Arranque del pool (forkserver) fuera de la medición, como en un worker ya en marcha.
+    asyncio.run(pipeline.extract_text_async(_text_pdf(8), "calentamiento.pdf"))
+
+    async def _inline():
+        # Lo que hacía handle_upload antes: extraer dentro del handler.
+        extract_text_from_bytes(data, "gaceta.pdf")
+
+    async def _pooled():
+        await pipeline.extract_text_async(data, "gaceta.pdf", on_progress=lambda done, total: None)
+
+    inline_s, inline_block = asyncio.run(_blocking_profile(_inline))
+    pooled_s, pooled_block = asyncio.run(_blocking_profile(_pooled))
+    print(
+        f"\n{pages} páginas: en el handler {inline_s:.2f} s con el loop bloqueado {inline_block * 1000:.0f} ms;"
+        f" en el pool ({pipeline.EXTRACTION_WORKERS} procesos) {pooled_s:.2f} s con el loop bloqueado {pooled_block * 1000:.0f} ms"
+    )
+    assert pooled_block < max(0.1, inline_block / 2)
+
+
+def test_benchmark_workers(pipeline, monkeypatch):
+    data = _text_pdf(500)
+    expected = extract_text_from_bytes(data, "gaceta.pdf")
+    timings = {}
+    for workers in (1, 2, 4, 8):
+        monkeypatch.setattr(pipeline, "EXTRACTION_WORKERS", workers)
+        # Pool nuevo por configuración, arrancado fuera de la medición.
+        asyncio.run(pipeline.extract_text_async(_text_pdf(8), "calentamiento.pdf"))
+        started = time.perf_counter()
+        assert asyncio.run(pipeline.extract_text_async(data, "gaceta.pdf")) == expected
+        timings[workers] = time.perf_counter() - started
+        pipeline._pool.shutdown()
+        pipeline._pool = None
+    print(f"\n500 páginas en {os.cpu_count()} CPU: " + ", ".join(f"{w} procesos {t:.2f} s" for w, t in timings.items()))
+    # Solo hay aceleración con núcleos libres; en una máquina de un núcleo el reparto no debe costar más del doble.
+    assert timings[min(4, os.cpu_count() or 1)] < timings[1] * 2
+
+
+def _ley_pdf() -> bytes:
+    doc = fitz.open()
+    pages = [
+        "TÍTULO I\nDISPOSICIONES GENERALES\nARTÍCULO 1. Objeto.",
+        "ARTÍCULO 2. Ámbito.\nCAPÍTULO II\nARTÍCULO 3. Definiciones.",
+        "Continuación del artículo 3.",
+    ]
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _ley_docx() -> bytes:
+    document = docx.Document()
+    document.add_paragraph("  Preámbulo con espacios  ")
+    document.add_heading("TÍTULO I", level=1)
+    document.add_paragraph("Disposiciones generales.")
+    document.add_heading("Artículo 1", level=2)
+    table = document.add_table(rows=2, cols=2)
+    for row, values in zip(table.rows, [("Término", "Definición"), ("Tutela", "Acción constitucional")]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    document.add_heading("TÍTULO II", level=1)
+    document.add_paragraph("Vigencia.")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _assert_offsets(chunks):
+    text = chunks_to_text(chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == len(text)
+    for chunk in chunks:
+        assert text[chunk.start : chunk.end] == chunk.text
+
+
+def test_pdf_chunks_carry_page_and_heading_path():
+    chunks = list(iter_text_chunks(_ley_pdf(), "ley.pdf"))
+    assert [chunk.page for chunk in chunks] == [1, 2, 3]
+    # Cada página lleva la ruta de encabezados vigente al empezar.
+    assert [chunk.heading_path for chunk in chunks] == [(), ("TÍTULO I", "ARTÍCULO 1. Objeto."), ("TÍTULO I", "CAPÍTULO II", "ARTÍCULO 3. Definiciones.")]
+    _assert_offsets(chunks)
+
+
+def test_docx_chunks_keep_headings_and_table_rows():
+    chunks = list(iter_text_chunks(_ley_docx(), "ley.docx"))
+    assert [chunk.heading_path for chunk in chunks] == [(), ("TÍTULO I",), ("TÍTULO I", "Artículo 1"), ("TÍTULO II",)]
+    assert "Término | Definición\nTutela | Acción constitucional" in chunks[2].text
+    # Los offsets indexan el texto unido tal cual, con sus espacios iniciales.
+    assert chunks_to_text(chunks).startswith("  Preámbulo")
+    _assert_offsets(chunks)
+
+
+def test_txt_chunks_cut_on_newlines():
+    text = "".join(f"línea {n}\n" for n in range(2000))
+    chunks = list(iter_text_chunks(text.encode(), "nota.txt"))
+    assert len(chunks) > 1 and chunks_to_text(chunks) == text
+    assert all(len(chunk.text) <= 4000 and chunk.text.endswith("\n") for chunk in chunks)
+    _assert_offsets(chunks)
+
+
+@pytest.mark.parametrize("filename, make", [("ley.pdf", _ley_pdf), ("ley.docx", _ley_docx), ("nota.txt", lambda: "".join(f"línea {n}\n" for n in range(2000)).encode())])
+def test_chunks_from_path_match_chunks_from_bytes(tmp_path, filename, make):
+    data = make()
+    path = tmp_path / filename
+    path.write_bytes(data)
+    assert list(iter_text_chunks(str(path), filename)) == list(iter_text_chunks(data, filename))
+    assert extract_text_from_path(str(path), filename) == extract_text_from_bytes(data, filename)
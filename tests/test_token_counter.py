@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+tiktoken = pytest.importorskip("tiktoken")
+try:
+    tiktoken.get_encoding("o200k_base")
+except Exception:
+    pytest.skip("tiktoken no pudo cargar sus tablas BPE (se descargan la primera vez)", allow_module_level=True)
+
+from asistente_legal_constitucional_con_ia.services.token_counter import StreamingTokenCounter, _get_encoding, count_text_tokens
+
+# Tamaño típico de un flush del streaming (ver FlushScheduler).
+FLUSH_CHARS = 400
+
+ANSWER = (
+    "La Corte Constitucional, en la Sentencia C-123 de 2023, declaró exequible el artículo 5 de la Ley 1437 de 2011.\n"
+    "El derecho fundamental a la salud (Sentencia T-760 de 2008) exige acceso oportuno a los servicios.\n"
+) * 30
+
+
+def _stream(counter: StreamingTokenCounter, text: str, step: int) -> int:
+    total = 0
+    for i in range(0, len(text), step):
+        total = counter.feed(text[i : i + step])
+    return total
+
+
+@pytest.mark.parametrize("step", [1, 7, 64, 1000])
+def test_streaming_total_tracks_full_encoding(step):
+    exact = count_text_tokens(ANSWER, "gpt-4o")
+    total = _stream(StreamingTokenCounter("gpt-4o", window_chars=128, tail_chars=16), ANSWER, step)
+    # Se consolida en fronteras de espacio: la diferencia con el conteo completo es mínima.
+    assert abs(total - exact) <= max(2, exact * 0.02)
+
+
+def test_empty_delta_keeps_total():
+    counter = StreamingTokenCounter("gpt-4o")
+    total = counter.feed("Hola mundo")
+    assert counter.feed("") == total == counter.total
+
+
+def test_short_text_is_exact():
+    counter = StreamingTokenCounter("gpt-4o")
+    text = "Respuesta breve sin consolidar."
+    assert _stream(counter, text, 3) == count_text_tokens(text, "gpt-4o")
+
+
+def _answer_of(tokens: int) -> str:
+    encoding = _get_encoding("gpt-4o")
+    encoded = encoding.encode(ANSWER * (tokens // 1000 + 1))
+    return encoding.decode(encoded[:tokens])
+
+
+def _time_flushes(text: str, count) -> float:
+    started = time.perf_counter()
+    for end in range(FLUSH_CHARS, len(text) + FLUSH_CHARS, FLUSH_CHARS):
+        count(text[:end], text[end - FLUSH_CHARS : end])
+    return time.perf_counter() - started
+
+
+def test_benchmark_incremental_vs_full_reencode():
+    results = {}
+    for tokens in (2_000, 10_000, 50_000):
+        text = _answer_of(tokens)
+        counter = StreamingTokenCounter("gpt-4o")
+        full = _time_flushes(text, lambda accumulated, delta: count_text_tokens(accumulated, "gpt-4o"))
+        incremental = _time_flushes(text, lambda accumulated, delta: counter.feed(delta))
+        results[tokens] = (full, incremental)
+    print("\nConteo de tokens en streaming (re-codificación completa vs incremental, s): " + ", ".join(f"{tokens // 1000}k={full:.3f}/{incremental:.3f}" for tokens, (full, incremental) in results.items()))
+    # La re-codificación completa crece de forma cuadrática; la incremental, lineal.
+    full_50k, incremental_50k = results[50_000]
+    assert incremental_50k * 10 < full_50k
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from asistente_legal_constitucional_con_ia.services import tool_runner
+from asistente_legal_constitucional_con_ia.services.tool_runner import run_tool_calls
+
+
+@pytest.fixture(autouse=True)
+def _fresh_global_semaphore(monkeypatch):
+    # Cada prueba corre en su propio event loop.
+    monkeypatch.setattr(tool_runner, "_global_semaphore", None)
+
+
+def _call(call_id: str, name: str = "buscar_documento_legal", **arguments) -> SimpleNamespace:
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def _outputs(results) -> dict:
+    return {result["tool_call_id"]: result["output"] for result in results}
+
+
+def test_calls_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def tool(query: str, tipo_documento: str) -> str:
+        # Solo pasa si las tres llamadas están en curso a la vez.
+        barrier.wait()
+        return query
+
+    calls = [_call(f"c{i}", query=f"consulta {i}", tipo_documento="ley") for i in range(3)]
+    outputs = _outputs(asyncio.run(run_tool_calls(calls, {"buscar_documento_legal": tool})))
+    assert outputs == {"c0": "consulta 0", "c1": "consulta 1", "c2": "consulta 2"}
+
+
+def test_equivalent_citations_run_once():
+    seen = []
+
+    def tool(query: str, tipo_documento: str) -> str:
+        seen.append(query)
+        return "resultado"
+
+    calls = [
+        _call("a", query="C-123/23", tipo_documento="sentencia"),
+        _call("b", query="Sentencia C-123 de 2023", tipo_documento="sentencia"),
+    ]
+    outputs = _outputs(asyncio.run(run_tool_calls(calls, {"buscar_documento_legal": tool})))
+    assert len(seen) == 1
+    assert outputs == {"a": "resultado", "b": "resultado"}
+
+
+def test_different_articles_of_one_law_are_not_merged():
+    def tool(query: str, tipo_documento: str) -> str:
+        return query
+
+    calls = [
+        _call("a", query="Ley 1437 de 2011 artículo 137", tipo_documento="ley"),
+        _call("b", query="Ley 1437 de 2011 artículo 138", tipo_documento="ley"),
+    ]
+    outputs = _outputs(asyncio.run(run_tool_calls(calls, {"buscar_documento_legal": tool})))
+    assert outputs == {"a": "Ley 1437 de 2011 artículo 137", "b": "Ley 1437 de 2011 artículo 138"}
+
+
+def test_failures_are_reported_per_call():
+    def broken(**_) -> str:
+        raise RuntimeError("sin servicio")
+
+    calls = [_call("a", name="broken"), _call("b", name="desconocida")]
+    outputs = _outputs(asyncio.run(run_tool_calls(calls, {"broken": broken})))
+    assert "sin servicio" in outputs["a"]
+    assert "no está disponible" in outputs["b"]
+
+
+def test_timeout_returns_error_output(monkeypatch):
+    monkeypatch.setattr(tool_runner, "TOOL_TIMEOUT_S", 0.05)
+
+    def slow(**_) -> str:
+        time.sleep(0.3)
+        return "tarde"
+
+    outputs = _outputs(asyncio.run(run_tool_calls([_call("a", name="slow")], {"slow": slow})))
+    assert "tardó demasiado" in outputs["a"]
+    assert tool_runner.tool_latency_histogram()["slow"]["<=0.25s"] >= 1
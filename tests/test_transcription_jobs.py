@@ -0,0 +1,242 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("reflex")
+pytest.importorskip("assemblyai")
+sqlmodel = pytest.importorskip("sqlmodel")
+
+import reflex as rx
+
+from asistente_legal_constitucional_con_ia.models.database import AudioTranscription, Notebook, TranscriptionJob
+from asistente_legal_constitucional_con_ia.services import transcription_jobs
+
+
+class _FakeAssemblyAI(ThreadingHTTPServer):
+    """Servidor AssemblyAI falso: /v2/upload, /v2/transcript y /v2/transcript/{id}.
+
+    Cada transcript responde `processing` las primeras `polls_before_done` consultas y
+    luego `completed` con dos utterances.
+    """
+
+    def __init__(self, polls_before_done: int = 2, upload_delay_s: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.polls_before_done = polls_before_done
+        self.upload_delay_s = upload_delay_s
+        self.uploads: list[int] = []
+        self.submitted: list[str] = []
+        self.polls: dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _FakeAssemblyAI
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            return self.rfile.read(length)
+        # httpx envía los archivos por chunked transfer encoding.
+        data = b""
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return data
+            data += self.rfile.read(size)
+            self.rfile.readline()
+
+    def do_POST(self):
+        body = self._body()
+        if self.path == "/v2/upload":
+            time.sleep(self.server.upload_delay_s)
+            self.server.uploads.append(len(body))
+            self._reply({"upload_url": "https://cdn.fake/audio.mp3"})
+        elif self.path == "/v2/transcript":
+            transcript_id = f"tr_{len(self.server.submitted) + 1}"
+            self.server.submitted.append(transcript_id)
+            self._reply({"id": transcript_id, "status": "queued", "audio_url": json.loads(body)["audio_url"]})
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        transcript_id = self.path.rsplit("/", 1)[-1]
+        polls = self.server.polls[transcript_id] = self.server.polls.get(transcript_id, 0) + 1
+        if polls <= self.server.polls_before_done:
+            self._reply({"id": transcript_id, "status": "processing", "audio_url": "https://cdn.fake/audio.mp3"})
+            return
+        utterances = [
+            {"speaker": "A", "text": "Buenos días, honorables congresistas.", "start": 0, "end": 2000, "confidence": 0.9, "words": []},
+            {"speaker": "B", "text": "Se abre la sesión.", "start": 2500, "end": 4000, "confidence": 0.9, "words": []},
+        ]
+        self._reply({"id": transcript_id, "status": "completed", "audio_url": "https://cdn.fake/audio.mp3", "text": "...", "utterances": utterances, "audio_duration": 4})
+
+
+class _AudioStore:
+    def __init__(self, path: str):
+        self._path = path
+        self.deleted: list[str] = []
+
+    def path(self, handle: str):
+        return self._path if handle not in self.deleted else None
+
+    def delete(self, handle: str) -> None:
+        self.deleted.append(handle)
+
+
+@pytest.fixture
+def fake_server():
+    server = _FakeAssemblyAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlmodel.create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    sqlmodel.SQLModel.metadata.create_all(engine, tables=[TranscriptionJob.__table__, Notebook.__table__, AudioTranscription.__table__])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def jobs(monkeypatch, tmp_path, engine, fake_server):
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"\xff\xfb" * 4096)
+    monkeypatch.setattr(rx, "session", lambda: sqlmodel.Session(engine))
+    monkeypatch.setattr(transcription_jobs, "audio_store", _AudioStore(str(audio)))
+    monkeypatch.setattr(transcription_jobs, "WEBHOOK_URL", "")
+    monkeypatch.setenv("ASSEMBLYAI_API_KEY", "fake-key")
+    monkeypatch.setenv("ASSEMBLYAI_BASE_URL", fake_server.base_url)
+    transcription_jobs.configure_assemblyai()
+    return transcription_jobs
+
+
+def _job(engine, job_id: int) -> TranscriptionJob:
+    with sqlmodel.Session(engine) as session:
+        return session.get(TranscriptionJob, job_id)
+
+
+def _make_due(engine, job_id: int) -> None:
+    with sqlmodel.Session(engine) as session:
+        job = session.get(TranscriptionJob, job_id)
+        job.next_poll_at = datetime.now()
+        session.add(job)
+        session.commit()
+
+
+def test_claim_takes_a_lease_and_skips_leased_jobs(jobs, engine):
+    job_id = jobs.enqueue("ws", "sesion.mp3", "audio-1")
+
+    assert jobs.claim_due_jobs("worker-1", 5) == [job_id]
+    assert jobs.claim_due_jobs("worker-2", 5) == []
+    assert _job(engine, job_id).locked_by == "worker-1"
+
+    # Lease vencido (worker caído): otro worker lo retoma.
+    with sqlmodel.Session(engine) as session:
+        job = session.get(TranscriptionJob, job_id)
+        job.locked_until = datetime.now() - timedelta(seconds=1)
+        session.add(job)
+        session.commit()
+    assert jobs.claim_due_jobs("worker-2", 5) == [job_id]
+
+
+def test_pending_jobs_are_only_claimed_on_the_host_with_the_audio(jobs, engine):
+    job_id = jobs.enqueue("ws", "sesion.mp3", "audio-1")
+    with sqlmodel.Session(engine) as session:
+        job = session.get(TranscriptionJob, job_id)
+        job.host = "otro-host"
+        session.add(job)
+        session.commit()
+
+    assert jobs.claim_due_jobs("worker-1", 5) == []
+
+
+def test_submit_poll_with_backoff_and_complete(jobs, engine, fake_server):
+    pool = jobs.TranscriptionWorkerPool()
+    job_id = jobs.enqueue("ws", "sesion.mp3", "audio-1")
+    jobs.claim_due_jobs(pool.worker_id, 1)
+
+    asyncio.run(pool._process(job_id))
+    job = _job(engine, job_id)
+    assert (job.status, job.transcript_id, job.locked_by) == ("submitted", "tr_1", None)
+    assert fake_server.uploads == [8192]
+    assert jobs.audio_store.deleted == ["audio-1"]
+
+    # Mientras AssemblyAI procesa, cada sondeo espera POLL_BACKOFF veces más que el anterior.
+    delays = []
+    for _ in range(fake_server.polls_before_done):
+        _make_due(engine, job_id)
+        jobs.claim_due_jobs(pool.worker_id, 1)
+        asyncio.run(pool._process(job_id))
+        job = _job(engine, job_id)
+        assert job.status == "processing"
+        delays.append((job.next_poll_at - datetime.now()).total_seconds())
+    assert delays[1] > delays[0] * (jobs.POLL_BACKOFF - 0.1)
+
+    _make_due(engine, job_id)
+    jobs.claim_due_jobs(pool.worker_id, 1)
+    asyncio.run(pool._process(job_id))
+    job = _job(engine, job_id)
+    assert job.status == "completed" and job.notebook_id is not None
+    with sqlmodel.Session(engine) as session:
+        transcription = session.exec(sqlmodel.select(AudioTranscription)).one()
+    assert "Se abre la sesión." in transcription.transcription_text
+    assert fake_server.submitted == ["tr_1"]
+
+
+def test_complete_job_is_idempotent(jobs, engine):
+    job_id = jobs.enqueue("ws", "sesion.mp3", "audio-1")
+
+    first = jobs.complete_job(job_id, "texto", "0:04")
+    # Un segundo worker (lease vencido) termina el mismo trabajo: no duplica el notebook.
+    second = jobs.complete_job(job_id, "otro texto", "0:05")
+
+    assert first == second
+    with sqlmodel.Session(engine) as session:
+        assert len(session.exec(sqlmodel.select(Notebook)).all()) == 1
+        assert session.exec(sqlmodel.select(AudioTranscription)).one().transcription_text == "texto"
+
+
+def test_lease_is_renewed_during_a_long_upload(jobs, engine, fake_server, monkeypatch):
+    # Lease de 0.3 s y una subida de 1.5 s: sin renovación, otro worker lo reclamaría y lo enviaría otra vez.
+    monkeypatch.setattr(jobs, "LEASE_S", 0.3)
+    fake_server.upload_delay_s = 1.5
+    pool = jobs.TranscriptionWorkerPool()
+    job_id = jobs.enqueue("ws", "sesion.mp3", "audio-1")
+    jobs.claim_due_jobs(pool.worker_id, 1)
+
+    async def submit_while_another_worker_claims():
+        task = asyncio.create_task(pool._process(job_id))
+        stolen = []
+        while not task.done():
+            stolen += await asyncio.to_thread(jobs.claim_due_jobs, "otro-worker", 5)
+            await asyncio.sleep(0.05)
+        await task
+        return stolen
+
+    assert asyncio.run(submit_while_another_worker_claims()) == []
+    assert fake_server.submitted == ["tr_1"]
+    assert _job(engine, job_id).status == "submitted"
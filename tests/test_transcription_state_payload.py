@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("reflex")
+
+from asistente_legal_constitucional_con_ia.states.transcription_state import JOB_STATUS_MESSAGES, TranscriptionState
+
+AUDIO_MB = 25
+
+
+def _state_after_upload() -> TranscriptionState:
+    """Estado de una sesión tal como lo deja handle_transcription_request tras encolar el trabajo."""
+    state = TranscriptionState(_reflex_internal_init=True)
+    state._pending_workspace_id = "workspace-1"
+    state._active_job_id = 42
+    state.uploaded_files = ["audiencia.mp3"]
+    state.transcribing = True
+    state.progress_message = JOB_STATUS_MESSAGES["pending"]
+    return state
+
+
+def test_redis_payload_does_not_carry_the_audio():
+    audio = bytes(AUDIO_MB * 1024 * 1024)
+
+    after = len(_state_after_upload()._serialize())
+    # Antes, la grabación completa vivía en la var de backend `_pending_audio_data`.
+    state = _state_after_upload()
+    state._backend_vars["_pending_audio_data"] = audio
+    before = len(state._serialize())
+
+    print(f"\nPayload en Redis con un audio de {AUDIO_MB} MB: antes {before:,} bytes, ahora {after:,} bytes")
+    assert before > len(audio)
+    assert after < 4096
+    # Ninguna var del estado guarda bytes: el audio solo viaja como handle al trabajo persistente.
+    assert not any(isinstance(value, (bytes, bytearray)) for value in _state_after_upload()._backend_vars.values())
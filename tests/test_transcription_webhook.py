@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("assemblyai")
+pytest.importorskip("reflex")
+
+from fastapi.testclient import TestClient
+
+from asistente_legal_constitucional_con_ia.services import transcription_webhook
+
+SECRET = "secreto-de-prueba"
+
+
+class _StubAssemblyAI:
+    """Emite webhooks con la forma de los de AssemblyAI hacia la app de prueba."""
+
+    def __init__(self, client: TestClient):
+        self.client = client
+
+    def notify(self, transcript_id: str, job_id=None, secret: str = SECRET, status: str = "completed"):
+        params = {"job_id": job_id} if job_id is not None else None
+        headers = {transcription_webhook.WEBHOOK_AUTH_HEADER: secret}
+        return self.client.post("/webhooks/assemblyai", params=params, headers=headers, json={"transcript_id": transcript_id, "status": status})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    marked, notified = [], []
+    active = {"tr_1": 7}
+
+    def fake_mark_due(job_id, transcript_id):
+        marked.append((job_id, transcript_id))
+        return job_id if job_id is not None else active.get(transcript_id)
+
+    monkeypatch.setattr(transcription_webhook, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(transcription_webhook, "mark_due", fake_mark_due)
+    monkeypatch.setattr(transcription_webhook.transcription_pool, "notify", lambda: notified.append(True))
+    stub = _StubAssemblyAI(TestClient(transcription_webhook.webhook_api))
+    stub.marked, stub.notified = marked, notified
+    return stub
+
+
+def test_webhook_marks_job_due_and_wakes_pool(stub):
+    assert stub.notify("tr_1").status_code == 200
+    assert stub.marked == [(None, "tr_1")]
+    assert stub.notified == [True]
+
+
+def test_segment_webhook_uses_job_id(stub):
+    assert stub.notify("tr_segment", job_id=12).status_code == 200
+    assert stub.marked == [(12, "tr_segment")]
+
+
+def test_unknown_transcript_is_acknowledged_without_waking_pool(stub):
+    assert stub.notify("tr_desconocido").status_code == 200
+    assert stub.notified == []
+
+
+def test_wrong_secret_is_rejected(stub):
+    assert stub.notify("tr_1", secret="otro").status_code == 401
+    assert stub.marked == []
+
+
+def test_malformed_payload_is_rejected(stub):
+    response = stub.client.post("/webhooks/assemblyai", headers={transcription_webhook.WEBHOOK_AUTH_HEADER: SECRET}, content=b"no es json")
+    assert response.status_code == 400
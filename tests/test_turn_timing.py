@@ -0,0 +1,36 @@
+import time
+
+from asistente_legal_constitucional_con_ia.services.turn_timing import TurnTimer
+
+
+def test_phases_accumulate_and_first_token_is_marked_once():
+    timer = TurnTimer(debug_sample_rate=0)
+    for _ in range(2):
+        with timer.phase("tools"):
+            time.sleep(0.01)
+    timer.mark_first_token()
+    first = timer.first_token_s
+    timer.mark_first_token()
+
+    assert timer.phases["tools"] >= 0.02
+    assert timer.first_token_s == first
+    summary = timer.summary()
+    assert "primer token=" in summary and "herramientas=" in summary
+
+
+def test_phase_is_recorded_when_the_call_fails():
+    timer = TurnTimer(debug_sample_rate=0)
+    try:
+        with timer.phase("run_create"):
+            raise TimeoutError
+    except TimeoutError:
+        pass
+    assert "run=" in timer.summary()
+
+
+def test_diagnostic_turns_are_sampled():
+    # Con la tasa por defecto (0) ningún turno paga las llamadas de diagnóstico.
+    assert not any(TurnTimer(debug_sample_rate=0).debug for _ in range(1000))
+    assert all(TurnTimer(debug_sample_rate=1).debug for _ in range(100))
+    sampled = sum(TurnTimer(debug_sample_rate=0.1).debug for _ in range(10_000))
+    assert 700 < sampled < 1300
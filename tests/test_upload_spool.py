@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from asistente_legal_constitucional_con_ia.services.upload_spool import UPLOAD_SPOOL_THRESHOLD
+
+UPLOADS = 10
+UPLOAD_MB = 50
+
+# Se mide en un proceso aparte, con el pico de RSS de su propia memoria (VmHWM): ru_maxrss hereda
+# el pico del proceso padre (pytest) a través de fork + exec.
+_SCRIPT = """
+import asyncio, json, sys
+from asistente_legal_constitucional_con_ia.services.upload_spool import READ_CHUNK_SIZE, MemoryBudget, SpooledUpload
+
+uploads, size = int(sys.argv[1]), int(sys.argv[2])
+CHUNK = b"x" * READ_CHUNK_SIZE
+
+
+class StreamedUpload:
+    # Entrega el cuerpo por bloques, como un stream de red, sin tenerlo completo en memoria.
+    def __init__(self, name):
+        self.name, self.size, self._sent = name, size, 0
+
+    async def read(self, n=-1):
+        if self._sent >= self.size:
+            return b""
+        chunk = CHUNK[: min(n, self.size - self._sent)]
+        self._sent += len(chunk)
+        await asyncio.sleep(0)
+        return chunk
+
+    async def close(self):
+        pass
+
+
+def status_kb(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+
+def reset_peak():
+    # Reinicia VmHWM (Linux >= 4.0) para no contar los picos de arranque e imports.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+async def main():
+    budget = MemoryBudget(256 * 1024 * 1024)
+    peak_in_use = 0
+
+    async def handle(i):
+        nonlocal peak_in_use
+        reserved = await budget.acquire(size)
+        try:
+            peak_in_use = max(peak_in_use, budget.in_use)
+            spooled = await SpooledUpload.read(StreamedUpload(f"gaceta_{i}.pdf"))
+            try:
+                assert not spooled.in_memory and spooled.size == size
+            finally:
+                spooled.close()
+        finally:
+            await budget.release(reserved)
+
+    reset_peak()
+    baseline = status_kb("VmRSS")
+    await asyncio.gather(*(handle(i) for i in range(uploads)))
+    peak = status_kb("VmHWM")
+    print(json.dumps({"peak_delta_mb": (peak - baseline) / 1024, "peak_in_use": peak_in_use, "budget": budget.limit}))
+
+
+asyncio.run(main())
+"""
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="requiere /proc (Linux)")
+def test_peak_rss_for_concurrent_large_uploads():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT, str(UPLOADS), str(UPLOAD_MB * 1024 * 1024)],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        timeout=300,
+        check=True,
+    )
+    report = json.loads(result.stdout)
+
+    # Leer cada upload completo retendría UPLOADS × UPLOAD_MB (500 MB); volcando a disco,
+    # como mucho un umbral de spool por upload en curso.
+    assert report["peak_delta_mb"] < UPLOADS * UPLOAD_SPOOL_THRESHOLD / (1024 * 1024) + 32
+    assert report["peak_in_use"] <= report["budget"]
@@ -0,0 +1,49 @@
+import glob
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("reflex")
+pytest.importorskip("openai")
+
+from asistente_legal_constitucional_con_ia.states.chat_state import ChatState
+
+USERS = 8
+
+
+class _FakeFiles:
+    """Imita `client.files.create`: lee el archivo recibido y espera a que todos suban a la vez."""
+
+    def __init__(self, parties: int):
+        self._barrier = threading.Barrier(parties, timeout=5)
+        self._lock = threading.Lock()
+        self.received = []
+
+    def create(self, file, purpose):
+        filename, buffer, _ = file
+        content = buffer.read().decode("utf-8")
+        self._barrier.wait()
+        with self._lock:
+            self.received.append((filename, content))
+        return SimpleNamespace(id=f"file-{len(content)}")
+
+
+@pytest.mark.parametrize("spool_max_bytes", [16 * 1024 * 1024, 1])
+def test_concurrent_same_named_uploads_do_not_collide(spool_max_bytes):
+    files = _FakeFiles(USERS)
+    client = SimpleNamespace(files=files)
+    state = SimpleNamespace(upload_spool_max_bytes=spool_max_bytes)
+    texts = [f"Texto extraído del usuario {i}. " * (i + 1) for i in range(USERS)]
+    before = set(glob.glob(os.path.join(tempfile.gettempdir(), "*_processed.txt")))
+
+    with ThreadPoolExecutor(max_workers=USERS) as executor:
+        list(executor.map(lambda text: ChatState._upload_file_to_openai(state, client, "demanda_processed.txt", text), texts))
+
+    # Cada usuario sube exactamente su texto, con el mismo nombre y sin archivos temporales con nombre.
+    assert sorted(content for _, content in files.received) == sorted(texts)
+    assert {filename for filename, _ in files.received} == {"demanda_processed.txt"}
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), "*_processed.txt"))) == before